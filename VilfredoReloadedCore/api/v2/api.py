@@ -27,14 +27,16 @@ REST API
 '''
 
 from flask import request,\
-    url_for, jsonify, make_response, abort
-from VilfredoReloadedCore import app, models, emails
+    url_for, jsonify, make_response, abort, g
+from VilfredoReloadedCore import app, models, emails, dashboard, utils, auth
 from VilfredoReloadedCore.auth import login_manager, login_serializer
 from VilfredoReloadedCore.database import db_session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func
 from functools import wraps
 from flask import Response
 import json, os
+import datetime
+import hashlib
 import uuid
 
 
@@ -43,6 +45,7 @@ REST_URL = '/api'
 REST_URL_PREFIX = REST_URL + '/' + REST_API_VERSION
 
 RESULTS_PER_PAGE = 50
+MAX_KEYSET_LIMIT = 200
 MAX_LEN_EMAIL = 120
 MAX_LEN_USERNAME = 20
 MAX_LEN_PASSWORD = 120
@@ -73,6 +76,59 @@ def allowed_file(filename, permitted=None):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in permitted
 
+
+def get_requested_fields():
+    '''
+    .. function:: get_requested_fields()
+
+    Returns the fields requested with the fields query parameter, a comma
+    separated list of field names, or None if all fields are wanted.
+
+    :rtype: set or None
+    '''
+    fields = request.args.get('fields', '')
+    fields = set(field.strip() for field in fields.split(',') if field.strip())
+    return fields or None
+
+
+def get_keyset():
+    '''
+    .. function:: get_keyset()
+
+    Returns the after and limit query parameters of a listing paginated by
+    id, or None if neither was given and the whole listing is wanted.
+    Raises ValueError if either is not an integer.
+
+    :rtype: tuple or None
+    '''
+    if 'after' not in request.args and 'limit' not in request.args:
+        return None
+    after = int(request.args.get('after', 0))
+    limit = int(request.args.get('limit', RESULTS_PER_PAGE))
+    return (after, max(1, min(limit, MAX_KEYSET_LIMIT)))
+
+
+def keyset_page(rows, limit, key=None):
+    '''
+    .. function:: keyset_page(rows, limit[, key=None])
+
+    Splits a page from the rows of a listing fetched with one row more than
+    the limit, returning the page and the after parameter of the next page,
+    or None if this is the last page.
+
+    :param rows: rows ordered by id
+    :type rows: list
+    :param limit: page size
+    :type limit: int
+    :param key: returns the id of a row, the id attribute if None
+    :type key: callable or None
+    :rtype: tuple
+    '''
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return (rows, key(rows[-1]) if key else rows[-1].id)
+    return (rows, None)
+
 @login_manager.token_loader
 def load_token(token):
     """
@@ -94,11 +150,22 @@ def load_token(token):
     #server side and not rely on the users cookie to exipre.
     max_age = int(app.config["REMEMBER_COOKIE_DURATION"].total_seconds())
 
+    # Tokens verified recently are not decrypted again
+    key = auth.token_key(token)
+    cached = auth.token_cache.get(key)
+    if cached is not None:
+        (user_id, password_hash) = cached
+        user = models.User.get(user_id)
+        if user and password_hash == user.password:
+            return user
+        auth.token_cache.delete(key)
+
     #Decrypt the Security Token, data = [username, hashpass]
     #from . import login_serializer
 
     try:
-        data = login_serializer.loads(token, max_age=max_age)
+        (data, timestamp) = login_serializer.loads(token, max_age=max_age,
+                                                   return_timestamp=True)
     except:
         app.logger.debug('load_token raised error')
         return None
@@ -108,6 +175,12 @@ def load_token(token):
 
     #Check Password and return user or None
     if user and data[1] == user.password:
+        # Never keep a token past its expiry
+        age = datetime.datetime.utcnow() - timestamp
+        timeout = min(app.config['AUTH_CACHE_TIMEOUT'],
+                      int(max_age - age.total_seconds()))
+        if timeout > 0:
+            auth.token_cache.set(key, (user.id, user.password), timeout)
         return user
     return None
 
@@ -128,7 +201,7 @@ def requires_auth(f):
             return jsonify(message='no username received'), 403
         if auth.password == '':
             # app.logger.debug('requires_auth: Token set')
-            token_valid = load_token(auth.username)
+            token_valid = authenticate_request()
             if token_valid:
                 # app.logger.debug('requires_auth: Token is valid')
                 return f(*args, **kwargs)
@@ -136,7 +209,7 @@ def requires_auth(f):
                 # app.logger.debug('requires_auth: Token is not valid')
                 # return authenticate()
                 return jsonify(message='no password received, incorrect token supplied'), 403
-        elif check_auth(auth.username, auth.password):
+        elif authenticate_request():
             # app.logger.debug('requires_auth: username and password valid')
             return f(*args, **kwargs)
         else:
@@ -157,41 +230,165 @@ def check_auth(username, password):
     :type password: String
     :rtype: Boolean
     '''
+    return load_user(username, password) is not None
+
+def load_user(username, password):
+    '''
+    .. function:: load_user(username, password)
+
+    Returns the user with this user name and password, or None. Passwords
+    verified in the last AUTH_CACHE_TIMEOUT seconds are not hashed again.
+
+    :param username: user name.
+    :type username: String
+    :param password: password.
+    :type password: String
+    :rtype: User or None
+    '''
     user = None
     if username == '' or password == '':
-        return False
+        return None
+
+    key = auth.credential_key(username, password)
+    cached = auth.credential_cache.get(key)
+    if cached is not None:
+        (user_id, password_hash) = cached
+        user = models.User.get(user_id)
+        if user and user.username == username and user.password == password_hash:
+            return user
+        auth.credential_cache.delete(key)
+
     try:
         user = models.User.query.filter_by(username=username).one()
     except:
         pass
-    if user is None:
-        return False
-    else:
-        return user.check_password(password)
+    if user is None or not user.check_password(password):
+        return None
+    auth.credential_cache.set(key, (user.id, user.password))
+    return user
 
-def get_authenticated_user(request):
+def authenticate_request():
     '''
-    .. function:: get_authenticated_user(request)
+    .. function:: authenticate_request()
 
-    Returns the authenticated user.
+    Returns the user authenticated by the current request, or None. The
+    request is authenticated once and the user kept on flask.g.
 
-    :param request: HTTP request.
-    :type request: Object
     :rtype: User or None
     '''
+    if hasattr(g, 'authenticated_user'):
+        return g.authenticated_user
+
+    user = None
     if request.authorization:
         if request.authorization.password == '':
             user = load_token(request.authorization.username)
-            return user
-        elif check_auth(request.authorization.username, request.authorization.password):
-            user = models.User.query.\
-                filter_by(username=request.authorization.username).one()
-            return user
         else:
-            return None
+            user = load_user(request.authorization.username,
+                             request.authorization.password)
     else:
         app.logger.debug("get_authenticated_user: no authorization sent")
+    g.authenticated_user = user
+    return user
+
+def get_authenticated_user(request):
+    '''
+    .. function:: get_authenticated_user(request)
+
+    Returns the authenticated user.
+
+    :param request: HTTP request.
+    :type request: Object
+    :rtype: User or None
+    '''
+    return authenticate_request()
+
+
+def get_comment_state(question):
+    '''
+    .. function:: get_comment_state(question)
+
+    Returns the number of comments on the proposals of a question and the
+    id of the latest, which change whenever a comment is added or removed.
+
+    :param question: question
+    :type question: Question
+    :rtype: tuple
+    '''
+    return tuple(db_session.query(func.count(models.Comment.id),
+                                  func.max(models.Comment.id))
+                 .filter(models.Comment.question_id == question.id)
+                 .one())
+
+
+def get_question_etag(question, user, state=None):
+    '''
+    .. function:: get_question_etag(question, user[, state=None])
+
+    Returns the ETag of a response calculated from the votes of a question.
+    It changes with the vote version of the requested generation, the
+    current generation and phase of the question, the user and the query
+    parameters.
+
+    :param question: question
+    :type question: Question
+    :param user: authenticated user
+    :type user: User or None
+    :param state: function returning anything else the response depends on
+    :type state: callable or None
+    :rtype: String or None, None if the generation parameter is invalid
+    '''
+    try:
+        generation = int(request.args.get('generation', question.generation))
+    except ValueError:
         return None
+    parts = [question.id,
+             question.get_vote_version(generation),
+             question.generation,
+             question.phase,
+             user.id if user else None,
+             sorted(request.args.iteritems(multi=True))]
+    if state is not None:
+        parts.append(state(question))
+    return hashlib.sha1(repr(parts)).hexdigest()
+
+
+def conditional_question(state=None):
+    '''
+    .. function:: conditional_question([state=None])
+
+    Decorates a GET endpoint of a question so that a request with an
+    If-None-Match header holding the ETag of the current response is
+    answered with 304 Not Modified before the endpoint runs. Successful
+    responses carry their ETag.
+
+    :param state: function returning anything else the response depends
+        on, see get_question_etag()
+    :type state: callable or None
+    '''
+    def decorator(f):
+        @wraps(f)
+        def decorated(question_id=None, *args, **kwargs):
+            user = get_authenticated_user(request)
+            question = None
+            if question_id is not None:
+                question = models.Question.query.get(int(question_id))
+            # Let the endpoint report missing questions and permissions
+            if question is None or not question.get_permissions(user):
+                return f(question_id, *args, **kwargs)
+
+            etag = get_question_etag(question, user, state)
+            if etag is not None and request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(f(question_id, *args, **kwargs))
+            if etag is not None and response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return decorated
+    return decorator
 
 
 @app.errorhandler(404)
@@ -623,9 +820,12 @@ def api_upload_avatar():
     avatar_saved = user.set_avatar(avatar)
 
     if avatar_saved == False:
+        db_session.rollback()
         message = 'Failed to save file'
         return jsonify(message=message, error=message), 401
 
+    db_session.commit()
+
     message = 'Avatar saved'
     return jsonify(message=message,
                    url=app.config['PROTOCOL'] + app.config['SITE_DOMAIN'] + '/' + avatar_saved), 201
@@ -1061,7 +1261,12 @@ def api_get_questions(question_id=None):
         :param room: room title
         :type room: string
         :query page: page number. default is 1
+        :query after: list the questions with ids above this one, in id
+            order, returning next, the after parameter of the next page
+        :query limit: number of questions listed after after
+        :query fields: comma separated fields of each question to return
         :statuscode 200: no error
+        :statuscode 400: after or limit is not an integer
         :statuscode 404: there's no user
     '''
     app.logger.debug("api_get_questions called...\n")
@@ -1110,22 +1315,38 @@ def api_get_questions(question_id=None):
             return jsonify(question=question_data), 200
 
     else:
-        questions = user.get_active_questions()
+        fields = get_requested_fields()
+        try:
+            keyset = get_keyset()
+        except ValueError:
+            return jsonify(message="Parameters after and limit must be integers"), 400
+
+        if keyset is None:
+            questions = user.get_active_questions()
+        else:
+            (after, limit) = keyset
+            (questions, next_after) = keyset_page(
+                user.get_active_questions(after=after, limit=limit + 1), limit)
         items = len(questions)
 
+        counts = dict()
+        if utils.wants_field(fields, *models.Question.COUNTED_FIELDS):
+            counts = dashboard.get_question_counts(questions, user)
         results = []
         for q in questions:
-            results.append(q.get_public(user))
+            results.append(q.get_public(user, counts=counts.get(q.id), fields=fields))
+
+        response = dict(items=str(items), questions=results)
+        if keyset is not None:
+            response['next'] = next_after
 
         # Test for jsonp request
         if False or 'callback' in request.args:
-            d = json.dumps(dict(items=str(items),
-                           questions=results))
+            d = json.dumps(response)
             return request.args['callback'] + '(' + d + ');', 200
 
         else:
-            return jsonify(items=str(items),
-                           questions=results), 200
+            return jsonify(response), 200
 
 #
 # Create Question  Add Question
@@ -1305,9 +1526,15 @@ def api_get_question_proposals(question_id=None, proposal_id=None):
         :type proposal_id: int
         :query generation: question generation, default is current
         :query page: page number, default is 1
+        :query after: list the proposals with ids above this one, in id
+            order, instead of a page, returning next, the after parameter
+            of the next page
+        :query limit: number of proposals listed after after
+        :query fields: comma separated fields of each proposal to return
         :query user_only: boolean, default false
         :query inherited_only: boolean, default is false
         :statuscode 200: no error
+        :statuscode 400: after or limit is not an integer
         :statuscode 404: there's no proposal
     '''
     app.logger.debug("api_get_question_proposals called...\n")
@@ -1368,6 +1595,11 @@ def api_get_question_proposals(question_id=None, proposal_id=None):
     else:
         generation = int(request.args.get('generation', question.generation))
         page = int(request.args.get('page', 1))
+        fields = get_requested_fields()
+        try:
+            keyset = get_keyset()
+        except ValueError:
+            return jsonify(message="Parameters after and limit must be integers"), 400
 
         # proposals = models.Proposal.query.join(models.QuestionHistory).\
         #    filter(models.QuestionHistory.question_id == question.id).\
@@ -1401,34 +1633,53 @@ def api_get_question_proposals(question_id=None, proposal_id=None):
         elif inherited_only:
             query = query.filter(models.Proposal.generation_created < question.generation)
 
-        proposals = query.paginate(page, RESULTS_PER_PAGE, False)
+        if keyset is None:
+            proposals = query.paginate(page, RESULTS_PER_PAGE, False)
+            proposal_items = proposals.items
+        else:
+            (after, limit) = keyset
+            (proposal_items, next_after) = keyset_page(
+                query.filter(models.Proposal.id > after)
+                    .order_by(models.Proposal.id)
+                    .limit(limit + 1).all(), limit)
 
-        items = len(proposals.items)
-        pages = proposals.pages
-        total_items = proposals.total
+        items = len(proposal_items)
 
         results = []
 
-        for p in proposals.items:
+        for p in proposal_items:
 
             # results.append(p.get_public(user))
             
             if perm == models.Question.permission_types['MODERATE']:
-                results.append(p.get_anonymized(user))
+                results.append(p.get_anonymized(user, fields=fields))
             else:
-                results.append(p.get_public(user))
+                results.append(p.get_public(user, fields=fields))
+
+        if keyset is None:
+            pages = proposals.pages
+            total_items = proposals.total
+
+            # Test for jsonp request
+            if False or 'callback' in request.args:
+                d = json.dumps(dict(total_items=str(total_items), items=str(items),
+                               page=str(page), pages=str(pages),
+                               proposals=results))
+                return request.args['callback'] + '(' + d + ');', 200
+            else:
+                # Return json
+                return jsonify(total_items=total_items, items=items,
+                              page=page, pages=pages,
+                              proposals=results), 200
 
         # Test for jsonp request
         if False or 'callback' in request.args:
-            d = json.dumps(dict(total_items=str(total_items), items=str(items),
-                           page=str(page), pages=str(pages),
+            d = json.dumps(dict(items=str(items), next=next_after,
                            proposals=results))
             return request.args['callback'] + '(' + d + ');', 200
         else:
-            # Return json
-            return jsonify(total_items=total_items, items=items,
-                          page=page, pages=pages,
-                          proposals=results), 200
+            return jsonify(items=items, next=next_after,
+                           proposals=results), 200
 
 
 # Support Comment
@@ -3419,6 +3670,10 @@ def api_associated_users():
 
         :param question_id: question id
         :type question_id: int
+        :query ignore_question: question id
+        :query after: list the users with ids above this one, in id order,
+            returning next, the after parameter of the next page
+        :query limit: number of users listed after after
         :statuscode 200: no error
         :statuscode 400: bad request
     '''
@@ -3451,12 +3706,27 @@ def api_associated_users():
         app.logger.debug("ACCESS ERROR: User %s tried to access question %s", user.id, question.id)
         return jsonify(message = "You do not have permission to view this question"), 404
 
-    #not_invited = user.get_uninvited_associated_users(question=question)
-    not_invited = user.get_uninvited_associated_users_by_invitation(question=question)
+    try:
+        keyset = get_keyset()
+    except ValueError:
+        return jsonify(message="Parameters after and limit must be integers"), 400
 
-    return jsonify(question_id=str(question.id),
-                   num_items=str(len(not_invited)),
-                   not_invited=not_invited), 200
+    #not_invited = user.get_uninvited_associated_users(question=question)
+    if keyset is None:
+        not_invited = user.get_uninvited_associated_users_by_invitation(question=question)
+    else:
+        (after, limit) = keyset
+        (not_invited, next_after) = keyset_page(
+            user.get_uninvited_associated_users_by_invitation(
+                question=question, after=after, limit=limit + 1),
+            limit, key=lambda associate: associate['user_id'])
+
+    response = dict(question_id=str(question.id),
+                    num_items=str(len(not_invited)),
+                    not_invited=not_invited)
+    if keyset is not None:
+        response['next'] = next_after
+    return jsonify(response), 200
 
 
 # Decline a new invitation
@@ -3732,6 +4002,9 @@ def api_not_invited(question_id):
 
         :param question_id: question id
         :type question_id: int
+        :query after: list the users with ids above this one, in id order,
+            returning next, the after parameter of the next page
+        :query limit: number of users listed after after
         :statuscode 200: no error
         :statuscode 400: bad request
     '''
@@ -3754,11 +4027,26 @@ def api_not_invited(question_id):
         app.logger.debug("ACCESS ERROR: User %s tried to access question %s", user.id, question.id)
         return jsonify(message = "You do not have permission to view this question"), 404
 
-    not_invited = user.get_uninvited_associated_users(question)
+    try:
+        keyset = get_keyset()
+    except ValueError:
+        return jsonify(message="Parameters after and limit must be integers"), 400
 
-    return jsonify(question_id=str(question.id),
-                   num_items=str(len(not_invited)),
-                   not_invited=not_invited), 200
+    if keyset is None:
+        not_invited = user.get_uninvited_associated_users(question)
+    else:
+        (after, limit) = keyset
+        (not_invited, next_after) = keyset_page(
+            user.get_uninvited_associated_users(question, after=after,
+                                                limit=limit + 1),
+            limit, key=lambda associate: associate['user_id'])
+
+    response = dict(question_id=str(question.id),
+                    num_items=str(len(not_invited)),
+                    not_invited=not_invited)
+    if keyset is not None:
+        response['next'] = next_after
+    return jsonify(response), 200
 
 
 # Get Question Participants
@@ -3958,6 +4246,7 @@ def api_get_question_proposal_endorsers(question_id, proposal_id):
 #
 @app.route(REST_URL_PREFIX + '/questions/<int:question_id>/pareto', methods=['GET'])
 @requires_auth
+@conditional_question(state=get_comment_state)
 def api_question_pareto(question_id=None):
     '''
     .. http:post:: /questions/(int:question_id)/pareto
@@ -4069,6 +4358,7 @@ def api_question_pareto(question_id=None):
 
 @app.route(REST_URL_PREFIX + '/questions/<int:question_id>/results', methods=['GET'])
 @requires_auth
+@conditional_question()
 def api_question_results(question_id=None):
     '''
     .. http:post:: /questions/(int:question_id)/results
@@ -4742,6 +5032,7 @@ def replaceWithPublic(collection):
 # http://[hostname]/api/v1.0/questions/47/graph?generation=2&map_type=pareto
 @app.route(REST_URL_PREFIX + '/questions/<int:question_id>/graph', methods=['GET'])
 @requires_auth
+@conditional_question()
 def api_question_graph(question_id):
     '''
     .. http:get:: questions/(int:question_id)/graph
@@ -4783,6 +5074,8 @@ def api_question_graph(question_id):
         :type user_level_type: string: one of "layers", "num_votes" or "flat"
 
         :statuscode 200: no error
+        :statuscode 202: the graph is being rendered, poll the URL in the
+            Location header
         :statuscode 400: bad request
     '''
     app.logger.debug("api_question_graph called...\n")
@@ -4835,15 +5128,25 @@ def api_question_graph(question_id):
     app.logger.debug("Call get_voting_graph()...")
 
 
+    background = app.config['RENDER_IN_BACKGROUND']
     if algorithm == 1:
         graph_svg = question.get_voting_graph(
             generation=generation,
             map_type=map_type,
             proposal_level_type=proposal_level_type,
-            user_level_type=user_level_type)
+            user_level_type=user_level_type,
+            background=background)
     else:
         graph_svg = question.get_complex_voting_graph(
-            generation=generation)
+            generation=generation,
+            background=background)
+
+    if graph_svg is None:
+        # Rendering, poll this URL until the graph is ready
+        return jsonify(message="The graph is being rendered",
+                       question_id=str(question.id),
+                       poll_url=request.url), 202, {'Location': request.url,
+                                                   'Retry-After': '2'}
 
     if not graph_svg:
         message = "There was a problem creating the graph"
@@ -4926,6 +5229,7 @@ def api_get_voting_data(question_id):
 @app.route(REST_URL_PREFIX + '/questions/<int:question_id>/voting_map',
            methods=['GET'])
 @requires_auth
+@conditional_question()
 def api_question_voting_map(question_id):
     '''
     .. http:get:: questions/(int:question_id)/voting_map
@@ -4995,6 +5299,7 @@ def api_question_voting_map(question_id):
 @app.route(REST_URL_PREFIX + '/questions/<int:question_id>/levels_map',
            methods=['GET'])
 @requires_auth
+@conditional_question()
 def api_question_levels_map(question_id=None):
     '''
     .. http:get:: questions/(int:question_id)/levels_map
@@ -5071,6 +5376,7 @@ def api_question_levels_map(question_id=None):
 @app.route(REST_URL_PREFIX + '/questions/<int:question_id>/domination_map',
            methods=['GET'])
 @requires_auth
+@conditional_question()
 def api_question_domination_map(question_id=None):
     '''
     .. http:get:: questions/(int:question_id)/domination_map
@@ -5174,6 +5480,7 @@ def api_question_domination_map(question_id=None):
 @app.route(REST_URL_PREFIX + '/questions/<int:question_id>/proposal_relations',
            methods=['GET'])
 @requires_auth
+@conditional_question(state=get_comment_state)
 def api_question_proposal_relations(question_id=None):
     '''
     .. http:post:: questions/(int:question_id)/proposal_relations
@@ -5563,8 +5870,8 @@ def api_create_email_invitation(question_id):
     rejected = list()
     accepted = list()
     already_sent = list()
-    invites_count = 0
 
+    addresses = list()
     for email in email_list:
         email = email.strip()
         if not '@' in email:
@@ -5572,33 +5879,41 @@ def api_create_email_invitation(question_id):
 
             if email not in rejected:
                 rejected.append(email)
+        elif email not in addresses:
+            addresses.append(email)
+
+    # Find the addresses already contacted in one query
+    contacted = set()
+    if addresses:
+        contacted = set(
+            address for (address,) in
+            db_session.query(models.EmailInvite.receiver_email)
+            .filter(and_(models.EmailInvite.receiver_email.in_(addresses),
+                         models.EmailInvite.sender_id == user.id,
+                         models.EmailInvite.question_id == question.id)))
+
+    new_invites = list()
+    for email in addresses:
+        if email in contacted:
+            app.logger.debug("Address %s already contacted", email)
+            already_sent.append(email)
             continue
-        else:
-            instance = db_session.query(models.EmailInvite)\
-                .filter(and_(models.EmailInvite.receiver_email == email,
-                             models.EmailInvite.sender_id == user.id,
-                             models.EmailInvite.question_id == question.id))\
-                .first()
-            if instance:
-                app.logger.debug("Address %s already contacted", email)
-                if email not in already_sent:
-                    already_sent.append(email)
-                continue
-            else:
-                accepted.append(email)
-                token = uuid.uuid4().get_hex()
-                new_invite = models.EmailInvite(user, email, permissions, question_id, token)
+        accepted.append(email)
+        token = uuid.uuid4().get_hex()
 
-                # send email aesynchronously - (Check sent)
-                emails.send_question_email_invite_email(user, email, question, token)
-                new_invite.email_sent = 1
+        # send email aesynchronously - (Check sent)
+        emails.send_question_email_invite_email(user, email, question, token)
 
-                db_session.add(new_invite)
-                invites_count = invites_count + 1
-                # Send email
-                # email_question_email_invite(user, email, question)
+        new_invites.append({'sender_id': user.id,
+                            'receiver_email': email,
+                            'question_id': question.id,
+                            'permissions': permissions,
+                            'token': token,
+                            'email_sent': True})
 
+    invites_count = len(new_invites)
     if invites_count:
+        db_session.execute(models.EmailInvite.__table__.insert(), new_invites)
         db_session.commit()
 
     addresses_already_sent = ",".join(already_sent)
@@ -5676,28 +5991,29 @@ def api_create_invitation(question_id):
     if not 'invite_user_ids' in request.json:
         return jsonify(message = "Parameter invite_user_ids not set"), 400
 
-    invite_user_ids = request.json['invite_user_ids']
+    try:
+        invite_user_ids = [int(id) for id in request.json['invite_user_ids']]
+    except (TypeError, ValueError):
+        app.logger.debug(
+            "Param invite_user_ids contains non integer values!\n")
+        abort(400)
 
     permissions = int(request.json.get('permissions', models.Question.READ))
 
-    for id in invite_user_ids:
-        try:
-            id = int(id)
-        except ValueError:
-            app.logger.debug(
-                "Param invite_user_ids contains non integer values!\n")
-            abort(400)
-
     app.logger.debug("invite_user_ids = %s\n", invite_user_ids)
 
-    app.logger.debug("calling invite_all with users %s\n", invite_user_ids)
-    if user.invite_all(invite_user_ids, permissions, question):
-        app.logger.debug("invites created\n")
-        db_session.commit()
-        return jsonify(message="Invites created"), 201
-    else:
+    # Only author can invite to own question and cannot invite himself
+    if question.user_id != user.id or user.id in invite_user_ids:
         return jsonify(message="Unable to create invites"), 500
 
+    outcomes = user.invite_users(invite_user_ids, permissions, question)
+    db_session.commit()
+    app.logger.debug("invites created: %s\n", outcomes)
+    return jsonify(message="Invites created",
+                   invites=dict((str(receiver_id), outcome)
+                                for (receiver_id, outcome)
+                                in outcomes.iteritems())), 201
+
 
 # Get subscriptions
 #
@@ -18,7 +18,11 @@
 # along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
 #
 ###############################################################################
+import hashlib
+import hmac
+
 from . import app
+from .cache import LRUCache
 from flask_login import LoginManager
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -29,4 +33,46 @@ from itsdangerous import URLSafeTimedSerializer
 try:
     login_serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], app.config['SALT'])
 except Exception:
-    print 'Failed to create login_serializer'
\ No newline at end of file
+    print 'Failed to create login_serializer'
+
+# Credentials verified in the last AUTH_CACHE_TIMEOUT seconds, so that a
+# client polling the API does not have its password hashed on every request.
+# Passwords are kept only as a keyed digest and the entries are checked
+# against the stored password hash, so changing a password drops them.
+credential_cache = LRUCache(app.config['AUTH_CACHE_SIZE'],
+                            app.config['AUTH_CACHE_TIMEOUT'])
+token_cache = LRUCache(app.config['AUTH_CACHE_SIZE'],
+                       app.config['AUTH_CACHE_TIMEOUT'])
+
+
+def credential_key(username, password):
+    '''
+    .. function:: credential_key(username, password)
+
+    Returns the key of a user name and password in credential_cache.
+
+    :param username: user name
+    :type username: String
+    :param password: password
+    :type password: String
+    :rtype: String
+    '''
+    if isinstance(username, unicode):
+        username = username.encode('utf8')
+    if isinstance(password, unicode):
+        password = password.encode('utf8')
+    return hmac.new(app.config['SECRET_KEY'], username + '\0' + password,
+                    hashlib.sha256).hexdigest()
+
+
+def token_key(token):
+    '''
+    .. function:: token_key(token)
+
+    Returns the key of a token in token_cache, its signature.
+
+    :param token: authentication token
+    :type token: String
+    :rtype: String
+    '''
+    return token.rsplit('.', 1)[-1]
@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Result cache
+
+Stores the results of expensive calculations, such as domination maps and
+pareto fronts, in the backend selected by the CACHE_BACKEND setting:
+
+    filesystem  pickle files in WORK_FILE_DIRECTORY (the default)
+    lru         an in-process LRU dictionary
+    redis       a Redis server, shared between workers and nodes
+    none        nothing is cached
+
+Every backend evicts entries after CACHE_DEFAULT_TIMEOUT seconds and keeps
+hit and miss counters. The filesystem and LRU backends also hold at most
+CACHE_MAX_ENTRIES entries; a Redis server evicts according to its own
+maxmemory policy.
+'''
+
+import hashlib
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import cPickle as pickle
+
+from . import app
+
+
+class CacheError(Exception):
+    '''
+    Raised when a cache backend fails.
+    '''
+    pass
+
+
+class Cache(object):
+    '''
+    Base class of the cache backends.
+
+    None is returned for missing entries, so None cannot be cached.
+    '''
+    name = 'base'
+
+    def __init__(self, default_timeout=None):
+        self.default_timeout = default_timeout
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        '''
+        .. function:: get(key)
+
+        Returns the cached value of the key, or None.
+
+        :param key: cache key
+        :type key: String
+        :rtype: object or None
+        '''
+        try:
+            value = self._get(key)
+        except CacheError as e:
+            app.logger.warning("Cache %s: get %s failed: %s", self.name, key, e)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, timeout=None):
+        '''
+        .. function:: set(key, value[, timeout=None])
+
+        Caches a value.
+
+        :param key: cache key
+        :type key: String
+        :param value: any picklable value except None
+        :type value: object
+        :param timeout: seconds before the entry expires, defaults to
+            default_timeout
+        :type timeout: int
+        :rtype: boolean
+        '''
+        if timeout is None:
+            timeout = self.default_timeout
+        try:
+            self._set(key, value, timeout)
+            return True
+        except CacheError as e:
+            app.logger.warning("Cache %s: set %s failed: %s", self.name, key, e)
+            return False
+
+    def delete(self, key):
+        '''
+        .. function:: delete(key)
+
+        Removes an entry from the cache.
+
+        :param key: cache key
+        :type key: String
+        '''
+        try:
+            self._delete(key)
+        except CacheError as e:
+            app.logger.warning("Cache %s: delete %s failed: %s", self.name, key, e)
+
+    def clear(self):
+        '''
+        .. function:: clear()
+
+        Removes all entries from the cache.
+        '''
+        try:
+            self._clear()
+        except CacheError as e:
+            app.logger.warning("Cache %s: clear failed: %s", self.name, e)
+
+    def stats(self):
+        '''
+        .. function:: stats()
+
+        Returns the hit and miss counters of the cache.
+
+        :rtype: dict
+        '''
+        return {'backend': self.name,
+                'hits': self.hits,
+                'misses': self.misses}
+
+    def _expires(self, timeout):
+        if timeout:
+            return time.time() + timeout
+        return None
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, timeout):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+
+class NullCache(Cache):
+    '''
+    Caches nothing.
+    '''
+    name = 'none'
+
+    def _get(self, key):
+        return None
+
+    def _set(self, key, value, timeout):
+        pass
+
+    def _delete(self, key):
+        pass
+
+    def _clear(self):
+        pass
+
+
+class LRUCache(Cache):
+    '''
+    Keeps entries in a dictionary of the current process, discarding the
+    least recently used entry when full.
+    '''
+    name = 'lru'
+
+    def __init__(self, max_entries=1000, default_timeout=None):
+        super(LRUCache, self).__init__(default_timeout)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            (expires, value) = entry
+            if expires is not None and expires < time.time():
+                return None
+            # Move the entry to the most recently used end
+            self._entries[key] = entry
+            return value
+
+    def _set(self, key, value, timeout):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self._expires(timeout), value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemCache(Cache):
+    '''
+    Keeps each entry in a pickle file in a directory. Files are written
+    atomically, and every prune_interval writes the oldest files are removed
+    when there are more than max_entries, so the directory may briefly hold
+    up to prune_interval extra entries. By default the directory is listed
+    once every max_entries / 20 writes.
+    '''
+    name = 'filesystem'
+    suffix = '.cache'
+
+    def __init__(self, directory, max_entries=1000, default_timeout=None,
+                 prune_interval=None):
+        super(FileSystemCache, self).__init__(default_timeout)
+        self.directory = directory
+        self.max_entries = max_entries
+        if prune_interval is None:
+            prune_interval = max(1, max_entries // 20)
+        self.prune_interval = prune_interval
+        self._writes = 0
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        if not re.match(r'^[\w.-]+$', key):
+            key = hashlib.md5(key).hexdigest()
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _list_entries(self):
+        entries = list()
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                # Removed by another worker
+                pass
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as input:
+                (expires, value) = pickle.load(input)
+        except IOError:
+            return None
+        except (EOFError, pickle.UnpicklingError, ValueError):
+            self._remove(path)
+            return None
+        if expires is not None and expires < time.time():
+            self._remove(path)
+            return None
+        return value
+
+    def _set(self, key, value, timeout):
+        path = self._path(key)
+        try:
+            (fd, tmp_path) = tempfile.mkstemp(suffix='.tmp',
+                                              dir=self.directory)
+            with os.fdopen(fd, 'wb') as output:
+                pickle.dump((self._expires(timeout), value), output,
+                            pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, path)
+        except (IOError, OSError) as e:
+            raise CacheError(str(e))
+        # Listing the directory costs more than the write, so it is only
+        # done every prune_interval writes
+        self._writes += 1
+        if self._writes >= self.prune_interval:
+            self._writes = 0
+            self._prune()
+
+    def _prune(self):
+        entries = self._list_entries()
+        if len(entries) > self.max_entries:
+            entries.sort()
+            for (mtime, path) in entries[:len(entries) - self.max_entries]:
+                self._remove(path)
+
+    def _delete(self, key):
+        self._remove(self._path(key))
+
+    def _clear(self):
+        for (mtime, path) in self._list_entries():
+            self._remove(path)
+
+
+class RedisCache(Cache):
+    '''
+    Keeps entries on a Redis server, or any server speaking the Redis
+    protocol, so that all workers share them. Keys are prefixed with
+    key_prefix so that clear() only removes the entries of this app.
+    '''
+    name = 'redis'
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None,
+                 key_prefix='vr:', default_timeout=None, socket_timeout=5):
+        super(RedisCache, self).__init__(default_timeout)
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.key_prefix = key_prefix
+        self.socket_timeout = socket_timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port),
+                                        self.socket_timeout)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._send_command('AUTH', self.password)
+        if self.db:
+            self._send_command('SELECT', self.db)
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except socket.error:
+                pass
+
+    def _send_command(self, *args):
+        parts = ['*%d\r\n' % len(args)]
+        for arg in args:
+            arg = str(arg)
+            parts.append('$%d\r\n%s\r\n' % (len(arg), arg))
+        self._local.sock.sendall(''.join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise socket.error('Connection closed by server')
+        (kind, data) = (line[0], line[1:-2])
+        if kind == '+':
+            return data
+        elif kind == '-':
+            raise CacheError(data)
+        elif kind == ':':
+            return int(data)
+        elif kind == '$':
+            length = int(data)
+            if length == -1:
+                return None
+            return self._local.reader.read(length + 2)[:-2]
+        elif kind == '*':
+            length = int(data)
+            if length == -1:
+                return None
+            return [self._read_reply() for i in range(length)]
+        else:
+            raise CacheError('Unexpected reply %r' % line)
+
+    def command(self, *args):
+        '''
+        .. function:: command(*args)
+
+        Sends a command to the server and returns the reply, reconnecting
+        once if the connection was lost.
+
+        :rtype: object
+        '''
+        for attempt in (1, 2):
+            try:
+                if getattr(self._local, 'sock', None) is None:
+                    self._connect()
+                return self._send_command(*args)
+            except socket.error as e:
+                self._disconnect()
+                if attempt == 2:
+                    raise CacheError(str(e))
+
+    def _get(self, key):
+        data = self.command('GET', self.key_prefix + key)
+        if data is None:
+            return None
+        try:
+            return pickle.loads(data)
+        except (EOFError, pickle.UnpicklingError, ValueError, TypeError,
+                IndexError, KeyError, AttributeError, ImportError):
+            # Truncated, corrupt or written by something else
+            self._delete(key)
+            return None
+
+    def _set(self, key, value, timeout):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if timeout:
+            self.command('SET', self.key_prefix + key, data,
+                         'EX', int(timeout))
+        else:
+            self.command('SET', self.key_prefix + key, data)
+
+    def _delete(self, key):
+        self.command('DEL', self.key_prefix + key)
+
+    def _clear(self):
+        cursor = '0'
+        while True:
+            (cursor, keys) = self.command('SCAN', cursor,
+                                          'MATCH', self.key_prefix + '*',
+                                          'COUNT', 100)
+            if keys:
+                self.command('DEL', *keys)
+            if cursor == '0':
+                break
+
+
+def make_cache(config):
+    '''
+    .. function:: make_cache(config)
+
+    Creates the cache backend selected in the app configuration.
+
+    :param config: app configuration
+    :type config: dict
+    :rtype: Cache
+    '''
+    backend = config.get('CACHE_BACKEND', 'filesystem')
+    timeout = config.get('CACHE_DEFAULT_TIMEOUT')
+    max_entries = config.get('CACHE_MAX_ENTRIES', 1000)
+
+    if not config.get('CACHE_COMPLEX_DOM', True) or backend == 'none':
+        return NullCache()
+    elif backend == 'lru':
+        return LRUCache(max_entries=max_entries, default_timeout=timeout)
+    elif backend == 'redis':
+        return RedisCache(host=config.get('CACHE_REDIS_HOST', 'localhost'),
+                          port=config.get('CACHE_REDIS_PORT', 6379),
+                          db=config.get('CACHE_REDIS_DB', 0),
+                          password=config.get('CACHE_REDIS_PASSWORD'),
+                          key_prefix=config.get('CACHE_KEY_PREFIX', 'vr:'),
+                          default_timeout=timeout)
+    elif backend == 'filesystem':
+        return FileSystemCache(os.path.join(config['WORK_FILE_DIRECTORY'],
+                                            'cache'),
+                               max_entries=max_entries,
+                               default_timeout=timeout)
+    else:
+        raise ValueError('Unknown CACHE_BACKEND %s' % backend)
+
+
+_cache = None
+
+
+def get_cache():
+    '''
+    .. function:: get_cache()
+
+    Returns the cache of the app, creating it on first use.
+
+    :rtype: Cache
+    '''
+    global _cache
+    if _cache is None:
+        _cache = make_cache(app.config)
+    return _cache
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Question dashboard
+
+The counts shown for each question in a list of questions are calculated
+for all the questions at once, with one query made of subqueries grouped by
+question, instead of a dozen queries per question. Each count is taken in
+the current generation of its question.
+
+The counts are passed to Question.get_public() and
+Question.get_anonymized().
+'''
+
+from sqlalchemy import and_, case, distinct, func
+
+from .database import db_session
+from .models import Question, QuestionHistory, Proposal, Endorsement,\
+    Invite, FinishedWriting, Threshold, User
+
+COUNTS = ('proposal_count', 'inherited_proposal_count', 'new_proposal_count',
+          'new_proposer_count', 'participant_count', 'voters_voting_count',
+          'completed_voter_count', 'finished_writing_count')
+
+
+def _proposal_counts(question_ids):
+    return db_session.query(
+        QuestionHistory.question_id.label('question_id'),
+        func.count(QuestionHistory.id).label('proposal_count'),
+        func.sum(case(
+            [(Proposal.generation_created < Question.generation, 1)],
+            else_=0)).label('inherited_proposal_count'),
+        func.sum(case(
+            [(Proposal.generation_created == Question.generation, 1)],
+            else_=0)).label('new_proposal_count'),
+        func.count(distinct(case(
+            [(Proposal.generation_created == Question.generation,
+              Proposal.user_id)]))).label('new_proposer_count'))\
+        .join(Question, and_(Question.id == QuestionHistory.question_id,
+                             Question.generation == QuestionHistory.generation))\
+        .join(Proposal, Proposal.id == QuestionHistory.proposal_id)\
+        .filter(QuestionHistory.question_id.in_(question_ids))\
+        .group_by(QuestionHistory.question_id)\
+        .subquery()
+
+
+def _voter_counts(question_ids, proposals):
+    user_votes = db_session.query(
+        Endorsement.question_id.label('question_id'),
+        func.count(Endorsement.id).label('votes'))\
+        .join(Question, and_(Question.id == Endorsement.question_id,
+                             Question.generation == Endorsement.generation))\
+        .filter(Endorsement.question_id.in_(question_ids))\
+        .group_by(Endorsement.question_id, Endorsement.user_id)\
+        .subquery()
+
+    return db_session.query(
+        user_votes.c.question_id.label('question_id'),
+        func.count(user_votes.c.votes).label('voters_voting_count'),
+        func.sum(case(
+            [(user_votes.c.votes == proposals.c.proposal_count, 1)],
+            else_=0)).label('completed_voter_count'))\
+        .outerjoin(proposals,
+                   proposals.c.question_id == user_votes.c.question_id)\
+        .group_by(user_votes.c.question_id)\
+        .subquery()
+
+
+def _participant_counts(question_ids):
+    return db_session.query(
+        Invite.question_id.label('question_id'),
+        func.count(Invite.id).label('participant_count'))\
+        .filter(Invite.question_id.in_(question_ids))\
+        .group_by(Invite.question_id)\
+        .subquery()
+
+
+def _finished_writing_counts(question_ids, user_id):
+    return db_session.query(
+        FinishedWriting.question_id.label('question_id'),
+        func.count(FinishedWriting.id).label('finished_writing_count'),
+        func.sum(case([(FinishedWriting.user_id == user_id, 1)],
+                      else_=0)).label('finished_writing'))\
+        .join(Question, and_(Question.id == FinishedWriting.question_id,
+                             Question.generation == FinishedWriting.generation))\
+        .filter(FinishedWriting.question_id.in_(question_ids))\
+        .group_by(FinishedWriting.question_id)\
+        .subquery()
+
+
+def _user_permissions(question_ids, user_id):
+    return db_session.query(
+        Invite.question_id.label('question_id'),
+        func.max(Invite.permissions).label('permissions'))\
+        .filter(Invite.question_id.in_(question_ids))\
+        .filter(Invite.receiver_id == user_id)\
+        .group_by(Invite.question_id)\
+        .subquery()
+
+
+def get_question_counts(questions, user=None):
+    '''
+    .. function:: get_question_counts(questions[, user=None])
+
+    Returns the dashboard counts of each question, keyed by question id.
+    The counts of a question are a dict with the keys in COUNTS, the
+    threshold coordinates mapx and mapy, and for the user finished_writing,
+    true if the user has finished writing, and permissions, the permissions
+    of the user or 0.
+
+    :param questions: questions
+    :type questions: list of Question
+    :param user: current user
+    :type user: User or None
+    :rtype: dict
+    '''
+    question_ids = [question.id for question in questions]
+    if not question_ids:
+        return dict()
+    user_id = user.id if user else None
+
+    # Load the authors of the questions together
+    author_ids = set(question.user_id for question in questions)
+    User.query.filter(User.id.in_(author_ids)).all()
+
+    proposals = _proposal_counts(question_ids)
+    voters = _voter_counts(question_ids, proposals)
+    participants = _participant_counts(question_ids)
+    finished_writing = _finished_writing_counts(question_ids, user_id)
+    permissions = _user_permissions(question_ids, user_id)
+
+    rows = db_session.query(
+        Question.id.label('question_id'),
+        Threshold.mapx,
+        Threshold.mapy,
+        proposals.c.proposal_count,
+        proposals.c.inherited_proposal_count,
+        proposals.c.new_proposal_count,
+        proposals.c.new_proposer_count,
+        participants.c.participant_count,
+        voters.c.voters_voting_count,
+        voters.c.completed_voter_count,
+        finished_writing.c.finished_writing_count,
+        finished_writing.c.finished_writing,
+        permissions.c.permissions)\
+        .outerjoin(Threshold, and_(Threshold.question_id == Question.id,
+                                   Threshold.generation == Question.generation))\
+        .outerjoin(proposals, proposals.c.question_id == Question.id)\
+        .outerjoin(participants, participants.c.question_id == Question.id)\
+        .outerjoin(voters, voters.c.question_id == Question.id)\
+        .outerjoin(finished_writing,
+                   finished_writing.c.question_id == Question.id)\
+        .outerjoin(permissions, permissions.c.question_id == Question.id)\
+        .filter(Question.id.in_(question_ids))\
+        .all()
+
+    counts = dict()
+    for row in rows:
+        question_counts = dict((name, int(getattr(row, name) or 0))
+                               for name in COUNTS)
+        question_counts['mapx'] = row.mapx
+        question_counts['mapy'] = row.mapy
+        question_counts['finished_writing'] = bool(row.finished_writing)
+        question_counts['permissions'] = row.permissions or 0
+        counts[row.question_id] = question_counts
+    return counts
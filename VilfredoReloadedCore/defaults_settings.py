@@ -35,6 +35,31 @@ development_db = 'sqlite:////var/tmp/vr.db'
 
 CACHE_COMPLEX_DOM = True
 
+# Keep a domination matrix per generation in the result cache, updated
+# on each vote, instead of recalculating the map after every vote
+INCREMENTAL_DOMINATION_MAP = True
+
+# Key players and endorser effects are calculated in this many worker
+# processes for generations with at least LEAVE_ONE_OUT_POOL_MIN_VOTERS
+# endorsers. Serial by default: raise it on deployments with spare cores.
+# The pool is only used outside of requests (render workers, manage.py).
+LEAVE_ONE_OUT_PROCESSES = 1
+LEAVE_ONE_OUT_POOL_MIN_VOTERS = 200
+
+# Result cache backend: 'filesystem' (WORK_FILE_DIRECTORY/cache), 'lru'
+# (per process), 'redis' (shared between workers) or 'none'
+CACHE_BACKEND = 'filesystem'
+# Seconds before a cached result expires, None to keep results until evicted
+CACHE_DEFAULT_TIMEOUT = 7 * 24 * 60 * 60
+# Maximum number of cached results for the filesystem and lru backends
+CACHE_MAX_ENTRIES = 1000
+# Redis server for the redis backend
+CACHE_REDIS_HOST = 'localhost'
+CACHE_REDIS_PORT = 6379
+CACHE_REDIS_DB = 0
+CACHE_REDIS_PASSWORD = None
+CACHE_KEY_PREFIX = 'vr:'
+
 MAX_LINKS_IN_QUESTION_WITHOUT_VALIDATION = 3
 
 MAX_LINKS_IN_QUESTION = 10
@@ -74,6 +99,10 @@ UPLOADED_AVATAR_DEST = 'static/usercontent/profiles'
 
 PROFILE_PICS = 'usercontent/profiles'
 
+# Seconds the path of the default avatar is kept before its directory is
+# read again
+DEFAULT_AVATAR_CACHE_TIMEOUT = 300
+
 # Set permitted extensions for uploaded user files
 ALLOWED_EXTENSIONS = ['png', 'jpg', 'jpeg', 'gif']
 
@@ -85,6 +114,15 @@ LOG_CONFIG_FILE = 'logging_debug.conf'
 # GRAPHVIZ_DOT_PATH = '/home/vilfredo/local/bin/dot'
 GRAPHVIZ_DOT_PATH = None
 
+# Render new voting maps on a pool of RENDER_WORKERS threads per process,
+# the graph API answers 202 until the map is ready
+RENDER_IN_BACKGROUND = True
+RENDER_WORKERS = 2
+
+# Update the endorsement results and proposal medians after a vote on the
+# render queue instead of in the vote request
+RESULTS_IN_BACKGROUND = True
+
 # Directory to put the voting maps - it will be created if not found
 # MAP_PATH = 'maps/'
 MAP_PATH = 'VilfredoReloadedCore/static/maps/'
@@ -110,9 +148,38 @@ MAIL_PASSWORD = None
 MAIL_SUPPRESS_SEND = True
 MAIL_DEFAULT_SENDER = 'no_reply@localhost'
 
+# Queue emails in MAIL_SPOOL_DIRECTORY (WORK_FILE_DIRECTORY/mail if None) and
+# send them from a worker thread. If False emails are passed to sendmail
+# during the request. Queued emails are not sent, and stay in the spool,
+# while MAIL_SUPPRESS_SEND is set.
+MAIL_QUEUE = False
+MAIL_SPOOL_DIRECTORY = None
+# How the worker sends the emails: 'sendmail', one sendmail process per
+# email, or 'smtp', through the mail server above with up to
+# MAIL_BATCH_SIZE emails per connection
+MAIL_TRANSPORT = 'sendmail'
+MAIL_BATCH_SIZE = 50
+# Failed emails are tried again after MAIL_RETRY_DELAY seconds, doubling
+# each time, up to MAIL_MAX_ATTEMPTS attempts
+MAIL_RETRY_DELAY = 60
+MAIL_MAX_ATTEMPTS = 5
+# Seconds between checks of the spool for emails due to be tried again
+MAIL_QUEUE_INTERVAL = 10
+
 from datetime import timedelta
 REMEMBER_COOKIE_DURATION = timedelta(days=365)
 
+# Read the associates of a user offered in the invitation dialogs from the
+# co_participant table, kept up to date as invitations are added and removed.
+# Rebuild it with "manage.py rebuild_co_participants" after importing
+# invitations outside the application.
+CO_PARTICIPANT_TABLE = True
+
+# Seconds an API password or token stays verified without being checked
+# again, and the number of verified credentials kept per process
+AUTH_CACHE_TIMEOUT = 60
+AUTH_CACHE_SIZE = 1000
+
 # administrator list
 ADMINS = ['admin@' + SITE_DOMAIN]
 
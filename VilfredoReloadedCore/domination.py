@@ -0,0 +1,497 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Domination engine
+
+Calculates the proposal domination map from the VoteSnapshot of a
+generation. Each set of voters is encoded as an integer bitmask, one
+bit per voter, so that the set comparisons made for every pair of proposals
+become a handful of integer operations.
+'''
+
+import multiprocessing
+
+# Value of map[B][A] given the value of map[A][B]
+REVERSE_RELATION = {-2: -2, -1: -1, 0: 0, 1: 2, 2: 1, 3: 4, 4: 3, 5: 6, 6: 5}
+
+# Values of map[A][B] when A dominates B, and when B dominates A
+DOMINATING = frozenset([1, 3, 5])
+DOMINATED = frozenset([2, 4, 6])
+
+
+def is_proper_subset(mask1, mask2):
+    '''
+    .. function:: is_proper_subset(mask1, mask2)
+
+    True if the set of bits in mask1 is a proper subset of those in mask2.
+
+    :rtype: boolean
+    '''
+    return mask1 != mask2 and mask1 & ~mask2 == 0
+
+
+def popcount(mask):
+    '''
+    .. function:: popcount(mask)
+
+    Number of bits set in mask.
+
+    :rtype: int
+    '''
+    return bin(mask).count('1')
+
+
+def relations(domination_map):
+    '''
+    .. function:: relations(domination_map)
+
+    Reads from a domination map the proposals each proposal dominates and
+    the proposals dominating it, as Question.calculate_proposal_relation_ids()
+    calculates them from the votes.
+
+    :param domination_map: domination map of either algorithm
+    :type domination_map: dict
+    :rtype: tuple (dict of proposal ID to set of dominated proposal IDs,
+        dict of proposal ID to set of dominating proposal IDs)
+    '''
+    dominating = dict()
+    dominated = dict()
+    for (pid1, row) in domination_map.iteritems():
+        dominating[pid1] = set(pid2 for (pid2, value) in row.iteritems()
+                               if value in DOMINATING)
+        dominated[pid1] = set(pid2 for (pid2, value) in row.iteritems()
+                              if value in DOMINATED)
+    return (dominating, dominated)
+
+
+def skyline(masks):
+    '''
+    .. function:: skyline(masks)
+
+    Calculates the pareto front of a set of proposals from the bitmasks of
+    their endorsers. A proposal is dominated when its endorsers are a
+    proper subset of those of another proposal.
+
+    Proposals are swept in order of decreasing number of endorsers, so a
+    proposal can only be dominated by one already on the frontier, and
+    only one frontier entry is kept for each distinct set of endorsers.
+
+    :param masks: endorser bitmask of each proposal ID
+    :type masks: dict
+    :rtype: tuple (list of pareto proposal IDs,
+        dict of dominated proposal ID to a dominating proposal ID)
+    '''
+    ordered = sorted(masks.items(),
+                     key=lambda item: (-popcount(item[1]), item[0]))
+    frontier = list()
+    pending = dict()
+    size = None
+    pareto = list()
+    dominated_by = dict()
+
+    for (pid, mask) in ordered:
+        count = popcount(mask)
+        if count != size:
+            # Everything on the frontier now has more endorsers than mask
+            frontier.extend(sorted(pending.items()))
+            pending = dict()
+            size = count
+        for (front_mask, front_pid) in frontier:
+            if mask & ~front_mask == 0:
+                dominated_by[pid] = front_pid
+                break
+        else:
+            pareto.append(pid)
+            pending.setdefault(mask, pid)
+
+    return (pareto, dominated_by)
+
+
+def leave_one_out(proposal_ids, masks, dominators, user_bits):
+    '''
+    .. function:: leave_one_out(proposal_ids, masks, dominators, user_bits)
+
+    Calculates the algorithm 1 pareto front of the proposals once for each
+    voter, ignoring the endorsements of that voter.
+
+    Removing a voter only changes the endorser masks of the proposals they
+    endorsed, so only the pairs involving one of those proposals are
+    compared again. A proposal the voter did not endorse which is dominated
+    by another they did not endorse stays dominated without any comparison.
+
+    :param proposal_ids: proposal IDs
+    :type proposal_ids: list of int
+    :param masks: endorser bitmask of each proposal, in the same order
+    :type masks: list of int
+    :param dominators: bitmask over the proposal positions of the proposals
+        dominating each proposal, in the same order
+    :type dominators: list of int
+    :param user_bits: list of (user ID, voter bit)
+    :type user_bits: list of tuple
+    :rtype: dict of user ID to list of pareto proposal IDs
+    '''
+    positions = range(len(masks))
+    fronts = dict()
+    for (user_id, bit) in user_bits:
+        keep = ~bit
+        affected_positions = [i for i in positions if masks[i] & bit]
+        affected = 0
+        for i in affected_positions:
+            affected |= 1 << i
+
+        pareto = list()
+        for i in positions:
+            if affected >> i & 1:
+                mask = masks[i] & keep
+                candidates = positions
+            elif dominators[i] & ~affected:
+                continue
+            else:
+                mask = masks[i]
+                candidates = affected_positions
+            for j in candidates:
+                if is_proper_subset(mask, masks[j] & keep):
+                    break
+            else:
+                pareto.append(proposal_ids[i])
+        fronts[user_id] = pareto
+    return fronts
+
+
+def _leave_one_out_chunk(args):
+    # Process pool entry point
+    return leave_one_out(*args)
+
+
+class DominationEngine(object):
+    '''
+    Holds the voter bitmasks of each proposal of a generation and
+    calculates domination relations between them.
+    '''
+
+    def __init__(self, snapshot, proposal_ids=None):
+        '''
+        .. function:: __init__(snapshot[, proposal_ids=None])
+
+        :param snapshot: votes of the generation
+        :type snapshot: VoteSnapshot
+        :param proposal_ids: restrict the engine to these proposals
+        :type proposal_ids: iterable of int
+        '''
+        if proposal_ids is None:
+            self.proposal_ids = list(snapshot.proposal_ids)
+        else:
+            self.proposal_ids = sorted(proposal_ids)
+        self.voter_bits = dict()
+        empty = dict((pid, 0) for pid in self.proposal_ids)
+        self.endorsers = dict(empty)
+        self.qualified = dict(empty)
+        self.types = {'endorse': dict(empty),
+                      'oppose': dict(empty),
+                      'confused': dict(empty)}
+
+        for vote in snapshot.votes:
+            if vote.proposal_id not in self.endorsers:
+                continue
+            bit = self.voter_bit(vote.user_id)
+            self.types[vote.endorsement_type][vote.proposal_id] |= bit
+            if vote.qualified:
+                self.qualified[vote.proposal_id] |= bit
+            if vote.endorsing:
+                self.endorsers[vote.proposal_id] |= bit
+
+    def voter_bit(self, user_id):
+        '''
+        .. function:: voter_bit(user_id)
+
+        Returns the bit assigned to a voter, assigning a new one on first use.
+
+        :param user_id: user ID
+        :type user_id: int
+        :rtype: int
+        '''
+        bit = self.voter_bits.get(user_id)
+        if bit is None:
+            bit = 1 << len(self.voter_bits)
+            self.voter_bits[user_id] = bit
+        return bit
+
+    def same_votes(self, pid1, pid2):
+        '''
+        .. function:: same_votes(pid1, pid2)
+
+        True if both proposals received exactly the same votes.
+
+        :rtype: boolean
+        '''
+        for masks in self.types.values():
+            if masks[pid1] != masks[pid2]:
+                return False
+        return True
+
+    def converts_to_full_domination(self, pid_a, pid_b):
+        '''
+        .. function:: converts_to_full_domination(pid_a, pid_b)
+
+        A partial domination of A over B becomes full if A? < B- and B? < A+
+
+        :rtype: boolean
+        '''
+        confused = self.types['confused']
+        return is_proper_subset(confused[pid_a], self.types['oppose'][pid_b])\
+            and is_proper_subset(confused[pid_b], self.types['endorse'][pid_a])
+
+    def relation_qualified(self, pid1, pid2):
+        '''
+        .. function:: relation_qualified(pid1, pid2)
+
+        Calculates the algorithm 2 relation of proposal 1 to proposal 2,
+        considering only the voters who understood both proposals.
+
+        :rtype: int
+        '''
+        if pid1 == pid2 or self.same_votes(pid1, pid2):
+            return -1
+
+        qualified = self.qualified[pid1] & self.qualified[pid2]
+        voters1 = self.endorsers[pid1] & qualified
+        voters2 = self.endorsers[pid2] & qualified
+
+        if voters1 == voters2:
+            return -2
+
+        confused = self.types['confused']
+        partial_understanding = confused[pid1] != 0 or confused[pid2] != 0
+
+        if is_proper_subset(voters2, voters1):
+            # proposal 1 dominates
+            if not partial_understanding:
+                return 1
+            elif self.converts_to_full_domination(pid1, pid2):
+                return 5
+            else:
+                return 3
+        elif is_proper_subset(voters1, voters2):
+            # proposal 1 dominated
+            if not partial_understanding:
+                return 2
+            elif self.converts_to_full_domination(pid2, pid1):
+                return 6
+            else:
+                return 4
+        else:
+            return 0
+
+    def relation_original(self, pid1, pid2):
+        '''
+        .. function:: relation_original(pid1, pid2)
+
+        Calculates the algorithm 1 relation of proposal 1 to proposal 2.
+
+        :rtype: int
+        '''
+        if pid1 == pid2:
+            return -1
+
+        voters1 = self.endorsers[pid1]
+        voters2 = self.endorsers[pid2]
+
+        if voters1 == voters2:
+            return -2
+        elif is_proper_subset(voters2, voters1):
+            return 1
+        elif is_proper_subset(voters1, voters2):
+            return 2
+        else:
+            return 0
+
+    def domination_map(self, algorithm=2):
+        '''
+        .. function:: domination_map([algorithm=2])
+
+        Calculates the complete map of dominations in the format returned by
+        Question.calculate_domination_map(). Each pair is evaluated once and
+        the reverse relation filled in from REVERSE_RELATION.
+
+        :param algorithm: algorithm version number
+        :type algorithm: int
+        :rtype: dict
+        '''
+        if algorithm == 2:
+            relation = self.relation_qualified
+        else:
+            relation = self.relation_original
+
+        domination_map = dict((pid, {pid: -1}) for pid in self.proposal_ids)
+
+        for (index, pid1) in enumerate(self.proposal_ids):
+            for pid2 in self.proposal_ids[index + 1:]:
+                value = relation(pid1, pid2)
+                domination_map[pid1][pid2] = value
+                domination_map[pid2][pid1] = REVERSE_RELATION[value]
+
+        return domination_map
+
+    def update_domination_map(self, domination_map, proposal_ids,
+                              algorithm=2):
+        '''
+        .. function:: update_domination_map(domination_map, proposal_ids
+                                            [, algorithm=2])
+
+        Recalculates in place the rows and columns of the given proposals
+        in a map previously returned by domination_map(). Only the relations
+        of a proposal depend on its votes, so after a vote on it this
+        brings the map up to date with one relation per other proposal.
+
+        :param domination_map: map covering the proposals of the engine
+        :type domination_map: dict
+        :param proposal_ids: IDs of the proposals whose votes changed
+        :type proposal_ids: iterable of int
+        :param algorithm: algorithm version number
+        :type algorithm: int
+        :rtype: dict
+        '''
+        if algorithm == 2:
+            relation = self.relation_qualified
+        else:
+            relation = self.relation_original
+
+        for pid1 in proposal_ids:
+            domination_map[pid1][pid1] = -1
+            for pid2 in self.proposal_ids:
+                if pid2 == pid1:
+                    continue
+                value = relation(pid1, pid2)
+                domination_map[pid1][pid2] = value
+                domination_map[pid2][pid1] = REVERSE_RELATION[value]
+
+        return domination_map
+
+    def pareto_front(self, exclude_user_id=None):
+        '''
+        .. function:: pareto_front([exclude_user_id=None])
+
+        Calculates the algorithm 1 pareto front of the proposals of the
+        engine, optionally ignoring the endorsements of one user.
+
+        :param exclude_user_id: ID of the user to exclude
+        :type exclude_user_id: int
+        :rtype: tuple (list of pareto proposal IDs,
+            dict of dominated proposal ID to a dominating proposal ID)
+        '''
+        keep = ~self.voter_bits.get(exclude_user_id, 0)
+        return skyline(dict((pid, mask & keep)
+                            for (pid, mask) in self.endorsers.items()))
+
+    def dominators(self, domination_map=None):
+        '''
+        .. function:: dominators([domination_map=None])
+
+        Returns, for each proposal of the engine, a bitmask over the
+        positions in proposal_ids of the proposals whose endorsers are a
+        proper superset of its own.
+
+        :param domination_map: an algorithm 1 domination map covering the
+            proposals of the engine, used instead of comparing the masks
+        :type domination_map: dict
+        :rtype: list of int
+        '''
+        dominators = list()
+        for pid1 in self.proposal_ids:
+            mask = 0
+            for (position, pid2) in enumerate(self.proposal_ids):
+                if domination_map is not None:
+                    dominated = domination_map[pid1][pid2] == 2
+                else:
+                    dominated = is_proper_subset(self.endorsers[pid1],
+                                                 self.endorsers[pid2])
+                if dominated:
+                    mask |= 1 << position
+            dominators.append(mask)
+        return dominators
+
+    def leave_one_out_pareto_fronts(self, user_ids, domination_map=None,
+                                    processes=1):
+        '''
+        .. function:: leave_one_out_pareto_fronts(user_ids
+                                                  [, domination_map=None,
+                                                  processes=1])
+
+        Calculates the algorithm 1 pareto front of the proposals of the
+        engine excluding each of the users in turn. See leave_one_out().
+
+        :param user_ids: IDs of the users to exclude
+        :type user_ids: iterable of int
+        :param domination_map: an algorithm 1 domination map covering the
+            proposals of the engine
+        :type domination_map: dict
+        :param processes: number of worker processes to split the users
+            between
+        :type processes: int
+        :rtype: dict of user ID to set of pareto proposal IDs
+        '''
+        masks = [self.endorsers[pid] for pid in self.proposal_ids]
+        dominators = self.dominators(domination_map)
+        user_bits = [(user_id, self.voter_bits.get(user_id, 0))
+                     for user_id in user_ids]
+
+        if processes > 1 and len(user_bits) > processes:
+            chunks = [(self.proposal_ids, masks, dominators,
+                       user_bits[i::processes]) for i in range(processes)]
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(_leave_one_out_chunk, chunks)
+            finally:
+                pool.close()
+                pool.join()
+            fronts = dict()
+            for result in results:
+                fronts.update(result)
+        else:
+            fronts = leave_one_out(self.proposal_ids, masks, dominators,
+                                   user_bits)
+
+        return dict((user_id, set(pareto))
+                    for (user_id, pareto) in fronts.items())
+
+    def dominators_excluding(self, proposal_id, candidate_ids,
+                             exclude_user_id):
+        '''
+        .. function:: dominators_excluding(proposal_id, candidate_ids,
+                                           exclude_user_id)
+
+        Returns the candidates which dominate the proposal when the
+        endorsements of a user are ignored.
+
+        :param proposal_id: proposal ID
+        :type proposal_id: int
+        :param candidate_ids: IDs of the proposals which could dominate it
+        :type candidate_ids: iterable of int
+        :param exclude_user_id: ID of the user to exclude
+        :type exclude_user_id: int
+        :rtype: set of int
+        '''
+        keep = ~self.voter_bits.get(exclude_user_id, 0)
+        mask = self.endorsers[proposal_id] & keep
+        return set(pid for pid in candidate_ids
+                   if is_proper_subset(mask, self.endorsers[pid] & keep))
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Dot graph output
+
+The voting maps are written as Graphviz dot specifications through a
+DotWriter, which collects the fragments of the specification in a buffer
+and writes them out in chunks, either to a string or straight into the
+stdin of a dot process started by render_svg().
+
+Proposal tooltips are stripped of their markup once per proposal text and
+kept, so that redrawing a map does not parse the proposals again.
+'''
+
+import os
+import subprocess
+import string
+
+from HTMLParser import HTMLParser
+
+# Number of fragments collected before the buffer is written to the stream
+BUFFER_SIZE = 4096
+
+# Number of proposal tooltips kept before the tooltips are forgotten
+TOOLTIP_CACHE_SIZE = 10000
+
+# Maximum length of a proposal tooltip
+TOOLTIP_LENGTH = 800
+
+_tooltips = dict()
+
+
+class MLStripper(HTMLParser):
+    def __init__(self):
+        self.reset()
+        self.fed = []
+
+    def handle_data(self, d):
+        self.fed.append(d)
+
+    def get_data(self):
+        return ''.join(self.fed)
+
+
+class DotWriter(object):
+    '''
+    Buffered writer of a dot specification.
+
+    Without a stream the specification is kept in memory and returned by
+    close(). With a stream it is encoded as UTF-8 and written to the stream
+    each time BUFFER_SIZE fragments have been collected.
+    '''
+
+    def __init__(self, stream=None, buffer_size=BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._buffer = list()
+        self._chunks = list()
+
+    def write(self, *fragments):
+        '''
+        .. function:: write(*fragments)
+
+        Adds fragments of the specification.
+
+        :param fragments: strings
+        :type fragments: String
+        '''
+        self._buffer.extend(fragments)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        '''
+        .. function:: flush()
+
+        Writes the buffered fragments to the stream.
+        '''
+        if not self._buffer:
+            return
+        chunk = u''.join(self._buffer)
+        self._buffer = list()
+        if self.stream is None:
+            self._chunks.append(chunk)
+        else:
+            self.stream.write(chunk.encode('utf8'))
+
+    def close(self):
+        '''
+        .. function:: close()
+
+        Writes out the remaining fragments and returns the specification,
+        or None if it was written to a stream.
+
+        :rtype: String or None
+        '''
+        self.flush()
+        if self.stream is None:
+            return u''.join(self._chunks)
+        return None
+
+
+def strip_tags(html):
+    '''
+    .. function:: strip_tags(html)
+
+    Returns the text of an HTML fragment.
+
+    :param html: HTML fragment
+    :type html: String
+    :rtype: String
+    '''
+    s = MLStripper()
+    s.feed(html)
+    return s.get_data()
+
+
+def string_safe(s):
+    '''
+    .. function:: string_safe(s)
+
+    Returns the text of an HTML fragment on a single line with no double
+    quotes, for use in a quoted dot attribute.
+
+    :param s: HTML fragment
+    :type s: String
+    :rtype: String
+    '''
+    s = strip_tags(s)
+    s = string.replace(s, '"', "'")
+    s = string.replace(s, '\n', " ")
+    s = string.replace(s, '&nbsp;', " ")
+    s = string.replace(s, '\r', " ")
+    return s
+
+
+def proposal_tooltip(proposal):
+    '''
+    .. function:: proposal_tooltip(proposal)
+
+    Returns the tooltip of a proposal, made from its abstract or, if it has
+    none, from its blurb. The tooltip is made again only if the text of the
+    proposal has changed.
+
+    :param proposal: proposal
+    :type proposal: Proposal
+    :rtype: String
+    '''
+    if (proposal.abstract and len(proposal.abstract) > 0):
+        text = proposal.abstract
+    else:
+        text = proposal.blurb
+
+    cached = _tooltips.get(proposal.id)
+    if cached is not None and cached[0] == text:
+        return cached[1]
+
+    tooltip = string_safe(text)[:TOOLTIP_LENGTH]
+    if len(_tooltips) >= TOOLTIP_CACHE_SIZE:
+        _tooltips.clear()
+    _tooltips[proposal.id] = (text, tooltip)
+    return tooltip
+
+
+def render_svg(write_graph, svg_path, dot_path=None):
+    '''
+    .. function:: render_svg(write_graph, svg_path[, dot_path=None])
+
+    Renders a graph as an SVG file with Graphviz. The dot specification is
+    written by write_graph(stream) straight into the stdin of dot while it
+    is being built.
+
+    :param write_graph: function writing the dot specification to a stream
+    :type write_graph: callable
+    :param svg_path: path of the SVG file
+    :type svg_path: String
+    :param dot_path: path of the dot program, dot on the PATH if None
+    :type dot_path: String or None
+    :rtype: boolean
+    '''
+    process = subprocess.Popen([dot_path or 'dot', '-Tsvg', '-o', svg_path],
+                               stdin=subprocess.PIPE)
+    try:
+        write_graph(process.stdin)
+    finally:
+        process.stdin.close()
+        returncode = process.wait()
+    return returncode == 0 and os.path.isfile(svg_path)
@@ -25,23 +25,38 @@ Emails
 '''
 
 from . import app
-from email.mime.text import MIMEText
-from subprocess import Popen, PIPE
+from . import mailqueue
 import os
 from datetime import datetime, timedelta
 
 def send_email(subject, sender_email, recipient_email, text_body):
-    if os.environ.get('EMAIL_OFF', '0') == '0':
-        msg = MIMEText(text_body)
-        msg["From"] = sender_email
-        msg["To"] = recipient_email
-        msg["Subject"] = subject
-        p = Popen(["/usr/sbin/sendmail", "-t"], stdin=PIPE)
-        p.communicate(msg.as_string())
-        return p.returncode
-    else:
+    '''
+    .. function:: send_email(subject, sender_email, recipient_email, text_body)
+
+    Send an email. With MAIL_QUEUE set the email is queued for the mail
+    queue worker and 0 is returned at once, otherwise it is passed to
+    sendmail and its return code is returned.
+
+    :param subject: subject
+    :type subject: String
+    :param sender_email: sender address
+    :type sender_email: String
+    :param recipient_email: recipient address
+    :type recipient_email: String
+    :param text_body: plain text body
+    :type text_body: String
+    :rtype: int
+    '''
+    if os.environ.get('EMAIL_OFF', '0') != '0':
         app.logger.debug("emails.send_email: EMAIL_OFF is set - no email sent!")
         return 1
+    elif app.config['MAIL_QUEUE']:
+        mailqueue.get_mail_queue().put(subject, sender_email,
+                                       recipient_email, text_body)
+        return 0
+    else:
+        return mailqueue.sendmail(subject, sender_email,
+                                  recipient_email, text_body)
 
 def send_added_to_question_email(inviter, receiver, question):
     '''
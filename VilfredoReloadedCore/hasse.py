@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Hasse diagrams
+
+The voting maps draw the domination relations between proposals, and
+between voters, as Hasse diagrams: an edge is drawn from an element only to
+the elements it covers, those below it which are not below anything else
+below it, and the elements are laid out in levels from the top.
+
+The elements below each element are held as a bitmask, so the elements an
+element covers are found with one mask operation per element below it, and
+the levels are assigned in a single pass over the elements in topological
+order.
+'''
+
+
+def elements_of(mask, ordered):
+    '''
+    .. function:: elements_of(mask, ordered)
+
+    Returns the set of elements with a bit set in a mask.
+
+    :param mask: bitmask
+    :type mask: long
+    :param ordered: elements in bit order
+    :type ordered: list
+    :rtype: set
+    '''
+    elements = set()
+    while mask:
+        low = mask & -mask
+        elements.add(ordered[low.bit_length() - 1])
+        mask ^= low
+    return elements
+
+
+def covered(elements_below, elements=None):
+    '''
+    .. function:: covered(elements_below[, elements=None])
+
+    Returns the elements covered by each element: those below it which are
+    not below any other element below it. When elements_below is
+    transitive these are the edges of its Hasse diagram.
+
+    :param elements_below: set of elements below each element
+    :type elements_below: dict
+    :param elements: elements to find the covered elements of, all keys of
+        elements_below if None
+    :type elements: iterable or None
+    :rtype: dict of element to set
+    '''
+    if elements is None:
+        elements = elements_below.keys()
+
+    # Elements in bit order
+    ordered = list()
+    bits = dict()
+    masks = dict()
+
+    def bit(element):
+        if element not in bits:
+            bits[element] = 1 << len(ordered)
+            ordered.append(element)
+        return bits[element]
+
+    def below_mask(element):
+        mask = masks.get(element)
+        if mask is None:
+            mask = 0
+            for below in elements_below[element]:
+                mask |= bit(below)
+            masks[element] = mask
+        return mask
+
+    result = dict()
+    for element in elements:
+        further_below = 0
+        for below in elements_below[element]:
+            further_below |= below_mask(below)
+        result[element] = elements_of(below_mask(element) & ~further_below,
+                                      ordered)
+    return result
+
+
+def levels(elements_below, elements=None, top=None):
+    '''
+    .. function:: levels(elements_below[, elements=None, top=None])
+
+    Returns the level of each element: 0 if no element is above it,
+    otherwise one more than the greatest level of the elements above it.
+    Elements outside the given ones are ignored. Elements on or below a
+    cycle are given no level.
+
+    :param elements_below: set of elements below each element
+    :type elements_below: dict
+    :param elements: elements to assign levels to, all keys of
+        elements_below if None
+    :type elements: iterable or None
+    :param top: elements put on level 0 whatever is above them, the
+        elements with nothing above them if None
+    :type top: set or None
+    :rtype: dict of element to level
+    '''
+    if elements is None:
+        elements = elements_below.keys()
+
+    # Number of elements above each element not yet given a level
+    above = dict.fromkeys(elements, 0)
+    for element in above:
+        for below in elements_below[element]:
+            if below in above:
+                above[below] += 1
+
+    if top is None:
+        current = [element for (element, count) in above.iteritems()
+                   if count == 0]
+    else:
+        current = [element for element in above if element in top]
+        for element in current:
+            del above[element]
+
+    result = dict()
+    level = 0
+    while current:
+        following = list()
+        for element in current:
+            result[element] = level
+            for below in elements_below[element]:
+                if below in above:
+                    above[below] -= 1
+                    if above[below] == 0:
+                        following.append(below)
+        current = following
+        level += 1
+    return result
+
+
+def find_levels(elements_covered, elements=None):
+    '''
+    .. function:: find_levels(elements_covered[, elements=None])
+
+    Sorts the elements into levels based on which elements cover other
+    elements, as levels() but grouped by level. Elements on or below a
+    cycle are put on a level of their own at the bottom.
+
+    :param elements_covered: set of elements covered by each element
+    :type elements_covered: dict
+    :param elements: elements to sort, all keys of elements_covered if None
+    :type elements: iterable or None
+    :rtype: dict of level to set of elements
+    '''
+    if elements is None:
+        elements = elements_covered.keys()
+    elements = set(elements)
+
+    grouped = dict()
+    element_levels = levels(elements_covered, elements)
+    for (element, level) in element_levels.iteritems():
+        grouped.setdefault(level, set()).add(element)
+
+    remaining = elements.difference(element_levels)
+    if remaining:
+        grouped[len(grouped)] = remaining
+    return grouped
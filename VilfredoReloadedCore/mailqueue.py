@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Mail queue
+
+Outgoing emails are written to a spool directory and sent by a worker
+thread, so that a request inviting or notifying every participant of a
+question returns without waiting for the mail server. With MAIL_TRANSPORT
+'sendmail' each email is passed to sendmail, as send_email() does without
+the queue. With 'smtp' the worker sends up to MAIL_BATCH_SIZE emails over
+each connection Flask-Mail opens to MAIL_SERVER.
+
+Nothing is sent while MAIL_SUPPRESS_SEND is set: the emails stay in the
+spool until it is turned off.
+
+An email which cannot be sent is tried again after MAIL_RETRY_DELAY seconds,
+the delay doubling with each attempt, and is moved to the failed directory of
+the spool after MAIL_MAX_ATTEMPTS attempts.
+
+Each email is a file named after the time it is due, so the spool survives
+restarts and may be shared by several processes: a worker claims an email by
+renaming it before sending it.
+'''
+
+import cPickle as pickle
+import os
+import smtplib
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from email.mime.text import MIMEText
+from subprocess import Popen, PIPE
+
+from flask.ext.mail import Message
+
+from . import app
+
+QUEUED = '.mail'
+CLAIMED = '.sending'
+# Seconds after which an email claimed by a worker which died is sent again
+CLAIM_TIMEOUT = 60 * 60
+SENDMAIL = '/usr/sbin/sendmail'
+
+
+def sendmail(subject, sender_email, recipient_email, text_body):
+    '''
+    .. function:: sendmail(subject, sender_email, recipient_email, text_body)
+
+    Passes an email to sendmail and returns its return code.
+
+    :param subject: subject
+    :type subject: String
+    :param sender_email: sender address
+    :type sender_email: String
+    :param recipient_email: recipient address
+    :type recipient_email: String
+    :param text_body: plain text body
+    :type text_body: String
+    :rtype: int
+    '''
+    msg = MIMEText(text_body)
+    msg["From"] = sender_email
+    msg["To"] = recipient_email
+    msg["Subject"] = subject
+    p = Popen([SENDMAIL, "-t"], stdin=PIPE)
+    p.communicate(msg.as_string())
+    return p.returncode
+
+
+class MailQueue(object):
+    '''
+    Spool of outgoing emails.
+    '''
+
+    def __init__(self, directory, batch_size=50, max_attempts=5,
+                 retry_delay=60, interval=10, transport='sendmail'):
+        if transport not in ('sendmail', 'smtp'):
+            raise ValueError('Unknown MAIL_TRANSPORT %s' % transport)
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, 'failed')
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.interval = interval
+        self.transport = transport
+        self._suppressed = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        for path in (self.directory, self.failed_directory):
+            if not os.path.exists(path):
+                os.makedirs(path)
+
+    def put(self, subject, sender_email, recipient_email, text_body):
+        '''
+        .. function:: put(subject, sender_email, recipient_email, text_body)
+
+        Queues an email and wakes the worker, starting it on first use.
+
+        :param subject: subject
+        :type subject: String
+        :param sender_email: sender address
+        :type sender_email: String
+        :param recipient_email: recipient address
+        :type recipient_email: String
+        :param text_body: plain text body
+        :type text_body: String
+        '''
+        self._write(dict(subject=subject,
+                         sender=sender_email,
+                         recipient=recipient_email,
+                         body=text_body,
+                         attempts=0),
+                    time.time())
+        self._start_worker()
+        self._wakeup.set()
+
+    def send_queued(self):
+        '''
+        .. function:: send_queued()
+
+        Sends the emails which are due in batches until none is left, and
+        returns the number of batches. Must be called in an application
+        context. Nothing is sent while Flask-Mail suppresses sending.
+
+        :rtype: int
+        '''
+        if app.extensions['mail'].suppress:
+            # Flask-Mail would drop the emails, keep them for later
+            if not self._suppressed and self.pending():
+                app.logger.warning('MAIL_SUPPRESS_SEND is set, leaving the '
+                                   'emails in %s', self.directory)
+                self._suppressed = True
+            return 0
+        self._suppressed = False
+        batches = 0
+        while True:
+            batch = self._claim()
+            if not batch:
+                return batches
+            self._send(batch)
+            batches += 1
+
+    def pending(self):
+        '''
+        .. function:: pending()
+
+        Returns the number of emails waiting to be sent, including those
+        waiting to be tried again.
+
+        :rtype: int
+        '''
+        return len([name for name in os.listdir(self.directory)
+                    if name.endswith(QUEUED)])
+
+    def connect(self):
+        '''
+        .. function:: connect()
+
+        Opens a connection to the mail server.
+
+        :rtype: flask_mail.Connection
+        '''
+        return app.extensions['mail'].connect()
+
+    def sendmail(self, message):
+        '''
+        .. function:: sendmail(message)
+
+        Passes a queued email to sendmail and returns its return code.
+
+        :param message: queued email
+        :type message: dict
+        :rtype: int
+        '''
+        return sendmail(message['subject'], message['sender'],
+                        message['recipient'], message['body'])
+
+    def _write(self, message, due):
+        # Written under a temporary name then renamed, so that no worker
+        # reads half an email
+        filename = '%017.6f-%s%s' % (due, uuid.uuid4().hex, QUEUED)
+        (handle, temp_path) = tempfile.mkstemp(suffix='.tmp',
+                                               dir=self.directory)
+        with os.fdopen(handle, 'wb') as temp_file:
+            pickle.dump(message, temp_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, os.path.join(self.directory, filename))
+
+    def _claim(self):
+        # The names sort in the order the emails are due
+        now = time.time()
+        claimed = list()
+        for name in sorted(os.listdir(self.directory)):
+            if len(claimed) >= self.batch_size:
+                break
+            if not name.endswith(QUEUED):
+                continue
+            if float(name.split('-', 1)[0]) > now:
+                break
+            path = os.path.join(self.directory, name)
+            try:
+                os.rename(path, path + CLAIMED)
+                os.utime(path + CLAIMED, None)
+            except OSError:
+                # Claimed by another worker
+                continue
+            claimed.append(path + CLAIMED)
+        return claimed
+
+    def _recover(self):
+        expired = time.time() - CLAIM_TIMEOUT
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(CLAIMED):
+                continue
+            try:
+                if os.path.getmtime(path) < expired:
+                    app.logger.warning('Requeuing abandoned email %s', name)
+                    os.rename(path, path[:-len(CLAIMED)])
+            except OSError:
+                continue
+
+    def _send(self, paths):
+        pending = list()
+        for path in paths:
+            try:
+                with open(path, 'rb') as message_file:
+                    pending.append((path, pickle.load(message_file)))
+            except (IOError, EOFError, pickle.UnpicklingError):
+                app.logger.exception('Unreadable email %s', path)
+                self._fail(path)
+
+        if self.transport == 'sendmail':
+            for (path, message) in pending:
+                try:
+                    returncode = self.sendmail(message)
+                except OSError as error:
+                    self._retry(path, message, error)
+                    continue
+                if returncode:
+                    self._retry(path, message,
+                                'sendmail returned %s' % returncode)
+                else:
+                    os.remove(path)
+            return
+
+        try:
+            with self.connect() as connection:
+                while pending:
+                    (path, message) = pending[0]
+                    try:
+                        connection.send(Message(message['subject'],
+                                                sender=message['sender'],
+                                                recipients=[message['recipient']],
+                                                body=message['body']))
+                    except (smtplib.SMTPRecipientsRefused,
+                            smtplib.SMTPSenderRefused,
+                            smtplib.SMTPDataError) as error:
+                        # Refused by the server, the connection is still usable
+                        self._retry(path, message, error)
+                    else:
+                        os.remove(path)
+                    pending.pop(0)
+        except (smtplib.SMTPException, socket.error) as error:
+            # The connection failed, the rest of the batch is tried again
+            for (path, message) in pending:
+                self._retry(path, message, error)
+
+    def _retry(self, path, message, error):
+        message['attempts'] += 1
+        if message['attempts'] >= self.max_attempts:
+            app.logger.error('Giving up sending "%s" to %s after %s attempts: %s',
+                             message['subject'], message['recipient'],
+                             message['attempts'], error)
+            self._fail(path)
+            return
+        delay = self.retry_delay * 2 ** (message['attempts'] - 1)
+        app.logger.warning('Failed to send "%s" to %s, retrying in %ss: %s',
+                           message['subject'], message['recipient'],
+                           delay, error)
+        self._write(message, time.time() + delay)
+        os.remove(path)
+
+    def _fail(self, path):
+        name = os.path.basename(path)[:-len(CLAIMED)]
+        os.rename(path, os.path.join(self.failed_directory, name))
+
+    def _start_worker(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work,
+                                                name='mail')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _work(self):
+        self._recover()
+        while True:
+            try:
+                with app.app_context():
+                    batches = self.send_queued()
+                if batches:
+                    app.logger.debug('Mail queue: sent %s batches', batches)
+            except Exception:
+                app.logger.exception('Mail queue failed')
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+
+_mail_queue = None
+_mail_queue_lock = threading.Lock()
+
+
+def get_mail_queue():
+    '''
+    .. function:: get_mail_queue()
+
+    Returns the mail queue of the process, creating it on first use.
+
+    :rtype: MailQueue
+    '''
+    global _mail_queue
+    with _mail_queue_lock:
+        if _mail_queue is None:
+            _mail_queue = MailQueue(
+                app.config['MAIL_SPOOL_DIRECTORY']
+                or os.path.join(app.config['WORK_FILE_DIRECTORY'], 'mail'),
+                batch_size=app.config['MAIL_BATCH_SIZE'],
+                max_attempts=app.config['MAIL_MAX_ATTEMPTS'],
+                retry_delay=app.config['MAIL_RETRY_DELAY'],
+                interval=app.config['MAIL_QUEUE_INTERVAL'],
+                transport=app.config['MAIL_TRANSPORT'])
+    return _mail_queue
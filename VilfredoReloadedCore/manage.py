@@ -30,5 +30,25 @@ migrate = Migrate(app, db)
 manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
+
+@manager.command
+def rebuild_co_participants():
+    '''Rebuild the co_participant table from the invitations'''
+    from VilfredoReloadedCore.database import db_session
+    from VilfredoReloadedCore.models import rebuild_co_participants
+    pairs = rebuild_co_participants()
+    db_session.commit()
+    print 'Rebuilt co_participant table with %s pairs' % pairs
+
+
+@manager.command
+def backfill_avatars():
+    '''Store the avatar paths of users from their avatar directories'''
+    from VilfredoReloadedCore.database import db_session
+    from VilfredoReloadedCore.models import User
+    avatars = User.backfill_avatars()
+    db_session.commit()
+    print 'Stored %s avatar paths' % avatars
+
 if __name__ == '__main__':
     manager.run()
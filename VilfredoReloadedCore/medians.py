@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Medians
+
+Coordinate-wise medians of the votes on each proposal, with the error
+triangle points of Question.get_endorsement_results(), and the geometric
+median of a set of votes.
+
+The coordinates of each proposal are sorted once. The error triangle points
+are the medians of the votes padded with a fixed value for each voter who
+did not vote on the proposal, which are read from the sorted coordinates
+without building and sorting the padded lists.
+'''
+
+import bisect
+import math
+
+# NumPy is listed in requirements/base.txt; when it is missing, medians are
+# calculated in pure Python
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Coordinates given to the voters who did not vote on a proposal for each
+# corner of the error triangle
+ERROR_POINTS = {'o_error': (0, 0),
+                'e_error': (1, 0),
+                'c_error': (0.5, 1)}
+
+
+def sort_values(values):
+    '''
+    .. function:: sort_values(values)
+
+    Sorts a list of coordinates.
+
+    :param values: coordinates
+    :type values: list of float
+    :rtype: list of float
+    '''
+    if numpy is not None and None not in values:
+        return numpy.sort(numpy.array(values, dtype=float)).tolist()
+    return sorted(values)
+
+
+def padded_median(sorted_values, value=None, count=0):
+    '''
+    .. function:: padded_median(sorted_values[, value=None, count=0])
+
+    Returns the median of the sorted values with count copies of value
+    added, as median(sorted_values + [value] * count) would.
+
+    :param sorted_values: sorted coordinates
+    :type sorted_values: list of float
+    :param value: padding value
+    :type value: float
+    :param count: number of copies of the padding value
+    :type count: int
+    :rtype: float
+    '''
+    length = len(sorted_values) + count
+    # The padding goes after the equal values, as with a stable sort
+    position = bisect.bisect_right(sorted_values, value) if count else 0
+
+    def item(index):
+        if index < position:
+            return sorted_values[index]
+        elif index < position + count:
+            return value
+        return sorted_values[index - count]
+
+    if not length % 2:
+        return (item(length / 2) + item(length / 2 - 1)) / 2.0
+    return item(length / 2)
+
+
+def median(values):
+    '''
+    .. function:: median(values)
+
+    Returns the median of a list of floats.
+
+    :param values: list of floats
+    :type values: list
+    :rtype: float
+    '''
+    return padded_median(sort_values(values))
+
+
+def endorsement_medians(coordinates, voter_count):
+    '''
+    .. function:: endorsement_medians(coordinates, voter_count)
+
+    Calculates the median vote on each proposal and, when some voters did
+    not vote on a proposal, the corners of its error triangle.
+
+    :param coordinates: (list of mapx, list of mapy) of each proposal ID
+    :type coordinates: dict
+    :param voter_count: number of voters in the generation
+    :type voter_count: int
+    :rtype: dict of proposal ID to dict with the keys 'median' and, if some
+        voters did not vote on it, 'o_error', 'e_error' and 'c_error'
+    '''
+    results = dict()
+    for (pid, (mapx, mapy)) in coordinates.iteritems():
+        sorted_x = sort_values(mapx)
+        sorted_y = sort_values(mapy)
+        result = {'median': {'medx': padded_median(sorted_x),
+                             'medy': padded_median(sorted_y)}}
+
+        not_voted = voter_count - len(mapx)
+        if not_voted > 0:
+            for (name, (x, y)) in ERROR_POINTS.iteritems():
+                result[name] = {'mapx': padded_median(sorted_x, x, not_voted),
+                                'mapy': padded_median(sorted_y, y, not_voted)}
+        results[pid] = result
+    return results
+
+
+def geometric_median(points, tolerance=1e-7, max_iterations=50):
+    '''
+    .. function:: geometric_median(points[, tolerance=1e-7,
+                                   max_iterations=50])
+
+    Finds the geometric median of a list of points with Weiszfeld's
+    algorithm, starting from their mean. Stops when the candidate moves
+    less than tolerance, or lands on one of the points.
+
+    :param points: list of [x, y]
+    :type points: list
+    :param tolerance: distance under which the candidate has converged
+    :type tolerance: float
+    :param max_iterations: maximum number of iterations
+    :type max_iterations: int
+    :rtype: list [x, y], or None if there are no points
+    '''
+    if len(points) == 0:
+        return None
+    elif len(points) == 1:
+        return list(points[0])
+
+    if numpy is not None:
+        return _geometric_median_numpy(points, tolerance, max_iterations)
+
+    count = float(len(points))
+    candidate = [sum(point[0] for point in points) / count,
+                 sum(point[1] for point in points) / count]
+    for iteration in range(max_iterations):
+        numerator_x = numerator_y = denominator = 0.0
+        for (x, y) in points:
+            distance = math.hypot(candidate[0] - x, candidate[1] - y)
+            if distance == 0:
+                return candidate
+            numerator_x += x / distance
+            numerator_y += y / distance
+            denominator += 1 / distance
+        following = [numerator_x / denominator, numerator_y / denominator]
+        step = math.hypot(following[0] - candidate[0],
+                          following[1] - candidate[1])
+        candidate = following
+        if step < tolerance:
+            break
+    return candidate
+
+
+def _geometric_median_numpy(points, tolerance, max_iterations):
+    points = numpy.array(points, dtype=float)
+    candidate = points.mean(axis=0)
+    for iteration in range(max_iterations):
+        distances = numpy.sqrt(((points - candidate) ** 2).sum(axis=1))
+        if (distances == 0).any():
+            break
+        weights = 1 / distances
+        following = (points * weights[:, numpy.newaxis]).sum(axis=0)\
+            / weights.sum()
+        step = numpy.sqrt(((following - candidate) ** 2).sum())
+        candidate = following
+        if step < tolerance:
+            break
+    return candidate.tolist()
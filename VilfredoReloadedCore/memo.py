@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Request memo
+
+Model methods decorated with memoized() are called once per request for the
+same object and arguments, the results being kept on flask.g. Listing the
+questions of a user asks each question for the same counts several times
+over, each one a query.
+
+The memo is forgotten whenever the session is flushed, committed or rolled
+back, so that a write endpoint never reads a result from before its own
+changes. invalidate() forgets it explicitly.
+
+The queries run by each memoized call are counted, and the number of hits
+and of queries avoided is logged at the end of each request.
+'''
+
+import functools
+
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import app
+
+
+def _memo():
+    if not has_app_context():
+        return None
+    memo = getattr(g, '_memo', None)
+    if memo is None:
+        memo = g._memo = dict()
+        if not hasattr(g, '_memo_hits'):
+            g._memo_hits = 0
+            g._memo_queries_avoided = 0
+        if not hasattr(g, '_memo_queries'):
+            g._memo_queries = 0
+    return memo
+
+
+def _key_of(value):
+    # Objects are keyed by their identity in the database
+    if hasattr(value, '__tablename__'):
+        return (value.__tablename__, value.id)
+    return value
+
+
+def memoized(method):
+    '''
+    .. function:: memoized(method)
+
+    Decorates a model method so that its result is kept for the rest of the
+    request, keyed by the method, the id of the object and the arguments.
+    Outside an application context, for objects not yet saved and for
+    unhashable arguments the method is simply called.
+
+    The result is shared by every caller in the request, so only methods
+    returning values which are not modified should be memoized.
+
+    :param method: model method
+    :type method: function
+    :rtype: function
+    '''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        memo = _memo()
+        if memo is None or self.id is None:
+            return method(self, *args, **kwargs)
+
+        key = (self.__tablename__, method.__name__, self.id,
+               tuple(_key_of(arg) for arg in args),
+               tuple(sorted((name, _key_of(arg))
+                            for (name, arg) in kwargs.iteritems())))
+        try:
+            (result, queries) = memo[key]
+        except TypeError:
+            return method(self, *args, **kwargs)
+        except KeyError:
+            pass
+        else:
+            g._memo_hits += 1
+            g._memo_queries_avoided += queries
+            return result
+
+        queries = g._memo_queries
+        result = method(self, *args, **kwargs)
+        # A flush in the call has forgotten the memo
+        memo = _memo()
+        memo[key] = (result, g._memo_queries - queries)
+        return result
+    return wrapper
+
+
+def invalidate():
+    '''
+    .. function:: invalidate()
+
+    Forgets the results kept for the current request.
+    '''
+    if has_app_context() and hasattr(g, '_memo'):
+        del g._memo
+
+
+def stats():
+    '''
+    .. function:: stats()
+
+    Returns the number of memo hits in the current request and the number
+    of queries they avoided.
+
+    :rtype: tuple
+    '''
+    if not has_app_context():
+        return (0, 0)
+    return (getattr(g, '_memo_hits', 0),
+            getattr(g, '_memo_queries_avoided', 0))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g._memo_queries = getattr(g, '_memo_queries', 0) + 1
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    invalidate()
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    invalidate()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    invalidate()
+
+
+@app.teardown_request
+def _log_stats(exception=None):
+    (hits, queries_avoided) = stats()
+    if hits:
+        app.logger.debug('Request memo: %s hits, %s queries avoided',
+                         hits, queries_avoided)
@@ -24,111 +24,73 @@
 Models
 '''
 
-from sqlalchemy import and_, or_, not_, event, distinct, func, text
+from sqlalchemy import and_, or_, not_, event, distinct, func, text, literal, select, exists, bindparam
 
 from sqlalchemy.exc import SQLAlchemyError
 
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.orm import attributes, Session
 
 from database import db_session, db
 
 import datetime, math, time, pytz
 
-import copy, os, glob
+import copy, os, glob, uuid, weakref
 
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from flask.ext.login import UserMixin
 
-from . import app, emails, utils
+from . import app, emails, utils, domination, votes, medians, render, dotgraph, hasse, memo
 
-from HTMLParser import HTMLParser
+from .cache import get_cache, LRUCache
 
-from flask import url_for
+from flask import url_for, has_request_context
 
 import cPickle as pickle
 
-##################################################
-# Functions to calculate Geometric Median
-##################################################
-def candMedian(dataPoints):
-    #Calculate the first candidate median as the geometric mean
-    tempX = 0.0
-    tempY = 0.0
-
-    for i in range(0,len(dataPoints)):
-        tempX += dataPoints[i][0]
-        tempY += dataPoints[i][1]
-
-    return [tempX/len(dataPoints),tempY/len(dataPoints)]
-
-def median(mylist):
-    sorts = sorted(mylist)
-    length = len(sorts)
-    if not length % 2:
-        return (sorts[length / 2] + sorts[length / 2 - 1]) / 2.0
-    return sorts[length / 2]
-
-def numersum(testMedian,dataPoint):
-    # Provides the numerator of the weiszfeld algorithm depending on whether you are adjusting the candidate x or y
-    return 1/math.sqrt((testMedian[0]-dataPoint[0])**2 + (testMedian[1]-dataPoint[1])**2)
-
-def denomsum(testMedian, dataPoints):
-    # Provides the denominator of the weiszfeld algorithm
-    print 'testMedian=' + str(testMedian)
-    temp = 0.0
-    for i in range(0,len(dataPoints)):
-        if testMedian == dataPoints:
-            continue
-        temp += 1/math.sqrt((testMedian[0] - dataPoints[i][0])**2 + (testMedian[1] - dataPoints[i][1])**2)
-    return temp
-
-def objfunc(testMedian, dataPoints):
-    # This function calculates the sum of linear distances from the current candidate median to all points
-    # in the data set, as such it is the objective function we are minimising.
-    temp = 0.0
-    for i in range(0,len(dataPoints)):
-        temp += math.sqrt((testMedian[0]-dataPoints[i][0])**2 + (testMedian[1]-dataPoints[i][1])**2)
-    return temp
-
-def findGeometricMedian(dataPoints):
-    '''
-        .. function:: findGeometricMedian(dataPoints)
-
-        Find the median from a list of floats.
+def save_object(obj, filename):
+    # Write to a temporary file and rename it so that readers never
+    # load a partly written file
+    tmp_filename = '%s.%s.tmp' % (filename, os.getpid())
+    with open(tmp_filename, 'wb') as output:
+        pickle.dump(obj, output, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp_filename, filename)
 
-        :param dataPoints: list of floats
-        :type dataPoints: List
-        :rtype: float
-        '''
-    if len(dataPoints) == 1:
-        return dataPoints[0]
+# Calls waiting for the commit of each session which has flushed changes
+_after_commit_calls = weakref.WeakKeyDictionary()
 
-    # numIter depends on how long it take to get a suitable convergence of objFunc
-    numIter = 50
-    testMedian = candMedian(dataPoints)
+def call_after_commit(function, *args, **kwargs):
+    '''
+    .. function:: call_after_commit(function, *args, **kwargs)
 
-    #minimise the objective function.
-    for x in range(0,numIter):
-        # print objfunc(testMedian,dataPoints)
-        denom = denomsum(testMedian,dataPoints)
-        nextx = 0.0
-        nexty = 0.0
+    Calls a function once the changes flushed by the session are committed,
+    or straight away if none are waiting. The call is dropped if the
+    transaction is rolled back.
 
-        for y in range(0,len(dataPoints)):
-            nextx += (dataPoints[y][0] * numersum(testMedian,dataPoints[y]))/denom
-            nexty += (dataPoints[y][1] * numersum(testMedian,dataPoints[y]))/denom
+    :param function: the function to call
+    :type function: callable
+    '''
+    calls = _after_commit_calls.get(db_session())
+    if calls is None:
+        function(*args, **kwargs)
+    else:
+        calls.append((function, args, kwargs))
 
-        testMedian = [nextx,nexty]
+def cache_result(key, value):
+    '''
+    .. function:: cache_result(key, value)
 
-    app.logger.debug(testMedian)
-    return testMedian
-##################################################
+    Saves a result in the result cache once the transaction it was
+    calculated in is committed. The keys include the vote version, so a
+    result calculated from votes which are rolled back must not be cached
+    under a version which the next vote will reuse.
 
-def save_object(obj, filename):
-    with open(filename, 'wb') as output:
-        pickle.dump(obj, output, pickle.HIGHEST_PROTOCOL)
-        output.close()
+    :param key: cache key
+    :type key: String
+    :param value: the result
+    :type value: object
+    '''
+    call_after_commit(get_cache().set, key, value)
 
 def enum(**enums):
     return type('Enum', (), enums)
@@ -140,6 +102,9 @@ QuestionPhaseType = enum(writing=1, voting=2, archive=3)
 map_path = app.config['MAP_PATH']
 work_file_dir = app.config['WORK_FILE_DIRECTORY']
 
+# Path of the default avatar, keyed by the default avatar directory
+default_avatar_cache = LRUCache(16, app.config['DEFAULT_AVATAR_CACHE_TIMEOUT'])
+
 def get_timestamp():
     return int(math.floor(time.time()))
 
@@ -169,7 +134,8 @@ def make_new_map_filename_hashed(question,
             algorithm=None])
 
         Create the hash filname for the voting map.
-        Uses current_voting_map() to distinguish changes between not understanding, opposing and endorsing.
+        Uses the vote version of the generation, which changes with every
+        vote, so computing the key does not read the votes.
 
         :param question: question
         :type question: Question
@@ -182,22 +148,15 @@ def make_new_map_filename_hashed(question,
     algorithm = algorithm or app.config['ALGORITHM_VERSION']
     generation = generation or question.generation
     thresholds = question.get_thresholds(generation=generation)
-    import hashlib, json, pickle
-    from flask import jsonify
+    import hashlib
     m = hashlib.md5()
     # Need to generate seperate cache filenames for different threshold settings
     m.update(str(question.id) + str(generation) + str(thresholds.mapx) + str(thresholds.mapy))
     m.update(str(app.config['ANONYMIZE_GRAPH']))
     m.update(str(algorithm))
-    voting_map = question.current_voting_map()
-    # app.logger.debug('******************* make_new_map_filename_hashed  START *********************************')
-    # app.logger.debug('*** voting_map ==> %s', voting_map)
-    m.update(json.dumps(voting_map))
-    hashed = m.hexdigest()
-    # app.logger.debug('***')
-    # app.logger.debug('*** hashed ==> %s', hashed)
-    # app.logger.debug('******************* make_new_map_filename_hashed  END *********************************')
-    return hashed
+    m.update(str(question.get_vote_version(generation)))
+    return m.hexdigest()
+
 
 def make_new_map_filename_hashed_old(question,
                                  generation=None,
@@ -309,17 +268,15 @@ def make_map_filename_hashed(question,
     '''
     algorithm = algorithm or app.config['ALGORITHM_VERSION']
     generation = generation or question.generation
-    import hashlib, json, pickle
-    from flask import jsonify
+    import hashlib
     m = hashlib.md5()
     m.update(str(question.id) + str(generation) + map_type)
     m.update(str(proposal_level_type) + str(user_level_type))
     m.update(str(app.config['ANONYMIZE_GRAPH']))
     m.update(str(algorithm))
-    all_endorsers = question.get_proposal_endorsers(generation)
-    # app.logger.debug('*******************make_map_filename_hashed::proposal_endorsers ==> %s', proposal_endorsers)
-    # app.logger.debug('make_map_filename_hashed::json ==> %s', json.dumps(proposal_endorsers))
-    m.update(json.dumps(all_endorsers))
+    thresholds = question.get_thresholds(generation=generation)
+    m.update(str(thresholds.mapx) + str(thresholds.mapy))
+    m.update(str(question.get_vote_version(generation)))
     return m.hexdigest()
 
 def make_map_filename(question_id,
@@ -457,6 +414,153 @@ def get_ids_from_proposals(proposals): #
     return ids
 
 
+def get_proposals_by_ids(proposal_ids):
+    '''
+    .. function:: get_proposals_by_ids(proposal_ids)
+
+    Fetch a set of proposals with a single query.
+
+    :param proposal_ids: list of proposal IDs
+    :type proposal_ids: List
+    :rtype: set
+    '''
+    if not proposal_ids:
+        return set()
+    return set(Proposal.query.filter(Proposal.id.in_(proposal_ids)).all())
+
+
+def get_users_by_ids(user_ids):
+    '''
+    .. function:: get_users_by_ids(user_ids)
+
+    Fetch a set of users with a single query.
+
+    :param user_ids: list of user IDs
+    :type user_ids: List
+    :rtype: set
+    '''
+    if not user_ids:
+        return set()
+    return set(User.query.filter(User.id.in_(list(user_ids))).all())
+
+
+def queue_voting_graph(filename, question_id, graph_method, **kwargs):
+    '''
+    .. function:: queue_voting_graph(filename, question_id, graph_method,
+                                     **kwargs)
+
+    Queues the render of a voting graph on the render queue, unless the
+    same map is already being rendered.
+
+    :param filename: hashed map filename
+    :type filename: String
+    :param question_id: question ID
+    :type question_id: int
+    :param graph_method: name of the Question method rendering the map
+    :type graph_method: String
+    :rtype: None, or False if the last render of the map failed
+    '''
+    queue = render.get_render_queue()
+    if queue.status(filename) == render.FAILED:
+        # Report the failure once, the next request renders again
+        queue.clear(filename)
+        return False
+    if queue.submit(filename, render_voting_graph, question_id, graph_method, **kwargs):
+        app.logger.debug("queue_voting_graph: queued %s", filename)
+    return None
+
+
+def render_voting_graph(question_id, graph_method, **kwargs):
+    '''
+    .. function:: render_voting_graph(question_id, graph_method, **kwargs)
+
+    Renders a voting graph on a render queue worker.
+
+    :param question_id: question ID
+    :type question_id: int
+    :param graph_method: name of the Question method rendering the map
+    :type graph_method: String
+    :rtype: String or Boolean
+    '''
+    question = Question.query.get(question_id)
+    if question is None:
+        return False
+    return getattr(question, graph_method)(**kwargs)
+
+
+def queue_endorsement_results(question_id, generation):
+    '''
+    .. function:: queue_endorsement_results(question_id, generation)
+
+    Queues the update of the endorsement results of a generation on the
+    render queue. Votes cast while the update is queued are covered by it,
+    and votes cast while it runs queue it once more, so a burst of votes
+    costs at most two updates.
+
+    :param question_id: question ID
+    :type question_id: int
+    :param generation: question generation
+    :type generation: int
+    '''
+    render.get_render_queue().resubmit(
+        'endorsement_results_%s_%s' % (question_id, generation),
+        update_endorsement_results, question_id, generation)
+
+
+def update_endorsement_results(question_id, generation):
+    '''
+    .. function:: update_endorsement_results(question_id, generation)
+
+    Updates and commits the endorsement results of a generation on a render
+    queue worker.
+
+    :param question_id: question ID
+    :type question_id: int
+    :param generation: question generation
+    :type generation: int
+    :rtype: Boolean
+    '''
+    question = Question.query.get(question_id)
+    if question is None:
+        return False
+    question.update_endorsement_results(generation)
+    db_session.commit()
+    return True
+
+
+def render_map_svg(write_graph, filepath):
+    '''
+    .. function:: render_map_svg(write_graph, filepath)
+
+    Renders a voting map with dotgraph.render_svg() into a temporary file
+    named for this render, then renames it to filepath.svg so that the map
+    is never served half done, even while another process renders the
+    same map.
+
+    :param write_graph: function writing the dot specification to a stream
+    :type write_graph: callable
+    :param filepath: path of the map without the extension
+    :type filepath: String
+    :rtype: boolean
+    '''
+    temp_path = '%s.%s.svg.tmp' % (filepath, uuid.uuid4().hex)
+    # It is required on some systems to set the path to the Graphviz
+    # dot file (Dreamhost, possibly because it uses Passenger)
+    try:
+        rendered = dotgraph.render_svg(write_graph,
+                                       temp_path,
+                                       app.config['GRAPHVIZ_DOT_PATH'])
+    except (OSError, IOError) as e:
+        app.logger.debug('Failed to run dot: %s', e)
+        rendered = False
+
+    if rendered:
+        os.rename(temp_path, filepath + '.svg')
+    elif os.path.isfile(temp_path):
+        os.remove(temp_path)
+    return rendered
+
+
 def get_ids_as_string_from_proposals(proposals): # fix?
     '''
     .. function:: get_ids_as_string_from_proposals(proposals)
@@ -523,6 +627,8 @@ class User(db.Model, UserMixin):
     password = db.Column(db.String(120), nullable=False)
     registered = db.Column(db.DateTime)
     last_seen = db.Column(db.DateTime)
+    # Path of the avatar thumbnail, None for the default avatar
+    avatar = db.Column(db.String(200))
 
     # 1:M
     questions = db.relationship('Question', backref='author', lazy='dynamic',
@@ -620,25 +726,67 @@ class User(db.Model, UserMixin):
         '''
         .. function:: get_default_avatar()
 
-        Return the path of the default avatar.
+        Return the path of the default avatar, found in the default avatar
+        directory at most once every DEFAULT_AVATAR_CACHE_TIMEOUT seconds.
 
         :rtype: string
         '''
-        avatar = ''
         current_dir = os.path.dirname(os.path.realpath(__file__))
-        app.logger.debug("current_dir => %s", current_dir)
         test_default_avatar_path = os.path.join(current_dir, app.config['UPLOADED_AVATAR_DEST'], 'default', '*')
+        avatar = default_avatar_cache.get(test_default_avatar_path)
+        if avatar is not None:
+            return avatar
+
+        avatar = ''
+        app.logger.debug("current_dir => %s", current_dir)
         files = glob.glob(test_default_avatar_path)
         if len(files) > 0:
             avatar = os.path.join(app.config['PROFILE_PICS'], 'default', os.path.basename(files[0]))
+        default_avatar_cache.set(test_default_avatar_path, avatar)
         return avatar
 
+    @staticmethod
+    def backfill_avatars():
+        '''
+        .. function:: backfill_avatars()
+
+        Store on each user the path of the avatar thumbnail found in the
+        user's avatar directory, for avatars saved before the path was
+        stored. The caller commits.
+
+        :rtype: int, the number of avatars found
+        '''
+        current_dir = os.path.dirname(os.path.realpath(__file__))
+        avatar_path = os.path.join(current_dir, app.config['UPLOADED_AVATAR_DEST'])
+        if not os.path.isdir(avatar_path):
+            return 0
+
+        avatars = list()
+        for dirName in os.listdir(avatar_path):
+            # One directory per user, named by the user id
+            if not dirName.isdigit():
+                continue
+            files = sorted(glob.glob(os.path.join(avatar_path, dirName, '*-thumb*')))
+            if len(files) > 0:
+                avatars.append({'user_id': int(dirName),
+                                'avatar': os.path.join(app.config['PROFILE_PICS'], dirName, os.path.basename(files[0]))})
+
+        if avatars:
+            table = User.__table__
+            db_session.execute(
+                table.update().
+                where(table.c.id == bindparam('user_id')).
+                values(avatar=bindparam('avatar')),
+                avatars)
+        return len(avatars)
+
     @staticmethod
     def resize_avatars(maxsize=100):
         '''
         .. function:: resize_avatars()
 
-        Resize user avatars to thumbnails.
+        Resize user avatars to thumbnails, then store the paths of the
+        thumbnails on the users with backfill_avatars() and commit.
 
         :rtype: None
         '''
@@ -691,6 +839,9 @@ class User(db.Model, UserMixin):
                 except IOError:
                     app.logger.debug("Failed to process file %s - perhaps not image", avatar_file)
 
+        User.backfill_avatars()
+        db_session.commit()
+
     def set_avatar(self, avatar):
         '''
         .. function:: set_avatar(avatar)
@@ -735,6 +886,7 @@ class User(db.Model, UserMixin):
         thumbnail_size = (100, 100)
         app.logger.debug("file_extension = %s", file_extension)
         thumbnail_outfile = os.path.join(avatar_path, thumbnail_filename)
+        self.avatar = None
         try:
             thumbnail = Image.open(avatar)
             thumbnail.thumbnail(thumbnail_size)
@@ -747,27 +899,18 @@ class User(db.Model, UserMixin):
         if not os.path.isfile(thumbnail_outfile):
             return False
         else:
-            return os.path.join(app.config['PROFILE_PICS'], str(self.id), thumbnail_filename)
+            self.avatar = os.path.join(app.config['PROFILE_PICS'], str(self.id), thumbnail_filename)
+            return self.avatar
 
     def get_avatar(self):
         '''
         .. function:: get_avatar()
 
-        Return the path of a user's avatar.
+        Return the path of a user's avatar, stored by set_avatar().
 
         :rtype: string
         '''
-        current_dir = os.path.dirname(os.path.realpath(__file__))
-        avatar = ''
-        test_user_avatar_path = os.path.join(current_dir, app.config['UPLOADED_AVATAR_DEST'], str(self.id), '*-thumb*')
-        app.logger.debug("test_user_avatar_path = %s", test_user_avatar_path)
-        files = glob.glob(test_user_avatar_path)
-        app.logger.debug("test_user_avatar_path = %s", files)
-        if len(files) > 0:
-            avatar = os.path.join(app.config['PROFILE_PICS'], str(self.id), os.path.basename(files[0]))
-        else:
-            avatar = User.get_default_avatar()
-        return avatar
+        return self.avatar or User.get_default_avatar()
 
     def support_comment(self, comment):
         '''
@@ -815,82 +958,88 @@ class User(db.Model, UserMixin):
 
         return invitations
 
-    def get_uninvited_associated_users_by_invitation(self, question):
-        '''
-        .. function:: get_uninvited_associated_users_by_invitation()
+    def _co_participant_ids(self):
+        # Ids of the users invited to a question this user is invited to
+        if app.config['CO_PARTICIPANT_TABLE']:
+            return db_session.query(CoParticipant.associate_id.label('user_id'))\
+                .filter(CoParticipant.user_id == self.id)\
+                .subquery()
+
+        questions = db_session.query(Invite.question_id)\
+            .filter(Invite.receiver_id == self.id)\
+            .subquery()
+        return db_session.query(Invite.receiver_id.label('user_id'))\
+            .join(questions, questions.c.question_id == Invite.question_id)\
+            .filter(Invite.receiver_id != self.id)\
+            .distinct()\
+            .subquery()
+
+    def _invited_by_ids(self, ignore_question_id=None):
+        # Ids of the users who sent invitations to this user or received
+        # them from this user
+        senders = db_session.query(Invite.sender_id.label('user_id'))\
+            .filter(Invite.receiver_id == self.id)
+        receivers = db_session.query(Invite.receiver_id.label('user_id'))\
+            .filter(Invite.sender_id == self.id)
+        if ignore_question_id:
+            app.logger.debug('get_associated_users - Ignore question = %s', ignore_question_id)
+            senders = senders.filter(Invite.question_id != ignore_question_id)
+            receivers = receivers.filter(Invite.question_id != ignore_question_id)
+        return senders.union(receivers).subquery()
+
+    def _uninvited(self, user_ids, question, after=None, limit=None):
+        # Users in the subquery who have not been invited to the question
+        query = db_session.query(User.id, User.username)\
+            .join(user_ids, user_ids.c.user_id == User.id)\
+            .filter(User.id != self.id)\
+            .filter(~exists().where(and_(Invite.question_id == question.id,
+                                         Invite.receiver_id == User.id)))\
+            .filter(~exists().where(and_(UserInvite.question_id == question.id,
+                                         UserInvite.receiver_id == User.id)))\
+            .order_by(User.id)
+        if after is not None:
+            query = query.filter(User.id > after)
+        if limit is not None:
+            query = query.limit(limit)
+        return [{'username': username, 'user_id': user_id}
+                for (user_id, username) in query.all()]
+
+    def get_uninvited_associated_users_by_invitation(self, question,
+                                                     after=None, limit=None):
+        '''
+        .. function:: get_uninvited_associated_users_by_invitation(question[, after=None, limit=None])
 
         Get all users who participated in OTHER questions also participated in
-        by this user.
+        by this user, in id order.
 
         :param question: question
         :type question: Question
+        :param after: only users with ids above this one
+        :type after: int or None
+        :param limit: maximum number of users
+        :type limit: int or None
         :rtype: list
         '''
-        invited_uids = set()
-        current_invites = question.invites.all()
-        for invite in current_invites:
-            invited_uids.add(invite.receiver_id)
-        new_invites = question.invites_sent.all()
-        for invite in new_invites:
-            invited_uids.add(invite.receiver_id)
-
-        users_by_invitation = self.get_users_by_invitation(ignore_question_id=question.id, ignore_user_ids=invited_uids)
-        uninvited_associates = list()
-        for user in users_by_invitation:
-            uninvited_associates.append({'username': user.username, 'user_id': user.id})
+        return self._uninvited(self._invited_by_ids(ignore_question_id=question.id),
+                               question, after, limit)
 
-        return uninvited_associates
-
-    def get_uninvited_associated_users(self, question):
+    def get_uninvited_associated_users(self, question, after=None, limit=None):
         '''
-        .. function:: get_uninvited_associated_users()
+        .. function:: get_uninvited_associated_users(question[, after=None, limit=None])
 
         Get all users who participated in OTHER questions also participated in
-        by this user.
+        by this user, in id order.
 
         :param question: question
         :type question: Question
+        :param after: only users with ids above this one
+        :type after: int or None
+        :param limit: maximum number of users
+        :type limit: int or None
         :rtype: list
         '''
-        invited_uids = set()
-        current_invites = question.invites.all()
-        for invite in current_invites:
-            invited_uids.add(invite.receiver_id)
-        new_invites = question.invites_sent.all()
-        for invite in new_invites:
-            invited_uids.add(invite.receiver_id)
-
-        invited_uids = list(invited_uids)
-
-        questions_participated = db_session.query(Invite.question_id)\
-            .filter(Invite.receiver_id == self.id)\
-            .all()
-
-        qids = set()
-        for item in questions_participated:
-            qids.add(item[0])
-        qids = list(qids)
-
-        associates = db_session.query(Invite.receiver_id)\
-            .filter(Invite.question_id.in_(qids))\
-            .filter(Invite.receiver_id != self.id)\
-            .filter(not_(Invite.receiver_id.in_(invited_uids)))\
-            .all()
-
-        uids = set()
-        for user in associates:
-            uids.add(user[0])
-
-        uids = list(uids)
-        users = db_session.query(User)\
-            .filter(User.id.in_(uids))\
-            .all()
-
-        uninvited_associates = list()
-        for user in users:
-            uninvited_associates.append({'username': user.username, 'user_id': user.id})
-
-        return uninvited_associates
+        return self._uninvited(self._co_participant_ids(),
+                               question, after, limit)
 
     def get_associated_user(self, userid):
         '''
@@ -902,31 +1051,10 @@ class User(db.Model, UserMixin):
         :type userid: int
         :rtype: User or None
         '''
-
-        questions_participated = db_session.query(Invite.question_id)\
-            .filter(Invite.receiver_id == self.id)\
-            .all()
-
-        qids = set()
-        for item in questions_participated:
-            qids.add(item[0])
-        qids = list(qids)
-
-        associates = db_session.query(Invite.receiver_id)\
-            .filter(Invite.question_id.in_(qids))\
-            .filter(Invite.receiver_id != self.id)\
-            .all()
-
-        uids = set()
-        for user in associates:
-            uids.add(user[0])
-
-        uids = list(uids)
-
-        if userid in uids:
-            return User.query.get(userid)
-        else:
-            return None
+        user_ids = self._co_participant_ids()
+        return User.query.join(user_ids, user_ids.c.user_id == User.id)\
+            .filter(User.id == userid)\
+            .first()
 
     def get_associated_users(self, page=None):
         '''
@@ -939,29 +1067,9 @@ class User(db.Model, UserMixin):
         '''
         page = page or 1
 
-        questions_participated = db_session.query(Invite.question_id)\
-            .filter(Invite.receiver_id == self.id)\
-            .all()
-
-        qids = set()
-        for item in questions_participated:
-            qids.add(item[0])
-        qids = list(qids)
-        app.logger.debug('get_associated_users - Associated Question IDs = %s', qids)
-
-        associates = db_session.query(Invite.receiver_id)\
-            .filter(Invite.question_id.in_(qids))\
-            .filter(Invite.receiver_id != self.id)\
-            .all()
-
-        uids = set()
-        for user in associates:
-            uids.add(user[0])
-
-        uids = list(uids)
-        app.logger.debug('get_associated_users - Associated User IDs = %s', uids)
-
-        query = User.query.filter((User.id.in_(uids)))
+        user_ids = self._co_participant_ids()
+        query = User.query.join(user_ids, user_ids.c.user_id == User.id)\
+            .order_by(User.id)
         return query.paginate(page, app.config['RESULTS_PER_PAGE'], False)
 
     def get_users_by_invitation(self,
@@ -980,31 +1088,12 @@ class User(db.Model, UserMixin):
 
         page = page or 1
 
-        query = db_session.query(Invite).\
-            filter(or_(Invite.sender_id == self.id,
-                       Invite.receiver_id == self.id))
-
-        if ignore_question_id:
-            app.logger.debug('get_associated_users - Ignore question = %s', ignore_question_id)
-            query = query.filter(Invite.question_id != ignore_question_id)
-            # query = query.filter(Invite.question_id.in_(ignore_question_ids))
-
-        invitations = query.all()
-
-        uids = set()
-        for invite in invitations:
-            uids.add(invite.sender_id)
-            uids.add(invite.receiver_id)
-        # Remove self
-        uids.remove(self.id)
+        user_ids = self._invited_by_ids(ignore_question_id)
+        user_query = User.query.join(user_ids, user_ids.c.user_id == User.id)\
+            .filter(User.id != self.id)
 
         if ignore_user_ids:
-            uids = uids - set(ignore_user_ids)
-
-        uids = list(uids)
-        app.logger.debug('get_associated_users - Associated User IDs = %s', uids)
-
-        user_query = User.query.filter(User.id.in_(uids))
+            user_query = user_query.filter(not_(User.id.in_(ignore_user_ids)))
 
         if paginate:
             return user_query.paginate(page, app.config['RESULTS_PER_PAGE'], False)
@@ -1112,19 +1201,31 @@ class User(db.Model, UserMixin):
             Comment.proposal_id == proposal.id,
             Comment.generation == generation)).all()
 
-    def get_active_questions(self): # shark
+    def get_active_questions(self, after=None, limit=None): # shark
         '''
-        .. function:: get_active_questions()
+        .. function:: get_active_questions([after=None, limit=None])
 
         Get all questions for this user for which he has permission,
         either through being the author or through having been invited.
+        With after or limit the questions are ordered by id, starting
+        after the question with id after.
 
+        :param after: id of the question before the first one returned
+        :type after: int or None
+        :param limit: maximum number of questions returned
+        :type limit: int or None
         :rtype: list
         '''
-        return db_session.query(Question).join(Invite).\
+        query = db_session.query(Question).join(Invite).\
             filter(Question.id == Invite.question_id).\
-            filter(Invite.receiver_id == self.id).\
-            all()
+            filter(Invite.receiver_id == self.id)
+        if after is not None or limit is not None:
+            query = query.order_by(Question.id)
+        if after is not None:
+            query = query.filter(Question.id > after)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
 
     def invite(self, receiver, question):
         # Only author can invite to own question and cannot invite himself
@@ -1160,18 +1261,77 @@ class User(db.Model, UserMixin):
         :rtype: boolean
         '''
         if (self.id == question.author.id and self.id not in receivers):
-            for receiver_id in receivers:
-                receiver = User.query.get(receiver_id)
-                if not receiver:
-                    continue
-                else:
-                    app.logger.debug('appending invite for user id %s', receiver)
-                    self.invites_sent.append(UserInvite(self, receiver, permissions, question.id))
-                    # send email notification to receiver
-                    emails.send_added_to_question_email(self, receiver, question)
+            self.invite_users(receivers, permissions, question)
             return True
         return False
 
+    def invite_users(self, receiver_ids, permissions, question):
+        '''
+        .. function:: invite_users(receiver_ids, permissions, question)
+
+        Create invitations to the question for a list of users and notify
+        them by email. The receivers are looked up in one query, users who
+        have already been invited are found in another, and the invitations
+        are inserted together. The caller commits.
+
+        Returns the outcome for each receiver id: 'invited', 'not_found',
+        'already_invited' if an earlier invitation has not been accepted,
+        'participant' if the user already participates, or 'author'.
+
+        :param receiver_ids: ids of the users to be invited
+        :type receiver_ids: list of int
+        :param permissions: permissions granted by the invitations
+        :type permissions: int
+        :param question: the author's question
+        :type question: Question
+        :rtype: dict
+        '''
+        receiver_ids = set(int(receiver_id) for receiver_id in receiver_ids)
+        outcomes = dict()
+        if self.id in receiver_ids:
+            outcomes[self.id] = 'author'
+            receiver_ids.remove(self.id)
+        if not receiver_ids:
+            return outcomes
+
+        receivers = dict((receiver.id, receiver) for receiver in
+                         User.query.filter(User.id.in_(receiver_ids)).all())
+        for receiver_id in receiver_ids.difference(receivers):
+            outcomes[receiver_id] = 'not_found'
+        if not receivers:
+            return outcomes
+
+        participants = db_session.query(
+            Invite.receiver_id, literal('participant'))\
+            .filter(Invite.question_id == question.id)\
+            .filter(Invite.receiver_id.in_(receivers.keys()))
+        invited = db_session.query(
+            UserInvite.receiver_id, literal('already_invited'))\
+            .filter(UserInvite.question_id == question.id)\
+            .filter(UserInvite.receiver_id.in_(receivers.keys()))
+        for (receiver_id, outcome) in participants.union_all(invited).all():
+            # A participant may also have an invitation not yet accepted
+            if outcomes.get(receiver_id) != 'participant':
+                outcomes[receiver_id] = outcome
+
+        new_receivers = sorted(receiver_id for receiver_id in receivers
+                               if receiver_id not in outcomes)
+        if new_receivers:
+            app.logger.debug('inserting invites for user ids %s', new_receivers)
+            db_session.execute(
+                UserInvite.__table__.insert(),
+                [{'sender_id': self.id,
+                  'receiver_id': receiver_id,
+                  'question_id': question.id,
+                  'permissions': permissions}
+                 for receiver_id in new_receivers])
+        for receiver_id in new_receivers:
+            outcomes[receiver_id] = 'invited'
+            # send email notification to receiver
+            emails.send_added_to_question_email(self, receivers[receiver_id],
+                                                question)
+        return outcomes
+
     @staticmethod
     def username_available(username):
         '''
@@ -1331,24 +1491,26 @@ class User(db.Model, UserMixin):
         '''
         generation = generation or question.generation
         thresholds = question.get_thresholds(generation=generation)
-        endorsements = self.endorsements.join(User.endorsements).\
-            join(Endorsement.proposal).filter(and_(
-                Endorsement.user_id == self.id,
-                Proposal.question_id == question.id,
-                Endorsement.generation == generation,
-                Endorsement.mapy < thresholds.mapy,
-                Endorsement.mapx >= thresholds.mapx)
-            ).all()
+        rows = db_session.query(Endorsement.proposal_id,
+                                Endorsement.mapx,
+                                Endorsement.mapy)\
+            .filter(Endorsement.user_id == self.id)\
+            .filter(Endorsement.question_id == question.id)\
+            .filter(Endorsement.generation == generation)\
+            .all()
+
+        endorsing = votes.endorsing_votes([row.mapx for row in rows],
+                                          [row.mapy for row in rows],
+                                          thresholds.mapx,
+                                          thresholds.mapy)
 
         proposal_ids = set()
+        for (row, is_endorsing) in zip(rows, endorsing):
+            if is_endorsing:
+                proposal_ids.add(row.proposal_id)
         if all_proposal_ids:
-            for endorsement in endorsements:
-                if endorsement.proposal_id in all_proposal_ids:
-                    proposal_ids.add(endorsement.proposal_id)
-            return proposal_ids
+            return proposal_ids & set(all_proposal_ids)
         else:
-            for endorsement in endorsements:
-                proposal_ids.add(endorsement.proposal_id)
             return proposal_ids
 
     def get_all_endorsememnts(self, question, generation=None):
@@ -1841,6 +2003,8 @@ class Invite(db.Model):
     Stores users invitaions to participate in questions
     '''
     __tablename__ = 'invite'
+    __table_args__ = (db.Index('ix_invite_question_receiver', 'question_id', 'receiver_id'),
+                      db.Index('ix_invite_receiver', 'receiver_id'))
 
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -1884,6 +2048,127 @@ class Invite(db.Model):
     
 
 
+class CoParticipant(db.Model):
+    '''
+    Stores the pairs of users invited to a common question, in both
+    directions, so that the associates of a user are read from one index.
+    Maintained as invitations are added and removed through the ORM, see
+    link_co_participants() for when it can drift from the invitations.
+    '''
+    __tablename__ = 'co_participant'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_co_participant_user', ondelete='CASCADE'),
+                        primary_key=True)
+    associate_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_co_participant_associate', ondelete='CASCADE'),
+                             primary_key=True)
+
+    def __init__(self, user_id, associate_id):
+        self.user_id = user_id
+        self.associate_id = associate_id
+
+
+def link_co_participants(connection, question_id, user_id):
+    '''
+    .. function:: link_co_participants(connection, question_id, user_id)
+
+    Records a user invited to a question as a co-participant of the other
+    participants, within the transaction of the invitation.
+
+    Each pair is inserted only if it is missing, by the statement itself, so
+    that concurrent invitations linking the same users do not fail. MySQL
+    and SQLite ignore the duplicates atomically. Other databases check for
+    the pair in the insert, which two transactions committing the same new
+    pair at the same moment can still both pass, so one of them fails.
+    The table only follows the invitations added and removed through the
+    ORM: "manage.py rebuild_co_participants" repairs any drift.
+
+    :param connection: database connection
+    :param question_id: question ID
+    :type question_id: int
+    :param user_id: user ID
+    :type user_id: int
+    '''
+    invites = Invite.__table__
+    table = CoParticipant.__table__
+    participants = connection.execute(
+        select([invites.c.receiver_id]).distinct().
+        where(and_(invites.c.question_id == question_id,
+                   invites.c.receiver_id != user_id,
+                   invites.c.receiver_id != None))
+    )
+    pairs = list()
+    for (associate_id,) in participants:
+        pairs.append({'user_id': user_id, 'associate_id': associate_id})
+        pairs.append({'user_id': associate_id, 'associate_id': user_id})
+    if not pairs:
+        return
+
+    if connection.dialect.name in ('mysql', 'sqlite'):
+        connection.execute(
+            table.insert().
+            prefix_with('IGNORE', dialect='mysql').
+            prefix_with('OR IGNORE', dialect='sqlite'),
+            pairs
+        )
+    else:
+        connection.execute(
+            text('INSERT INTO co_participant (user_id, associate_id) '
+                 'SELECT :user_id, :associate_id '
+                 'WHERE NOT EXISTS (SELECT 1 FROM co_participant '
+                 'WHERE user_id = :user_id AND associate_id = :associate_id)'),
+            pairs
+        )
+
+
+def unlink_co_participants(connection, user_id):
+    '''
+    .. function:: unlink_co_participants(connection, user_id)
+
+    Removes the co-participants of a user who no longer share a question
+    with the user, after an invitation of the user has been removed.
+
+    :param connection: database connection
+    :param user_id: user ID
+    :type user_id: int
+    '''
+    invites = Invite.__table__
+    table = CoParticipant.__table__
+    questions = select([invites.c.question_id]).\
+        where(invites.c.receiver_id == user_id)
+    associates = select([invites.c.receiver_id]).\
+        where(and_(invites.c.question_id.in_(questions),
+                   invites.c.receiver_id != None))
+    connection.execute(
+        table.delete().
+        where(and_(table.c.user_id == user_id,
+                   not_(table.c.associate_id.in_(associates))))
+    )
+    connection.execute(
+        table.delete().
+        where(and_(table.c.associate_id == user_id,
+                   not_(table.c.user_id.in_(associates))))
+    )
+
+
+def rebuild_co_participants():
+    '''
+    .. function:: rebuild_co_participants()
+
+    Rebuilds the co-participant table from the invitations, with one
+    statement. The caller commits.
+
+    :rtype: int, the number of pairs
+    '''
+    CoParticipant.query.delete()
+    db_session.execute(text(
+        'INSERT INTO co_participant (user_id, associate_id) '
+        'SELECT DISTINCT a.receiver_id, b.receiver_id '
+        'FROM invite a JOIN invite b ON a.question_id = b.question_id '
+        'WHERE a.receiver_id IS NOT NULL AND b.receiver_id IS NOT NULL '
+        'AND a.receiver_id != b.receiver_id'))
+    return CoParticipant.query.count()
+
+
 class PWDReset(db.Model):
     '''
     Stores data for password reset requests.
@@ -2085,6 +2370,18 @@ class Question(db.Model):
     VOTE_READ_COMMENT = 11
     PROPOSE_READ_COMMENT = 13
     VOTE_PROPOSE_READ_COMMENT = 15
+
+    # Keys of the counts from dashboard.get_question_counts()
+    DASHBOARD_COUNTS = ('proposal_count', 'inherited_proposal_count',
+                        'new_proposal_count', 'new_proposer_count',
+                        'participant_count', 'voters_voting_count',
+                        'completed_voter_count', 'finished_writing_count',
+                        'mapx', 'mapy', 'finished_writing', 'permissions')
+
+    # Fields of get_public() and get_anonymized() needing the counts
+    COUNTED_FIELDS = DASHBOARD_COUNTS + ('my_permissions', 'can_vote',
+                                         'can_propose', 'is_moderator',
+                                         'link', 'user_permissions')
     
     def set_thresholds(self, user, mapx, mapy, generation=None):
         '''
@@ -2132,37 +2429,33 @@ class Question(db.Model):
         db_session.execute(stmt, {"new_perm": new_permission, "qid": self.id, "old_perm": old_permission})
 
 
-    def get_anonymized(self, user=None):
+    def get_anonymized(self, user=None, counts=None, fields=None):
         '''
-        .. function:: get_anonymized()
+        .. function:: get_anonymized([user=None, counts=None, fields=None])
 
         Anonymize content
 
+        :param user: current user
+        :type user: User
+        :param counts: the question counts from
+            dashboard.get_question_counts(), queried if None
+        :type counts: dict or None
+        :param fields: fields to return, all fields if None
+        :type fields: set or None
         :rtype: dict
         '''
-        # Fetch current threshold coordinates for this generation
-        try:
-            threshold = self.thresholds\
-                .filter(Threshold.generation == self.generation).one()
-        except NoResultFound, e:
-            print "No threshold found for question " + str(self.id) + ' gen ' + str(self.generation)
-
+        if counts is None and utils.wants_field(fields, *Question.COUNTED_FIELDS):
+            counts = self.get_dashboard_counts(user)
+        elif counts is None:
+            counts = dict.fromkeys(Question.DASHBOARD_COUNTS)
 
-        inherited_proposal_count = self.get_inherited_proposal_count()
-        consensus_found = self.consensus_found(generation=self.generation-1)
-        completed_voter_count = self.get_completed_voter_count(generation=self.generation)
-        voters_voting_count = self.get_voters_voting_count()
+        consensus_found = None
+        if utils.wants_field(fields, 'consensus_found'):
+            consensus_found = self.consensus_found(generation=self.generation-1)
 
         finished_writing_count = None
-        users_finished_writing = list()
         if (self.phase == 'writing'):
-            finished_writing = db_session.query(FinishedWriting.user_id)\
-                    .filter(and_(FinishedWriting.question_id == self.id,
-                                 FinishedWriting.generation == self.generation))\
-                    .all()
-            for row in finished_writing:
-                users_finished_writing.append(row.user_id)
-            finished_writing_count = len(users_finished_writing)
+            finished_writing_count = counts['finished_writing_count']
 
         anonymized = {'id': self.id,
                 'url': url_for('api_get_questions', question_id=self.id), 
@@ -2178,24 +2471,24 @@ class Question(db.Model):
                 'voting_type': self.voting_type_id,
                 'question_type_name': self.question_type.name,
                 'author': app.config['ANONYMIZE_CONTENT'],
-                'proposal_count': self.get_proposal_count(),
-                'inherited_proposal_count' : inherited_proposal_count,
-                'new_proposal_count': self.get_new_proposal_count(),
-                'new_proposer_count': self.get_new_proposer_count(),
-                'participant_count': self.invites.count(),
+                'proposal_count': counts['proposal_count'],
+                'inherited_proposal_count' : counts['inherited_proposal_count'],
+                'new_proposal_count': counts['new_proposal_count'],
+                'new_proposer_count': counts['new_proposer_count'],
+                'participant_count': counts['participant_count'],
                 'consensus_found': consensus_found,
-                'mapx': threshold.mapx,
-                'mapy': threshold.mapy,
+                'mapx': counts['mapx'],
+                'mapy': counts['mapy'],
                 'current_user': user.username,
-                'completed_voter_count': completed_voter_count,
+                'completed_voter_count': counts['completed_voter_count'],
                 'finished_writing_count': finished_writing_count,
-                'voters_voting_count': voters_voting_count}
+                'voters_voting_count': counts['voters_voting_count']}
 
         
         # Add user permissions
         permissions = None
         if user:
-            if user.id in users_finished_writing:
+            if finished_writing_count is not None and counts['finished_writing']:
                 anonymized['finished_writing'] = 1
             else:
                 anonymized['finished_writing'] = 0
@@ -2204,7 +2497,7 @@ class Question(db.Model):
             else:
                 anonymized['is_author'] = False
 
-            permissions = self.get_permissions(user)
+            permissions = counts['permissions']
             if permissions:
                 anonymized['my_permissions'] = permissions
                 anonymized['can_vote'] = bool(Question.VOTE & permissions)
@@ -2218,7 +2511,8 @@ class Question(db.Model):
                     anonymized['link'] = utils.make_site_link(url_for('display_question', question_id=self.id))
                     
                 # Add participant permissions if user is question author or moderator
-                if user.id == self.author.id or permissions == Question.permission_types['MODERATE']:
+                if utils.wants_field(fields, 'user_permissions') and\
+                        (user.id == self.author.id or permissions == Question.permission_types['MODERATE']):
                     user_permissions = self.get_participant_permissions()
                     if user_permissions:
                         anonymized['user_permissions'] = user_permissions
@@ -2229,40 +2523,36 @@ class Question(db.Model):
                 anonymized['can_propose'] = False
                 anonymized['is_moderator'] = False
         
-        return anonymized
+        return utils.select_fields(anonymized, fields)
     
     
-    def get_public(self, user=None):
+    def get_public(self, user=None, counts=None, fields=None):
         '''
-        .. function:: get_public()
+        .. function:: get_public([user=None, counts=None, fields=None])
 
         Return public propoerties as string values for REST responses.
 
+        :param user: current user
+        :type user: User
+        :param counts: the question counts from
+            dashboard.get_question_counts(), queried if None
+        :type counts: dict or None
+        :param fields: fields to return, all fields if None
+        :type fields: set or None
         :rtype: dict
         '''
-        # Fetch current threshold coordinates for this generation fff
-        try:
-            threshold = self.thresholds\
-                .filter(Threshold.generation == self.generation).one()
-        except NoResultFound, e:
-            print "No threshold found for question " + str(self.id) + ' gen ' + str(self.generation)
-
+        if counts is None and utils.wants_field(fields, *Question.COUNTED_FIELDS):
+            counts = self.get_dashboard_counts(user)
+        elif counts is None:
+            counts = dict.fromkeys(Question.DASHBOARD_COUNTS)
 
-        inherited_proposal_count = self.get_inherited_proposal_count()
-        consensus_found = self.consensus_found(generation=self.generation-1)
-        completed_voter_count = self.get_completed_voter_count(generation=self.generation)
-        voters_voting_count = self.get_voters_voting_count()
+        consensus_found = None
+        if utils.wants_field(fields, 'consensus_found'):
+            consensus_found = self.consensus_found(generation=self.generation-1)
 
         finished_writing_count = None
-        users_finished_writing = list()
         if (self.phase == 'writing'):
-            finished_writing = db_session.query(FinishedWriting.user_id)\
-                    .filter(and_(FinishedWriting.question_id == self.id,
-                                 FinishedWriting.generation == self.generation))\
-                    .all()
-            for row in finished_writing:
-                users_finished_writing.append(row.user_id)
-            finished_writing_count = len(users_finished_writing)
+            finished_writing_count = counts['finished_writing_count']
 
         public = {'id': self.id,
                 'url': url_for('api_get_questions', question_id=self.id),
@@ -2279,25 +2569,27 @@ class Question(db.Model):
                 'question_type_name': self.question_type.name,
                 'author': self.author.username,
                 'author_url': url_for('api_get_users', user_id=self.user_id),
-                'avatar_url': app.config['PROTOCOL'] + os.path.join(app.config['SITE_DOMAIN'], self.author.get_avatar()),
                 'author_id': self.author.id,
-                'proposal_count': self.get_proposal_count(),
-                'inherited_proposal_count' : inherited_proposal_count,
-                'new_proposal_count': self.get_new_proposal_count(),
-                'new_proposer_count': self.get_new_proposer_count(),
-                'participant_count': self.invites.count(),
+                'proposal_count': counts['proposal_count'],
+                'inherited_proposal_count' : counts['inherited_proposal_count'],
+                'new_proposal_count': counts['new_proposal_count'],
+                'new_proposer_count': counts['new_proposer_count'],
+                'participant_count': counts['participant_count'],
                 'consensus_found': consensus_found,
-                'mapx': threshold.mapx,
-                'mapy': threshold.mapy,
+                'mapx': counts['mapx'],
+                'mapy': counts['mapy'],
                 'current_user': user.username,
-                'completed_voter_count': completed_voter_count,
+                'completed_voter_count': counts['completed_voter_count'],
                 'finished_writing_count': finished_writing_count,
-                'voters_voting_count': voters_voting_count}
+                'voters_voting_count': counts['voters_voting_count']}
+
+        if utils.wants_field(fields, 'avatar_url'):
+            public['avatar_url'] = app.config['PROTOCOL'] + os.path.join(app.config['SITE_DOMAIN'], self.author.get_avatar())
 
         # Add user permissions
         permissions = None
         if user:
-            if user.id in users_finished_writing:
+            if finished_writing_count is not None and counts['finished_writing']:
                 public['finished_writing'] = 1
             else:
                 public['finished_writing'] = 0
@@ -2306,7 +2598,7 @@ class Question(db.Model):
             else:
                 public['is_author'] = False
 
-            permissions = self.get_permissions(user)
+            permissions = counts['permissions']
             if permissions:
                 public['my_permissions'] = permissions
                 public['can_vote'] = bool(Question.VOTE & permissions)
@@ -2320,7 +2612,8 @@ class Question(db.Model):
                     public['link'] = utils.make_site_link(url_for('display_question', question_id=self.id))
                 
                 # Add participant permissions if user is question author or moderator ggg
-                if user.id == self.author.id or permissions == Question.permission_types['MODERATE']:
+                if utils.wants_field(fields, 'user_permissions') and\
+                        (user.id == self.author.id or permissions == Question.permission_types['MODERATE']):
                     user_permissions = self.get_participant_permissions()
                     if user_permissions:
                         public['user_permissions'] = user_permissions
@@ -2331,14 +2624,107 @@ class Question(db.Model):
                 public['can_propose'] = False
                 public['is_moderator'] = False
 
-        return public
+        return utils.select_fields(public, fields)
 
+    def get_dashboard_counts(self, user=None):
+        '''
+        .. function:: get_dashboard_counts([user=None])
 
-    def get_thresholds(self, generation=None):
-        generation = generation or self.generation
-        return self.thresholds.filter_by(generation=generation).first()
+        Returns the counts shown for this question in a list of questions,
+        as dashboard.get_question_counts() returns them for many questions
+        at once.
 
-    def get_not_invited(self):
+        :param user: current user
+        :type user: User or None
+        :rtype: dict
+        '''
+        threshold = self.get_thresholds()
+        if threshold is None:
+            app.logger.debug('No threshold found for question %s gen %s', self.id, self.generation)
+
+        users_finished_writing = list()
+        if (self.phase == 'writing'):
+            finished_writing = db_session.query(FinishedWriting.user_id)\
+                    .filter(and_(FinishedWriting.question_id == self.id,
+                                 FinishedWriting.generation == self.generation))\
+                    .all()
+            for row in finished_writing:
+                users_finished_writing.append(row.user_id)
+
+        return {'proposal_count': self.get_proposal_count(),
+                'inherited_proposal_count': self.get_inherited_proposal_count(),
+                'new_proposal_count': self.get_new_proposal_count(),
+                'new_proposer_count': self.get_new_proposer_count(),
+                'participant_count': self.invites.count(),
+                'voters_voting_count': self.get_voters_voting_count(),
+                'completed_voter_count': self.get_completed_voter_count(generation=self.generation),
+                'finished_writing_count': len(users_finished_writing),
+                'mapx': threshold.mapx if threshold else None,
+                'mapy': threshold.mapy if threshold else None,
+                'finished_writing': bool(user) and user.id in users_finished_writing,
+                'permissions': self.get_permissions(user) if user else 0}
+
+
+    @memo.memoized
+    def get_thresholds(self, generation=None):
+        generation = generation or self.generation
+        return self.thresholds.filter_by(generation=generation).first()
+
+    @memo.memoized
+    def get_vote_version(self, generation=None):
+        '''
+        .. function:: get_vote_version([generation=None])
+
+        Returns the number of changes made to the votes and proposals of
+        a generation followed by the salt of the last change, a cheap cache
+        key for the results calculated from them. The salt keeps the key
+        from being reused after the database is reset or restored.
+
+        :param generation: question generation.
+        :type generation: int
+        :rtype: String
+        '''
+        generation = generation or self.generation
+        row = db_session.query(VoteVersion.version, VoteVersion.salt)\
+            .filter(VoteVersion.question_id == self.id)\
+            .filter(VoteVersion.generation == generation)\
+            .first()
+        if row is None:
+            return '0'
+        return '%s.%s' % (row.version, row.salt)
+
+    def get_vote_snapshot(self, generation=None):
+        '''
+        .. function:: get_vote_snapshot([generation=None])
+
+        Loads the proposals and votes of a generation with a single query
+        and classifies the votes against the generation thresholds.
+
+        :param generation: question generation.
+        :type generation: int
+        :rtype: VoteSnapshot
+        '''
+        generation = generation or self.generation
+        thresholds = self.get_thresholds(generation=generation)
+
+        rows = db_session.query(QuestionHistory.proposal_id,
+                                Endorsement.user_id,
+                                Endorsement.mapx,
+                                Endorsement.mapy)\
+            .outerjoin(Endorsement,
+                       and_(Endorsement.proposal_id == QuestionHistory.proposal_id,
+                            Endorsement.generation == QuestionHistory.generation))\
+            .filter(QuestionHistory.question_id == self.id)\
+            .filter(QuestionHistory.generation == generation)\
+            .order_by(QuestionHistory.proposal_id, Endorsement.id)\
+            .all()
+
+        proposal_ids = set(row[0] for row in rows)
+        cast = [row for row in rows if row[1] is not None]
+        return votes.VoteSnapshot(generation, proposal_ids, cast,
+                                  thresholds.mapx, thresholds.mapy)
+
+    def get_not_invited(self):
         '''
         .. function:: get_not_invited()
 
@@ -2427,6 +2813,7 @@ class Question(db.Model):
 
         return participants
 
+    @memo.memoized
     def get_permissions(self, user):
         '''
         .. function:: get_permissions()
@@ -2447,8 +2834,10 @@ class Question(db.Model):
         '''
         .. function:: get_endorsement_results([generation=None])
 
-        Calculate the median x and y for all endorsements of all proposals for
-        this question.
+        Returns the median x and y for all endorsements of all proposals for
+        this question, as saved by update_endorsement_results() when the
+        votes last changed. Nothing is written to the database, the results
+        are calculated if they are missing from the result cache.
         Takes an optional generation value to check historic endorsements.
 
         :param generation: question generation
@@ -2459,80 +2848,120 @@ class Question(db.Model):
 
         app.logger.debug('get_endorsement_results called for generation %s', generation)
 
-        voter_count = self.get_voter_count(generation)
+        cache_key = self.get_endorsement_results_key(generation)
+        results = get_cache().get(cache_key)
+        if results is None:
+            results = self.calculate_endorsement_results(generation, save=False)
+            cache_result(cache_key, results)
+        return results
+
+    def update_endorsement_results(self, generation=None, snapshot=None):
+        '''
+        .. function:: update_endorsement_results([generation=None, snapshot=None])
+
+        Calculates the endorsement results of a generation, saves them in
+        the result cache for get_endorsement_results() and updates the
+        medians of the proposals. Called when the votes change and when the
+        question is moved on. The changes are committed by the caller.
+
+        :param generation: question generation
+        :type generation: int or None
+        :param snapshot: votes of the generation, loaded if not passed
+        :type snapshot: VoteSnapshot
+        :rtype: dict
+        '''
+        generation = generation or self.generation
+
+        results = self.calculate_endorsement_results(generation, snapshot)
+
+        # Update DB with proposal medians
+        for proposal in get_proposals_by_ids(results.keys()):
+            proposal.geomedx = results[proposal.id]['median']['medx']
+            proposal.geomedy = results[proposal.id]['median']['medy']
+
+        cache_result(self.get_endorsement_results_key(generation), results)
+        return results
+
+    def get_endorsement_results_key(self, generation=None):
+        '''
+        .. function:: get_endorsement_results_key([generation=None])
+
+        Key of the endorsement results of a generation in the result cache.
+
+        :param generation: question generation
+        :type generation: int or None
+        :rtype: String
+        '''
+        return 'endorsement_results_' + make_new_map_filename_hashed(self,
+                                                                     generation)
+
+    def calculate_endorsement_results(self, generation=None, snapshot=None, save=True):
+        '''
+        .. function:: calculate_endorsement_results([generation=None,
+                                                    snapshot=None,
+                                                    save=True])
+
+        Calculate the median x and y for all endorsements of all proposals for
+        this question.
+
+        :param generation: question generation
+        :type generation: int or None
+        :param snapshot: votes of the generation, loaded if not passed
+        :type snapshot: VoteSnapshot
+        :param save: save the domination info of the pareto front in the DB
+        :type save: boolean
+        :rtype: dict
+        '''
+        generation = generation or self.generation
+
+        snapshot = snapshot or self.get_vote_snapshot(generation)
+
+        voter_count = snapshot.voter_count()
         app.logger.debug("There were %s voters in generation %s", voter_count, generation)
 
-        proposals = self.get_proposals_list_by_id()
+        if not snapshot.votes:
+            return dict()
 
         # Fetch pareto ids
-        pareto = self.calculate_pareto_front(generation=generation)
+        pareto = self.calculate_pareto_front(generation=generation, save=save)
         pareto_ids = []
         for proposal in pareto:
             pareto_ids.append(proposal.id)
         app.logger.debug("pareto_ids =====> %s", pareto_ids)
 
-        endorsements = db_session.query(Endorsement)\
-                .filter(Endorsement.question_id == self.id)\
-                .filter(Endorsement.generation == generation)\
-                .all()
-
-        if not endorsements:
-            return dict()
-        else:
-            app.logger.debug("endorsements ==> %s", endorsements)
-            endorsement_data = dict()
-            for endorsement in endorsements:
+        # Fetch the usernames of all voters at once
+        usernames = dict(db_session.query(User.id, User.username)\
+            .filter(User.id.in_(snapshot.voter_ids()))\
+            .all())
 
-                pid = endorsement.proposal_id
-                if not pid in endorsement_data:
-                    endorsement_data.update({pid: {'mapx': [endorsement.mapx],
-                                                   'mapy': [endorsement.mapy],
-                                                   'voters': {endorsement.user_id: {'mapx': endorsement.mapx,
-                                                                                    'mapy': endorsement.mapy,
-                                                                                    'username' : endorsement.endorser.username}}}})
-                else:
-                    endorsement_data[pid]['mapx'].append(endorsement.mapx)
-                    endorsement_data[pid]['mapy'].append(endorsement.mapy)
-                    endorsement_data[pid]['voters'].update( {endorsement.user_id: {'mapx': endorsement.mapx,
-                                                                                   'mapy': endorsement.mapy,
-                                                                                   'username' : endorsement.endorser.username}} )
-
-            app.logger.debug("endorsement_data ==> %s", endorsement_data)
-
-            results = dict()
-            for (pid, coords) in endorsement_data.iteritems():
-                results.update( {pid: {'median': {'medx': median(coords['mapx']),
-                                                  'medy': median(coords['mapy'])},
-                                       'voters': coords['voters'],
-                                       'voter_count' : len(coords['voters']),
-                                       'pareto': pid in pareto_ids} } )
-
-                # Update DB with proposal medians
-                geomedx = median(coords['mapx'])
-                geomedy = median(coords['mapy'])
-                proposals[pid].geomedx = geomedx
-                proposals[pid].geomedy = geomedy
+        endorsement_data = dict()
+        for vote in snapshot.votes:
 
-                '''
-                1L: {'mapx': [0.75, 0.65, 0.631388, 0.497361, 0.428218], 'mapy': [0.46, 0.16, 0.634726, 0.598698, 0.710889]}
-                '''
-                # Add error triangle points
-                not_voted = voter_count - len(coords['mapx'])
-                if not_voted > 0:
+            pid = vote.proposal_id
+            if not pid in endorsement_data:
+                endorsement_data[pid] = {'mapx': [], 'mapy': [], 'voters': dict()}
+            endorsement_data[pid]['mapx'].append(vote.mapx)
+            endorsement_data[pid]['mapy'].append(vote.mapy)
+            endorsement_data[pid]['voters'][vote.user_id] = {'mapx': vote.mapx,
+                                                             'mapy': vote.mapy,
+                                                             'username' : usernames.get(vote.user_id)}
 
-                    results[pid]['o_error'] = {'mapx': median(coords['mapx'] + [0] * not_voted),
-                                               'mapy': median(coords['mapy'] + [0] * not_voted)}
-                    results[pid]['e_error'] = {'mapx': median(coords['mapx'] + [1] * not_voted),
-                                               'mapy': median(coords['mapy'] + [0] * not_voted)}
-                    results[pid]['c_error'] = {'mapx': median(coords['mapx'] + [0.5] * not_voted),
-                                               'mapy': median(coords['mapy'] + [1] * not_voted)}
+        app.logger.debug("endorsement_data ==> %s", endorsement_data)
 
-            app.logger.debug("results ==> %s", results)
+        vote_medians = medians.endorsement_medians(
+            dict((pid, (coords['mapx'], coords['mapy']))
+                 for (pid, coords) in endorsement_data.iteritems()),
+            voter_count)
 
-            # Commit medians to DB
-            db_session.commit()
+        results = dict()
+        for (pid, coords) in endorsement_data.iteritems():
+            results[pid] = vote_medians[pid]
+            results[pid].update({'voters': coords['voters'],
+                                 'voter_count' : len(coords['voters']),
+                                 'pareto': pid in pareto_ids})
 
-            return results
+        app.logger.debug("results ==> %s", results)
+        return results
 
     def consensus_found(self, algorithm=None):
         '''
@@ -2561,6 +2990,7 @@ class Question(db.Model):
                 return False
         return True
 
+    @memo.memoized
     def get_voters_voting_count(self, generation=None):
         '''
         .. function:: get_voter_count([generation=None])
@@ -2582,6 +3012,7 @@ class Question(db.Model):
         .having(func.count(Endorsement.id) >= 1)\
         .count()
 
+    @memo.memoized
     def get_completed_voter_count(self, generation=None):
         '''
         .. function:: get_voter_count([generation=None])
@@ -2642,6 +3073,7 @@ class Question(db.Model):
                         .filter(Proposal.generation_created < self.generation)\
                         .all()
 
+    @memo.memoized
     def get_inherited_proposal_count(self, generation=None):
         generation = generation or self.generation
         if generation == 1:
@@ -2653,6 +3085,7 @@ class Question(db.Model):
                         .filter(Proposal.generation_created < self.generation)\
                         .count()
 
+    @memo.memoized
     def get_new_proposal_count(self):
         return db_session.query(Proposal).join(QuestionHistory)\
                     .filter(QuestionHistory.question_id == self.id)\
@@ -2660,6 +3093,7 @@ class Question(db.Model):
                     .filter(Proposal.generation_created == self.generation)\
                     .count()
 
+    @memo.memoized
     def get_new_proposer_count(self):
         proposals = db_session.query(Proposal).join(QuestionHistory)\
                     .filter(QuestionHistory.question_id == self.id)\
@@ -2679,6 +3113,7 @@ class Question(db.Model):
             proposers.add(proposal.user_id)
         return len(proposers)
 
+    @memo.memoized
     def get_proposal_count(self, generation=None):
         generation = generation or self.generation
         return self.history\
@@ -2719,9 +3154,11 @@ class Question(db.Model):
 
         elif self.phase in {'voting', 'archive'}:
             algorithm = app.config['ALGORITHM_VERSION']
-            pareto = self.calculate_pareto_front(algorithm=algorithm)
+            pareto = self.save_pareto_front(algorithm=algorithm)
+            self.update_endorsement_results()
             self.phase = 'writing'
             self.generation = self.generation + 1
+            memo.invalidate()
             db_session.commit()
             # Copy pareto to next generation
             app.logger.debug('auto_move_on copying pareto proposals to QH table %s', pareto)
@@ -2761,9 +3198,11 @@ class Question(db.Model):
 
         elif self.phase in {'voting', 'archive'}:
             algorithm = app.config['ALGORITHM_VERSION']
-            pareto = self.calculate_pareto_front(algorithm=algorithm)
+            pareto = self.save_pareto_front(algorithm=algorithm)
+            self.update_endorsement_results()
             self.phase = 'writing'
             self.generation = self.generation + 1
+            memo.invalidate()
             db_session.commit()
             # Copy pareto to next generation
             app.logger.debug('author_move_on copying pareto proposals to QH table %s', pareto)
@@ -2812,9 +3251,11 @@ class Question(db.Model):
 
         elif self.phase in {'voting', 'archive'}:
             algorithm = app.config['ALGORITHM_VERSION']
-            pareto = self.calculate_pareto_front(algorithm=algorithm)
+            pareto = self.save_pareto_front(algorithm=algorithm)
+            self.update_endorsement_results()
             self.phase = 'writing'
             self.generation = self.generation + 1
+            memo.invalidate()
             db_session.commit()
             # Copy pareto to next generation
             app.logger.debug('author_move_on copying pareto proposals to QH table %s', pareto)
@@ -3012,32 +3453,20 @@ class Question(db.Model):
             history_data[entry.proposal_id] = entry
         return history_data
 
-    def current_voting_map(self, generation=None):
+    def current_voting_map(self, generation=None, snapshot=None):
         '''
-        .. function:: current_voting_map([generation=None])
+        .. function:: current_voting_map([generation=None, snapshot=None])
 
         Returns the voting types of each proposal of the question.
 
         :param generation: question generation.
         :type generation: int
+        :param snapshot: votes of the generation, loaded if not passed
+        :type snapshot: VoteSnapshot
         :rtype: dict
         '''
-        voting_map = dict()
-        generation = generation or self.generation
-        proposals = self.get_proposals_list(generation)
-        votes = dict()
-        confused_count = 0
-        oppose_count = 0
-        for proposal in proposals:
-            voters_by_type = proposal.voters_by_type(generation=generation)
-            votes[proposal.id]= {'proposal': proposal.id, 'votes': voters_by_type}
-            confused_count = confused_count + len(voters_by_type['confused'])
-            oppose_count = oppose_count + len(voters_by_type['oppose'])
-        voting_map = {'generation': generation,
-                      'proposals': votes,
-                      'confused_count': confused_count,
-                      'oppose_count': oppose_count}
-        return voting_map
+        snapshot = snapshot or self.get_vote_snapshot(generation)
+        return snapshot.current_voting_map()
 
     def voting_map(self, generation=None):
         '''
@@ -3072,14 +3501,13 @@ class Question(db.Model):
             gen = gen + 1
         return voting_map
 
-    def all_votes_by_type(self, generation=None):
+    def all_votes_by_type(self, generation=None, snapshot=None):
         app.logger.debug("all_votes_by_type called for gen %s", generation)
-        generation = generation or self.generation
-        proposals = self.get_proposals_list(generation)
+        snapshot = snapshot or self.get_vote_snapshot(generation)
         all_endorsment_types = dict()
-        for proposal in proposals:
-            all_endorsment_types[proposal.id] = proposal.voters_by_type(generation=generation)
-            app.logger.debug("proposal %s votes = %s", proposal.id, all_endorsment_types[proposal.id])
+        for proposal_id in snapshot.proposal_ids:
+            all_endorsment_types[proposal_id] = snapshot.voters_by_type(proposal_id)
+            app.logger.debug("proposal %s votes = %s", proposal_id, all_endorsment_types[proposal_id])
         return all_endorsment_types
 
     def get_proposals_list_by_id(self, generation=None):
@@ -3509,17 +3937,16 @@ class Question(db.Model):
 
         app.logger.debug("calculate_proposal_relation_ids: filenamehash = %s", filenamehash)
 
-        filepath = app.config['WORK_FILE_DIRECTORY'] + '/' + 'prop_rel_ids_' + filenamehash + '.pkl'
+        cache_key = 'prop_rel_ids_' + filenamehash
 
-        app.logger.debug("calculate_proposal_relation_ids: check for cache file %s", filepath)
+        app.logger.debug("calculate_proposal_relation_ids: check for cache entry %s", cache_key)
 
-        if app.config['CACHE_COMPLEX_DOM']:
-            if os.path.isfile(filepath):
-                app.logger.debug('calculate_proposal_relation_ids: RETURNING CACHED DATA')
-                with open(filepath, 'rb') as input:
-                    return pickle.load(input)
-            else:
-                app.logger.debug("calculate_proposal_relation_ids: Cache file %s not found", filepath)
+        proposal_relation_ids = get_cache().get(cache_key)
+        if proposal_relation_ids is not None:
+            app.logger.debug('calculate_proposal_relation_ids: RETURNING CACHED DATA')
+            return proposal_relation_ids
+        else:
+            app.logger.debug("calculate_proposal_relation_ids: Cache entry %s not found", cache_key)
 
         # return
 
@@ -3533,9 +3960,8 @@ class Question(db.Model):
             app.logger.debug('calculate_proposal_relation_ids: NON CACHED DATA')
             proposal_relation_ids = self.calculate_proposal_relation_ids_original(generation=generation,
                                                                  proposals=proposals)
-        if app.config['CACHE_COMPLEX_DOM']:
-            app.logger.debug("calculate_proposal_relation_ids: saving cache to file %s", filepath)
-            save_object(proposal_relation_ids, r'' + filepath)
+        app.logger.debug("calculate_proposal_relation_ids: saving cache entry %s", cache_key)
+        cache_result(cache_key, proposal_relation_ids)
 
         return proposal_relation_ids
 
@@ -3791,188 +4217,118 @@ class Question(db.Model):
 
     def calculate_levels_map(self, generation=None, proposals=None, algorithm=None):
         '''
-        .. function:: calculate_levels_map_original([generation=None, proposals=None])
+        .. function:: calculate_levels_map([generation=None, proposals=None, algorithm=None])
 
-        Calculates the complete map of dominations. For each proposal
-        it calculates which dominate and which are dominated.
+        Calculates the level of each proposal in the domination graph,
+        counted down from the pareto front ('dominated') and up from the
+        proposals which dominate nothing ('dominates'). 'pf_dominated' is 0
+        for proposals of the pareto front and 1 for proposals dominated by
+        one of them.
+
+        The map of all the proposals of a generation is cached until the
+        votes change.
 
         :param generation: question generation.
         :type generation: int
+        :param proposals: proposals to map, all those of the generation if None
+        :type proposals: list of Proposal
+        :param algorithm: algorithm version number
+        :type algorithm: int
         :rtype: dict
         '''
-        app.logger.debug("FUNCTION calculate_levels_map_original VERSION = %s", 2)
+        algorithm = algorithm or app.config['ALGORITHM_VERSION']
 
         generation = generation or self.generation
 
+        cache_key = None
+        if proposals is None:
+            cache_key = 'levels_map_' + make_new_map_filename_hashed(self,
+                                                                     generation,
+                                                                     algorithm)
+            levels_map = get_cache().get(cache_key)
+            if levels_map is not None:
+                app.logger.debug('calculate_levels_map: RETURNING CACHED DATA')
+                return levels_map
+
         domination_map = self.calculate_domination_map(generation=generation, proposals=proposals, algorithm=algorithm)
         app.logger.debug("domination_map = %s", domination_map)
-        # return "CALCULATED DOMINATION MAP !!!!!"
-
-        levels_map = dict()
-        relations = self.calculate_proposal_relation_ids(generation=generation, algorithm=algorithm)
-        app.logger.debug("relations = %s", relations)
-        # return "CALCULATED PROPOSAL RELATIONS !!!!!"
-
-        num_proposals = len(relations)
-        # app.logger.debug("num_proposals = %s", num_proposals)
-
-        # set of all proposal ids
-        all_pids = set(relations.keys())
-        app.logger.debug("all_pids = %s", all_pids)
-
-        top_done = set()
-        bottom_done = set()
-        top_levels = dict()
-        bottom_levels = dict()
 
-        # set top and bottom levels
-        top_levels[0] = set()
-        bottom_levels[0] = set()
-        pareto = set()
+        levels_map = self.find_domination_levels(domination_map)
 
+        pareto = set(proposal_id for (proposal_id, levels) in levels_map.iteritems()
+                     if levels['dominated'] == 0)
         for (proposal_id, dominations) in domination_map.iteritems():
-            # Initialize map
-            levels_map[proposal_id] = {'dominates': -1, 'dominated': -1, 'pf_dominated': '&hellip;'}
-
-            # Test if proposal is undominated
-            if 2 not in dominations.values():
-                pareto.add(proposal_id)
-                levels_map[proposal_id]['dominated'] = 0
+            if any(relation in domination.DOMINATED and pid in pareto
+                   for (pid, relation) in dominations.iteritems()):
+                levels_map[proposal_id]['pf_dominated'] = 1
+            elif proposal_id in pareto:
                 levels_map[proposal_id]['pf_dominated'] = 0
-                top_done.add(proposal_id)
-                top_levels[0].add(proposal_id)
-
-            # Test if proposal dominates nothing
-            if 1 not in dominations.values():
-                levels_map[proposal_id]['dominates'] = 0
-                bottom_done.add(proposal_id)
-                bottom_levels[0].add(proposal_id)
+            else:
+                levels_map[proposal_id]['pf_dominated'] = '&hellip;'
 
+        if cache_key is not None:
+            cache_result(cache_key, levels_map)
 
-        for (proposal_id, rel) in relations.iteritems():
-            if len(rel['dominated'] & top_levels[0]) > 0:
-                levels_map[proposal_id]['pf_dominated'] = 1
+        return levels_map
 
+    def find_domination_levels(self, domination_map):
         '''
-        today
-
-        relations
-        {1: {'dominated': set(), 'dominating': {2}},
-         2: {'dominated': {1}, 'dominating': set()},
-         3: {'dominated': set(), 'dominating': set()},
-         4: {'dominated': set(), 'dominating': set()}}
+        .. function:: find_domination_levels(domination_map)
 
-         {1: {'dominated': set([]), 'dominating': set([2])},
-         2: {'dominated': set([1]), 'dominating': set([])},
-         3: {'dominated': set([]), 'dominating': set([])},
-         4: {'dominated': set([]), 'dominating': set([])}}
+        Calculates the level of each proposal of a domination map with one
+        topological pass down from the pareto front and one up from the
+        proposals which dominate nothing.
 
-        domination_map
-        {1: {1: -1, 2: 1, 3: 0, 4: 0},
-         2: {1: 2, 2: -1, 3: 0, 4: 0},
-         3: {1: 0, 2: 0, 3: -1, 4: 0},
-         4: {1: 0, 2: 0, 3: 0, 4: -1}}
+        A proposal is on level 0 counted from the top ('dominated') if no
+        proposal fully dominates it, and on level 0 counted from the bottom
+        ('dominates') if it fully dominates nothing. Other proposals are one
+        level further than the furthest proposal dominating them, or
+        dominated by them.
 
-        paretomap
-        {1: {'dominated': 0, 'dominates': -1},
-         2: {'dominated': -1, 'dominates': 0},
-         3: {'dominated': 0, 'dominates': 0},
-         4: {'dominated': 0, 'dominates': 0}}
+        :param domination_map: domination map
+        :type domination_map: dict
+        :rtype: dict
         '''
+        (dominating, dominated) = domination.relations(domination_map)
 
+        top = set()
+        bottom = set()
+        for (proposal_id, dominations) in domination_map.iteritems():
+            if 2 not in dominations.values():
+                top.add(proposal_id)
+            if 1 not in dominations.values():
+                bottom.add(proposal_id)
 
-        # Finish levels below pareto
-        app.logger.debug("Finish levels below pareto")
-        app.logger.debug("num_proposals = %s", num_proposals)
-        app.logger.debug("top_done = %s", top_done)
-        level = 1
-        # Initialize higher_levels set with pareto - the top level
-        higher_levels = top_done.copy()
-        app.logger.debug("higher_levels initialized to top_done = %s", higher_levels)
-
-        while top_done != all_pids:
-            app.logger.debug("**************OUTER: Level %s**************", level)
-            app.logger.debug("**************OUTER: higher_levels = %s**************", higher_levels)
-            top_levels[level] = set()
-            for proposal_id in all_pids:
-                app.logger.debug("**************PID %s**************", proposal_id)
-                if proposal_id in top_done:
-                    app.logger.debug("Proposal %s already in competed set %s - SKIP", proposal_id, top_done)
-                    continue
-                doms = relations[proposal_id]['dominated']
-                app.logger.debug("Relations = %s", doms)
-
-                app.logger.debug("Test if proposals dominations %s is a subset of higher levels %s",
-                                     doms, higher_levels)
-
-                if doms <= higher_levels:
-                    app.logger.debug("IS SUBSET: proposal_id %s dominated by levels %s and up - adding to level %s",
-                                     proposal_id, level-1, level)
-                    levels_map[proposal_id]['dominated'] = level
-                    top_done.add(proposal_id)
-                    top_levels[level].add(proposal_id)
-                else:
-                    app.logger.debug("IS NOT SUBSET")
+        top_levels = hasse.levels(dominating, top=top)
+        bottom_levels = hasse.levels(dominated, top=bottom)
 
-            app.logger.debug("Adding current level %s pids to higher_levels %s", top_levels[level], higher_levels)
-            higher_levels = higher_levels | top_levels[level]
-            app.logger.debug("higher_levels now %s", higher_levels)
-            level = level + 1
-            app.logger.debug("level now %s", level)
-            '''
-            if level > 3:
-                app.logger.debug("at level %s - BREAKING!!!", level)
-                break
-            '''
+        levels_map = dict()
+        for proposal_id in domination_map:
+            levels_map[proposal_id] = {
+                'dominates': bottom_levels.get(proposal_id, -1),
+                'dominated': top_levels.get(proposal_id, -1)}
+        return levels_map
 
-        app.logger.debug("Completed: top_done = %s", top_done)
-        app.logger.debug("Completed: top_levels = %s", top_levels)
+    def calculate_levels_map_qualified(self, generation=None, proposals=None, algorithm=None):
+        '''
+        .. function:: calculate_levels_map_qualified([generation=None, proposals=None])
 
-        # return levels_map
+        Calculates the level of each proposal in the algorithm 2 domination
+        graph. See find_domination_levels().
 
-        level = 1
-        # Initialize lower_levels set with pareto - the top level
-        lower_levels = bottom_done.copy()
-        app.logger.debug("lower_levels initialized to bottom_done = %s", lower_levels)
+        :param generation: question generation.
+        :type generation: int
+        :rtype: dict
+        '''
+        generation = generation or self.generation
 
-        while bottom_done != all_pids:
-            app.logger.debug("**************OUTER: Level %s**************", level)
-            app.logger.debug("**************OUTER: lower_levels = %s**************", lower_levels)
-            bottom_levels[level] = set()
-            for proposal_id in all_pids:
-                app.logger.debug("**************PID %s**************", proposal_id)
-                if proposal_id in bottom_done:
-                    app.logger.debug("Proposal %s already in competed set %s - SKIP", proposal_id, bottom_done)
-                    continue
-                doms = relations[proposal_id]['dominating']
-                app.logger.debug("Relations = %s", doms)
-
-                app.logger.debug("Test if proposals dominations %s is a subset of lower levels %s",
-                                     doms, lower_levels)
-
-                if doms <= lower_levels:
-                    app.logger.debug("IS SUBSET: proposal_id %s dominating levels %s and up - adding to level %s",
-                                     proposal_id, level-1, level)
-                    levels_map[proposal_id]['dominates'] = level
-                    bottom_done.add(proposal_id)
-                    bottom_levels[level].add(proposal_id)
-                else:
-                    app.logger.debug("IS NOT SUBSET")
+        domination_map = self.calculate_domination_map_qualified(generation=generation, proposals=proposals)
+        app.logger.debug("domination_map = %s", domination_map)
 
-            app.logger.debug("Adding current level %s pids to lower_levels %s", bottom_levels[level], lower_levels)
-            lower_levels = lower_levels | bottom_levels[level]
-            app.logger.debug("lower_levels now %s", lower_levels)
-            level = level + 1
-            app.logger.debug("level now %s", level)
-            '''
-            if level > 3:
-                app.logger.debug("at level %s - BREAKING!!!", level)
-                break
-            '''
+        return self.find_domination_levels(domination_map)
 
-        return levels_map
 
-    def calculate_levels_map_qualified(self, generation=None, proposals=None, algorithm=None):
+    def calculate_levels_map_qualified_v1(self, generation=None, proposals=None, algorithm=None):
         '''
         .. function:: calculate_levels_map_original([generation=None, proposals=None])
 
@@ -3983,8 +4339,6 @@ class Question(db.Model):
         :type generation: int
         :rtype: dict
         '''
-        app.logger.debug("FUNCTION calculate_levels_map_original VERSION = %s", 2)
-
         generation = generation or self.generation
 
         domination_map = self.calculate_domination_map_qualified(generation=generation, proposals=proposals)
@@ -3992,16 +4346,13 @@ class Question(db.Model):
 
         levels_map = dict()
         relations = self.calculate_proposal_relation_ids(generation=generation, algorithm=algorithm)
-
         app.logger.debug("relations = %s", relations)
 
         num_proposals = len(relations)
-        # app.logger.debug("num_proposals = %s", num_proposals)
+        app.logger.debug("num_proposals = %s", num_proposals)
 
         # set of all proposal ids
         all_pids = set(relations.keys())
-        app.logger.debug("all_pids = %s", all_pids)
-
         top_done = set()
         bottom_done = set()
         top_levels = dict()
@@ -4054,279 +4405,199 @@ class Question(db.Model):
          4: {'dominated': 0, 'dominates': 0}}
         '''
 
-
         # Finish levels below pareto
         app.logger.debug("Finish levels below pareto")
         app.logger.debug("num_proposals = %s", num_proposals)
         app.logger.debug("top_done = %s", top_done)
         level = 1
-        # Initialize higher_levels set with pareto - the top level
-        higher_levels = top_done.copy()
-        app.logger.debug("higher_levels initialized to top_done = %s", higher_levels)
-
-        while top_done != all_pids:
-            app.logger.debug("**************OUTER: Level %s**************", level)
-            app.logger.debug("**************OUTER: higher_levels = %s**************", higher_levels)
+        for proposal_id in all_pids:
+            if proposal_id in top_done:
+                continue
             top_levels[level] = set()
-            for proposal_id in all_pids:
-                app.logger.debug("**************PID %s**************", proposal_id)
-                if proposal_id in top_done:
-                    app.logger.debug("Proposal %s already in competed set %s - SKIP", proposal_id, top_done)
-                    continue
-                doms = relations[proposal_id]['dominated']
-                app.logger.debug("Relations = %s", doms)
-
-                # if len(doms - top_done) == 0:
-                app.logger.debug("Test if proposals dominations %s is a subset of higher levels %s",
-                                     doms, higher_levels)
-
-                if doms <= higher_levels:
-                    app.logger.debug("IS SUBSET: proposal_id %s dominated by levels %s and up - adding to level %s",
-                                     proposal_id, level-1, level)
-                    levels_map[proposal_id]['dominated'] = level
-                    top_done.add(proposal_id)
-                    top_levels[level].add(proposal_id)
-                else:
-                    app.logger.debug("IS NOT SUBSET")
+            app.logger.debug("top_done = %s", top_done)
+            doms = relations[proposal_id]['dominated']
+            app.logger.debug("doms = %s", doms)
+            app.logger.debug("doms - top_done = %s", doms - top_done)
+            app.logger.debug("len(doms - top_done) == %s", len(doms - top_done))
+            if len(doms - top_done) == 0:
+                app.logger.debug("proposal_id %s dominated by levels %s and up - adding to level %s", proposal_id, level-1, level)
+                levels_map[proposal_id]['dominated'] = level
+                top_done.add(proposal_id)
+                top_levels[level].add(proposal_id)
 
-            app.logger.debug("Adding current level %s pids to higher_levels %s", top_levels[level], higher_levels)
-            higher_levels = higher_levels | top_levels[level]
-            app.logger.debug("higher_levels now %s", higher_levels)
             level = level + 1
-            app.logger.debug("level now %s", level)
             '''
-            if level > 3:
-                app.logger.debug("at level %s - BREAKING!!!", level)
+            if level > 1:
+                app.logger.debug("at level %s", level)
                 break
             '''
-
-        app.logger.debug("Completed: top_done = %s", top_done)
-        app.logger.debug("Completed: top_levels = %s", top_levels)
-
         # return levels_map
 
         level = 1
-        # Initialize lower_levels set with pareto - the top level
-        lower_levels = bottom_done.copy()
-        app.logger.debug("lower_levels initialized to bottom_done = %s", lower_levels)
-
-        while bottom_done != all_pids:
-            app.logger.debug("**************OUTER: Level %s**************", level)
-            app.logger.debug("**************OUTER: lower_levels = %s**************", lower_levels)
+        for proposal_id in all_pids:
+            if proposal_id in bottom_done:
+                continue
             bottom_levels[level] = set()
-            for proposal_id in all_pids:
-                app.logger.debug("**************PID %s**************", proposal_id)
-                if proposal_id in bottom_done:
-                    app.logger.debug("Proposal %s already in competed set %s - SKIP", proposal_id, bottom_done)
-                    continue
-                doms = relations[proposal_id]['dominating']
-                app.logger.debug("Relations = %s", doms)
-
-                # if len(doms - bottom_done) == 0:
-                app.logger.debug("Test if proposals dominations %s is a subset of lower levels %s",
-                                     doms, lower_levels)
-
-                if doms <= lower_levels:
-                    app.logger.debug("IS SUBSET: proposal_id %s dominating levels %s and up - adding to level %s",
-                                     proposal_id, level-1, level)
-                    levels_map[proposal_id]['dominates'] = level
-                    bottom_done.add(proposal_id)
-                    bottom_levels[level].add(proposal_id)
-                else:
-                    app.logger.debug("IS NOT SUBSET")
+            app.logger.debug("bottom_done = %s", bottom_done)
+            doms = relations[proposal_id]['dominating']
+            app.logger.debug("doms = %s", doms)
+            app.logger.debug("doms - bottom_done = %s", doms - bottom_done)
+            app.logger.debug("len(doms - bottom_done) == %s", len(doms - bottom_done))
+            if len(doms - bottom_done) == 0:
+                app.logger.debug("proposal_id %s dominating levels %s and up - adding to level %s", proposal_id, level-1, level)
+                levels_map[proposal_id]['dominates'] = level
+                bottom_done.add(proposal_id)
+                bottom_levels[level].add(proposal_id)
 
-            app.logger.debug("Adding current level %s pids to lower_levels %s", bottom_levels[level], lower_levels)
-            lower_levels = lower_levels | bottom_levels[level]
-            app.logger.debug("lower_levels now %s", lower_levels)
             level = level + 1
-            app.logger.debug("level now %s", level)
-
-
-            if level > 50:
-                app.logger.debug("at level %s - BREAKING!!!", level)
+            '''
+            if level > 1:
+                app.logger.debug("at level %s", level)
                 break
-
+            '''
         return levels_map
 
-
-    def calculate_levels_map_qualified_v1(self, generation=None, proposals=None, algorithm=None):
+    def calculate_domination_map(self, generation=None, proposals=None, algorithm=None, snapshot=None): #
         '''
-        .. function:: calculate_levels_map_original([generation=None, proposals=None])
+        .. function:: calculate_domination_map([generation=None, snapshot=None])
 
         Calculates the complete map of dominations. For each proposal
         it calculates which dominate and which are dominated.
 
         :param generation: question generation.
         :type generation: int
+        :param snapshot: votes of the generation, loaded if not passed
+        :type snapshot: VoteSnapshot
         :rtype: dict
         '''
-        generation = generation or self.generation
-
-        domination_map = self.calculate_domination_map_qualified(generation=generation, proposals=proposals)
-        app.logger.debug("domination_map = %s", domination_map)
+        algorithm = algorithm or app.config['ALGORITHM_VERSION']
 
-        levels_map = dict()
-        relations = self.calculate_proposal_relation_ids(generation=generation, algorithm=algorithm)
-        app.logger.debug("relations = %s", relations)
+        generation = generation or self.generation
 
-        num_proposals = len(relations)
-        app.logger.debug("num_proposals = %s", num_proposals)
+        if app.config['INCREMENTAL_DOMINATION_MAP'] and proposals is None:
+            return self.update_domination_matrix(generation=generation,
+                                                 algorithm=algorithm,
+                                                 snapshot=snapshot)
 
-        # set of all proposal ids
-        all_pids = set(relations.keys())
-        top_done = set()
-        bottom_done = set()
-        top_levels = dict()
-        bottom_levels = dict()
+        filenamehash = make_new_map_filename_hashed(self,
+                                                    generation,
+                                                    algorithm)
 
-        # set top and bottom levels
-        top_levels[0] = set()
-        bottom_levels[0] = set()
+        app.logger.debug("calculate_domination_map: filenamehash = %s", filenamehash)
 
-        for (proposal_id, dominations) in domination_map.iteritems():
-            # Initialize map
-            levels_map[proposal_id] = {'dominates': -1, 'dominated': -1}
+        cache_key = 'dom_map_' + filenamehash
 
-            # Test if proposal is undominated
-            if 2 not in dominations.values():
-                levels_map[proposal_id]['dominated'] = 0
-                top_done.add(proposal_id)
-                top_levels[0].add(proposal_id)
+        app.logger.debug("calculate_domination_map: check for cache entry %s", cache_key)
 
-            # Test if proposal dominates nothing
-            if 1 not in dominations.values():
-                levels_map[proposal_id]['dominates'] = 0
-                bottom_done.add(proposal_id)
-                bottom_levels[0].add(proposal_id)
+        dom_map = get_cache().get(cache_key)
+        if dom_map is not None:
+            app.logger.debug('calculate_domination_map: RETURNING CACHED DATA')
+            return dom_map
+        else:
+            app.logger.debug("Cache entry %s not found", cache_key)
 
-        '''
-        today
+        # return
 
-        relations
-        {1: {'dominated': set(), 'dominating': {2}},
-         2: {'dominated': {1}, 'dominating': set()},
-         3: {'dominated': set(), 'dominating': set()},
-         4: {'dominated': set(), 'dominating': set()}}
+        snapshot = snapshot or self.get_vote_snapshot(generation)
 
-         {1: {'dominated': set([]), 'dominating': set([2])},
-         2: {'dominated': set([1]), 'dominating': set([])},
-         3: {'dominated': set([]), 'dominating': set([])},
-         4: {'dominated': set([]), 'dominating': set([])}}
+        if algorithm == 2:
+            # app.logger.debug("************** USING ALGORITHM 2 ************")
+            app.logger.debug('calculate_domination_map_qualified: NON CACHED DATA')
+            dom_map = self.calculate_domination_map_qualified(generation=generation,
+                                                               proposals=proposals,
+                                                               snapshot=snapshot)
+        else:
+            # app.logger.debug("************** USING ALGORITHM 1 ************")
+            app.logger.debug('calculate_domination_map_original: NON CACHED DATA')
+            dom_map = self.calculate_domination_map_original(generation=generation,
+                                                             proposals=proposals,
+                                                             snapshot=snapshot)
+        cache_result(cache_key, dom_map)
 
-        domination_map
-        {1: {1: -1, 2: 1, 3: 0, 4: 0},
-         2: {1: 2, 2: -1, 3: 0, 4: 0},
-         3: {1: 0, 2: 0, 3: -1, 4: 0},
-         4: {1: 0, 2: 0, 3: 0, 4: -1}}
+        return dom_map
 
-        paretomap
-        {1: {'dominated': 0, 'dominates': -1},
-         2: {'dominated': -1, 'dominates': 0},
-         3: {'dominated': 0, 'dominates': 0},
-         4: {'dominated': 0, 'dominates': 0}}
+    def get_domination_matrix_key(self, generation=None, algorithm=None):
         '''
+        .. function:: get_domination_matrix_key([generation=None, algorithm=None])
 
-        # Finish levels below pareto
-        app.logger.debug("Finish levels below pareto")
-        app.logger.debug("num_proposals = %s", num_proposals)
-        app.logger.debug("top_done = %s", top_done)
-        level = 1
-        for proposal_id in all_pids:
-            if proposal_id in top_done:
-                continue
-            top_levels[level] = set()
-            app.logger.debug("top_done = %s", top_done)
-            doms = relations[proposal_id]['dominated']
-            app.logger.debug("doms = %s", doms)
-            app.logger.debug("doms - top_done = %s", doms - top_done)
-            app.logger.debug("len(doms - top_done) == %s", len(doms - top_done))
-            if len(doms - top_done) == 0:
-                app.logger.debug("proposal_id %s dominated by levels %s and up - adding to level %s", proposal_id, level-1, level)
-                levels_map[proposal_id]['dominated'] = level
-                top_done.add(proposal_id)
-                top_levels[level].add(proposal_id)
-
-            level = level + 1
-            '''
-            if level > 1:
-                app.logger.debug("at level %s", level)
-                break
-            '''
-        # return levels_map
-
-        level = 1
-        for proposal_id in all_pids:
-            if proposal_id in bottom_done:
-                continue
-            bottom_levels[level] = set()
-            app.logger.debug("bottom_done = %s", bottom_done)
-            doms = relations[proposal_id]['dominating']
-            app.logger.debug("doms = %s", doms)
-            app.logger.debug("doms - bottom_done = %s", doms - bottom_done)
-            app.logger.debug("len(doms - bottom_done) == %s", len(doms - bottom_done))
-            if len(doms - bottom_done) == 0:
-                app.logger.debug("proposal_id %s dominating levels %s and up - adding to level %s", proposal_id, level-1, level)
-                levels_map[proposal_id]['dominates'] = level
-                bottom_done.add(proposal_id)
-                bottom_levels[level].add(proposal_id)
+        Returns the cache key of the persisted domination matrix of a
+        generation.
 
-            level = level + 1
-            '''
-            if level > 1:
-                app.logger.debug("at level %s", level)
-                break
-            '''
-        return levels_map
+        :param generation: question generation.
+        :type generation: int
+        :param algorithm: algorithm version number
+        :type algorithm: int
+        :rtype: String
+        '''
+        algorithm = algorithm or app.config['ALGORITHM_VERSION']
+        generation = generation or self.generation
+        return 'dom_matrix_%s_%s_%s' % (self.id, generation, algorithm)
 
-    def calculate_domination_map(self, generation=None, proposals=None, algorithm=None): #
+    def update_domination_matrix(self, generation=None, algorithm=None, snapshot=None):
         '''
-        .. function:: calculate_domination_map([generation=None])
+        .. function:: update_domination_matrix([generation=None, algorithm=None, snapshot=None])
 
-        Calculates the complete map of dominations. For each proposal
-        it calculates which dominate and which are dominated.
+        Brings the domination matrix of a generation kept in the result
+        cache up to date and returns it as a domination map.
+
+        The matrix is stored with a signature of the votes on each proposal.
+        Only the rows and columns of the proposals whose signature changed
+        are recalculated, so a single vote costs one relation per proposal
+        instead of the whole map. The matrix is recalculated from scratch
+        when it is missing or the proposals or thresholds have changed.
+        Since each update compares against the votes in the database, a
+        matrix written by a concurrent request is repaired by the next one.
+        While the vote version of the generation is unchanged the cached
+        map is returned without reading the votes.
 
         :param generation: question generation.
         :type generation: int
+        :param algorithm: algorithm version number
+        :type algorithm: int
+        :param snapshot: votes of the generation, loaded if not passed
+        :type snapshot: VoteSnapshot
         :rtype: dict
         '''
         algorithm = algorithm or app.config['ALGORITHM_VERSION']
-
         generation = generation or self.generation
 
+        cache_key = self.get_domination_matrix_key(generation, algorithm)
+        matrix = get_cache().get(cache_key)
 
-        filenamehash = make_new_map_filename_hashed(self,
-                                                    generation,
-                                                    algorithm)
+        vote_version = self.get_vote_version(generation)
+        question_thresholds = self.get_thresholds(generation=generation)
+        thresholds = (question_thresholds.mapx, question_thresholds.mapy)
 
-        app.logger.debug("calculate_domination_map: filenamehash = %s", filenamehash)
+        if matrix is not None\
+                and matrix.get('version') == vote_version\
+                and matrix['thresholds'] == thresholds:
+            return matrix['map']
 
-        filepath = app.config['WORK_FILE_DIRECTORY'] + '/' + 'dom_map_' + filenamehash + '.pkl'
+        snapshot = snapshot or self.get_vote_snapshot(generation)
 
-        app.logger.debug("calculate_domination_map: check for cache file %s", filepath)
-
-        if app.config['CACHE_COMPLEX_DOM']:
-            if os.path.isfile(filepath):
-                app.logger.debug('calculate_domination_map: RETURNING CACHED DATA')
-                with open(filepath, 'rb') as input:
-                    return pickle.load(input)
-            else:
-                app.logger.debug("Cache file %s not found", filepath)
+        signatures = dict()
+        for proposal_id in snapshot.proposal_ids:
+            signatures[proposal_id] = snapshot.vote_signature(proposal_id)
 
-        # return
+        engine = domination.DominationEngine(snapshot)
 
-        if algorithm == 2:
-            # app.logger.debug("************** USING ALGORITHM 2 ************")
-            app.logger.debug('calculate_domination_map_qualified: NON CACHED DATA')
-            dom_map = self.calculate_domination_map_qualified(generation=generation,
-                                                               proposals=proposals)
+        if matrix is None\
+                or matrix['thresholds'] != thresholds\
+                or set(matrix['signatures']) != set(signatures):
+            app.logger.debug("update_domination_matrix: calculating full matrix")
+            dom_map = engine.domination_map(algorithm=algorithm)
         else:
-            # app.logger.debug("************** USING ALGORITHM 1 ************")
-            app.logger.debug('calculate_domination_map_original: NON CACHED DATA')
-            dom_map = self.calculate_domination_map_original(generation=generation,
-                                                             proposals=proposals)
-        if app.config['CACHE_COMPLEX_DOM']:
-            save_object(dom_map, r'' + filepath)
-
+            changed = [proposal_id for (proposal_id, signature) in signatures.iteritems()
+                       if matrix['signatures'][proposal_id] != signature]
+            app.logger.debug("update_domination_matrix: updating proposals %s", changed)
+            dom_map = engine.update_domination_map(matrix['map'],
+                                                   changed,
+                                                   algorithm=algorithm)
+
+        cache_result(cache_key, {'version': vote_version,
+                                 'thresholds': thresholds,
+                                 'signatures': signatures,
+                                 'map': dom_map})
         return dom_map
 
     def converts_to_full_domination(self, votes, A, B):
@@ -4345,155 +4616,28 @@ class Question(db.Model):
         pass
 
     # bang
-    def calculate_domination_map_qualified(self, generation=None, proposals=None):
+    def calculate_domination_map_qualified(self, generation=None, proposals=None, snapshot=None):
         '''
-        .. function:: calculate_domination_map_qualified([generation=None, proposals=None])
+        .. function:: calculate_domination_map_qualified([generation=None, proposals=None, snapshot=None])
 
         Calculates the complete map of dominations. For each proposal
         it calculates which dominate and which are dominated.
 
         :param generation: question generation. today 2
         :type generation: int
+        :param snapshot: votes of the generation, loaded if not passed
+        :type snapshot: VoteSnapshot
         :rtype: dict
         '''
         app.logger.debug("CALCULATE_DOMINATION_MAP_QUALIFIED CALLED...")
 
-        reverse_values = {-2: -2, -1: -1, 0: 0, 1: 2, 2: 1, 3: 4, 4: 3, 5: 6, 6: 5}
-
         generation = generation or self.generation
         app.logger.debug("calculate_domination_map_qualified: called with generation %s", generation)
-        domination_map = dict()
-        endorser_ids = dict()
 
-        all_proposals = proposals or self.get_proposals_list(generation)
-
-        # Get all votes sorted into sets by type for this genration
-        votes = self.all_votes_by_type(generation=generation)
-        app.logger.debug("votes ==> %s", votes)
-
-        # app.logger.debug("Processing %s proposals", len(all_proposals))
-
-        for p in all_proposals:
-            endorser_ids[p.id] = p.set_of_endorser_ids(generation)
-
-        outer_counter = 0
-
-        for proposal1 in all_proposals:
-            if domination_map.get(proposal1.id, None) is None:
-                domination_map[proposal1.id] = dict()
-
-            outer_counter = outer_counter + 1
-            # app.logger.debug("********************* OUTER PROPOSAL COUNTER = %s ********************* ", outer_counter)
-
-            inner_counter = 0
-
-            for proposal2 in all_proposals:
-                inner_counter = inner_counter + 1
-                # Test for same proposal
-                if (proposal1 == proposal2):
-                    domination_map[proposal1.id][proposal2.id] = -1
-                    continue
-
-                # Check if the two proposals are equivalent
-                elif votes[proposal1.id]['oppose'] == votes[proposal2.id]['oppose'] and\
-                        votes[proposal1.id]['endorse'] == votes[proposal2.id]['endorse'] and\
-                        votes[proposal1.id]['confused'] == votes[proposal2.id]['confused']:
-                    domination_map[proposal1.id][proposal2.id] = -1
-                    if domination_map.get(proposal2.id, None) is None:
-                        domination_map[proposal2.id] = dict()
-                    domination_map[proposal2.id][proposal1.id] = -1
-                    continue
-
-                if not domination_map[proposal1.id].get(proposal2.id, None) is None:
-                    '''
-                    app.logger.debug("**** Domination_map entry [%s][%s] already set: skip",
-                        proposal1.id,
-                        proposal2.id)
-                    '''
-                    continue
-
-                qualified_voters = Proposal.\
-                    intersection_of_qualfied_endorser_ids(proposal1,
-                                                          proposal2,
-                                                          generation)
-
-                # app.logger.debug("Proposal %s votes == %s", proposal1.id, endorser_ids[proposal1.id])
-                # app.logger.debug("Proposal %s votes == %s", proposal2.id, endorser_ids[proposal2.id])
-                '''
-                app.logger.debug("Complex Domination: qualified_voters for %s and %s ==> %s",
-                    proposal1.id,
-                    proposal2.id,
-                    qualified_voters)
-                '''
-
-                who_dominates = Proposal.\
-                    who_dominates_who_qualified(endorser_ids[proposal1.id],
-                                                endorser_ids[proposal2.id],
-                                                qualified_voters)
-                app.logger.debug("who dominates returned ==> %s", who_dominates)
-
-                '''
-                ^ = intersection
-                < = subset
-                \ = set minus. (A\B= elements that are in A but not in B)
-                0 = empty set.
-                => = implies
-
-                if A? < B- AND B? < A+
-                then A > B
-                '''
-
-                partial_understanding = len(votes[proposal1.id]['confused']) > 0 or len(votes[proposal2.id]['confused']) > 0
-
-                # app.logger.debug("Partial Understanding for relation %s --> %s = %s",
-                #     proposal1.id,
-                #     proposal2.id,
-                #     partial_understanding)
-
-                if (who_dominates == endorser_ids[proposal1.id]): # newgraph
-                    # dominating
-                    if partial_understanding:
-                        # app.logger.debug("Testing Partials A = PID %s and B = PID %s", proposal1.id, proposal2.id)
-                        # app.logger.debug("Test1: A? %s < B- %s", votes[proposal1.id]['confused'], votes[proposal2.id]['oppose'])
-                        # app.logger.debug("Test2: B? %s < A+ %s", votes[proposal2.id]['confused'], votes[proposal1.id]['endorse'])
-
-                        if self.converts_to_full_domination(votes, proposal1, proposal2):
-                            app.logger.debug("Partial converts...")
-                            domination_map[proposal1.id][proposal2.id] = 5
-                        else:
-                            app.logger.debug("Partial does not convert...")
-                            domination_map[proposal1.id][proposal2.id] = 3
-                    else:
-                        domination_map[proposal1.id][proposal2.id] = 1
-                    # dominating.add(proposal2)
-                elif (who_dominates == endorser_ids[proposal2.id]):
-                    # dominated
-                    if partial_understanding:
-                        if self.converts_to_full_domination(votes, proposal2, proposal1):
-                            domination_map[proposal1.id][proposal2.id] = 6
-                        else:
-                            domination_map[proposal1.id][proposal2.id] = 4
-                    else:
-                        domination_map[proposal1.id][proposal2.id] = 2
-                    # dominated.add(proposal2)
-                elif who_dominates == -2:
-                    # both proposals have the same voters
-                    domination_map[proposal1.id][proposal2.id] = -2
-                else:
-                    domination_map[proposal1.id][proposal2.id] = 0
-
-                # Set second proposal based on first
-                if domination_map.get(proposal2.id, None) is None:
-                    domination_map[proposal2.id] = dict()
-                '''
-                app.logger.debug("**** Setting reverse domination_map entry [%s][%s]!!!!",
-                    proposal2.id,
-                    proposal1.id)
-                '''
-                domination_map[proposal2.id][proposal1.id] = reverse_values[domination_map[proposal1.id][proposal2.id]]
-
-        # app.logger.debug("Complex Domination: Domination Map ==> %s", domination_map)
-        return domination_map
+        snapshot = snapshot or self.get_vote_snapshot(generation)
+        engine = domination.DominationEngine(snapshot,
+                                             get_ids_from_proposals(proposals) if proposals else None)
+        return engine.domination_map(algorithm=2)
 
     def calculate_domination_map_qualified_v1(self, generation=None, proposals=None):
         '''
@@ -4623,56 +4767,27 @@ class Question(db.Model):
         # app.logger.debug("Complex Domination: Domination Map ==> %s", domination_map)
         return domination_map
 
-    def calculate_domination_map_original(self, generation=None, proposals=None):
+    def calculate_domination_map_original(self, generation=None, proposals=None, snapshot=None):
         '''
-        .. function:: calculate_proposal_relations_original([generation=None]) today
+        .. function:: calculate_proposal_relations_original([generation=None, snapshot=None]) today
 
         Calculates the complete map of dominations. For each proposal
         it calculates which dominate and which are dominated.
 
         :param generation: question generation.
         :type generation: int
+        :param snapshot: votes of the generation, loaded if not passed
+        :type snapshot: VoteSnapshot
         :rtype: dict
         '''
         app.logger.debug("calculate_domination_map_original called...")
 
         generation = generation or self.generation
-        domination_map = dict()
-        endorser_ids = dict()
-
-        all_proposals = proposals or self.get_proposals_list(generation)
-
-        for p in all_proposals:
-            endorser_ids[p.id] = p.set_of_endorser_ids(generation)
-
-        for proposal1 in all_proposals:
-            domination_map[proposal1.id] = dict()
-
-            for proposal2 in all_proposals:
-                if (proposal1 == proposal2):
-                    domination_map[proposal1.id][proposal1.id] = -1
-                    continue
-                who_dominates = Proposal.\
-                    who_dominates_who(endorser_ids[proposal1.id],
-                                      endorser_ids[proposal2.id])
 
-                if (who_dominates == endorser_ids[proposal1.id]):
-                    # dominating
-                    domination_map[proposal1.id][proposal2.id] = 1
-                    # dominating.add(proposal2)
-                elif (who_dominates == endorser_ids[proposal2.id]):
-                    # dominated
-                    domination_map[proposal1.id][proposal2.id] = 2
-                    # dominated.add(proposal2)
-                elif who_dominates == -1:
-                    # both proposals have the same voters
-                    app.logger.debug("Simple domnateion: Both %s and %s have the same voters", proposal1.id, proposal2.id)
-                    domination_map[proposal1.id][proposal2.id] = -2
-                else:
-                    domination_map[proposal1.id][proposal2.id] = 0
-
-        # app.logger.debug("Simple Domination: Domination Map ==> %s", domination_map)
-        return domination_map
+        snapshot = snapshot or self.get_vote_snapshot(generation)
+        engine = domination.DominationEngine(snapshot,
+                                             get_ids_from_proposals(proposals) if proposals else None)
+        return engine.domination_map(algorithm=1)
 
     def calculate_pareto_front(self,
                                proposals=None,
@@ -4705,6 +4820,13 @@ class Question(db.Model):
         app.logger.debug("calculate_pareto_front: ************ Using Algorithm %s ************", algorithm)
         app.logger.debug("calculate_pareto_front: ************ Save PF %s ************", save)
 
+        # Closed generations are read from the pareto_front table
+        if not proposals and not exclude_user:
+            saved = self.get_saved_pareto_front(generation=generation,
+                                                algorithm=algorithm)
+            if saved:
+                return get_proposals_by_ids([row.proposal_id for row in saved])
+
 
         '''
         if algorithm == 2:
@@ -4871,63 +4993,29 @@ class Question(db.Model):
         if (len(proposals) == 0):
             return set()
         else:
-            dominated = set()
-            props = dict()
-
-            if (exclude_user is not None):
-                app.logger.\
-                    debug("calculate_pareto_front_original called excluding user %s\n",
-                          exclude_user.id)
-
-            for p in proposals:
-                props[p.id] = p.set_of_endorser_ids(generation)
-                if (exclude_user is not None):
-                    app.logger.debug("props[p.id] = %s\n", props[p.id])
-                    props[p.id].discard(exclude_user.id)
-                    app.logger.debug("props[p.id] with user %s "
-                                     "discarded = %s\n",
-                                     exclude_user.id,
-                                     props[p.id])
-
             if (exclude_user is not None):
-                app.logger.debug("props with %s excluded is now %s\n",
-                                 exclude_user.id, props)
-
-            done = list()
-            for proposal1 in proposals:
-                done.append(proposal1)
-                for proposal2 in proposals:
-                    if (proposal2 in done):
-                        continue
-
-                    who_dominates = Proposal.\
-                        who_dominates_who(props[proposal1.id],
-                                          props[proposal2.id])
-
-                    if (who_dominates == props[proposal1.id]):
-                        dominated.add(proposal2)
-                        if (save):
-                            app.logger.\
-                                debug('SAVE PF: PID %s dominated_by to %s\n',
-                                      proposal2.id, proposal1.id)
-                            history[proposal2.id].dominated_by = proposal1.id
-                    elif (who_dominates == props[proposal2.id]):
-                        dominated.add(proposal1)
-                        if (save):
-                            app.logger.\
-                                debug('SAVE PF: PID %s dominated_by to %s\n',
-                                      proposal2.id, proposal1.id)
-                            history[proposal1.id].dominated_by = proposal2.id
-                        # Proposal 1 dominated, move to next
-                        break
-
-            pareto = set()
-            if (len(dominated) > 0):
-                pareto = set(proposals).difference(dominated)
+                app.logger.\
+                    debug("calculate_pareto_front_original called excluding user %s\n",
+                          exclude_user.id)
+                exclude_user_id = exclude_user.id
             else:
-                pareto = set(proposals)
+                exclude_user_id = None
 
-            return pareto
+            snapshot = self.get_vote_snapshot(generation)
+            engine = domination.DominationEngine(
+                snapshot, [proposal.id for proposal in proposals])
+            (pareto_ids, dominated_by) = engine.pareto_front(exclude_user_id)
+
+            if (save):
+                for (pid, dominating_pid) in dominated_by.items():
+                    app.logger.\
+                        debug('SAVE PF: PID %s dominated_by to %s\n',
+                              pid, dominating_pid)
+                    history[pid].dominated_by = dominating_pid
+
+            pareto_ids = set(pareto_ids)
+            return set(proposal for proposal in proposals
+                       if proposal.id in pareto_ids)
 
     def get_endorser_sets(self, generation=None):
         generation = generation or self.generation
@@ -4940,15 +5028,41 @@ class Question(db.Model):
         return inherited_endorsers, all_endorsers
 
     def consensus_found(self, generation=None):
+        '''
+        .. function:: consensus_found([generation=None])
+
+        Returns True if everyone who endorsed a proposal in the previous
+        generation endorsed one of the proposals inherited by this one.
+        The result is cached until the votes of either generation change.
+
+        :param generation: question generation.
+        :type generation: int
+        :rtype: boolean
+        '''
         generation = generation or self.generation
 
         if generation == 1:
             return False
 
-        inherited = self.get_inherited_proposals(generation=generation)
-        inherited_endorsers = self.get_endorsers_set(generation=generation-1, proposals=inherited)
-        all_endorsers = self.get_endorsers_set(generation=generation-1)
-        return inherited_endorsers == all_endorsers
+        cache_key = 'consensus_%s_%s' % (
+            make_new_map_filename_hashed(self, generation=generation-1),
+            self.get_vote_version(generation))
+        consensus = get_cache().get(cache_key)
+        if consensus is not None:
+            return consensus
+
+        inherited_ids = [proposal.id for proposal in
+                         self.get_inherited_proposals(generation=generation)]
+        snapshot = self.get_vote_snapshot(generation-1)
+        all_endorsers = snapshot.all_endorser_ids()
+        if inherited_ids:
+            inherited_endorsers = snapshot.all_endorser_ids(inherited_ids)
+        else:
+            inherited_endorsers = all_endorsers
+        consensus = inherited_endorsers == all_endorsers
+
+        cache_result(cache_key, consensus)
+        return consensus
 
     def get_endorsers_set(self, generation=None, proposals=None):
         '''
@@ -4988,6 +5102,79 @@ class Question(db.Model):
             current_endorsers.update(set(proposal.endorsers(generation)))
         return current_endorsers
 
+    def calculate_leave_one_out_pareto_fronts(self,
+                                              user_ids,
+                                              pareto,
+                                              proposals=None,
+                                              generation=None,
+                                              algorithm=None,
+                                              snapshot=None):
+        '''
+        .. function:: calculate_leave_one_out_pareto_fronts(user_ids, pareto
+                                                            [, proposals=None,
+                                                            generation=None,
+                                                            algorithm=None,
+                                                            snapshot=None])
+
+        Calculates the pareto front excluding each of the users in turn,
+        from a single snapshot of the votes. Outside of a request, such as
+        in the render workers or a manage.py command, questions with at
+        least LEAVE_ONE_OUT_POOL_MIN_VOTERS users are split between
+        LEAVE_ONE_OUT_PROCESSES worker processes.
+
+        :param user_ids: IDs of the users to exclude
+        :type user_ids: iterable of int
+        :param pareto: the pareto front including every user
+        :type pareto: set of proposal objects
+        :param proposals: proposals to calculate the fronts of, defaults to
+            all the proposals of the generation
+        :type proposals: list
+        :param generation: question generation.
+        :type generation: int
+        :param algorithm: algorithm version number
+        :type algorithm: int
+        :param snapshot: votes of the generation, loaded if not passed
+        :type snapshot: VoteSnapshot
+        :rtype: tuple (DominationEngine or None,
+            dict of user ID to set of pareto proposal IDs)
+        '''
+        algorithm = algorithm or app.config['ALGORITHM_VERSION']
+        generation = generation or self.generation
+        user_ids = list(user_ids)
+
+        if algorithm == 2:
+            # calculate_pareto_front ignores excluded users with algorithm 2
+            pareto_ids = set(get_ids_from_proposals(pareto))
+            return (None, dict((user_id, set(pareto_ids))
+                               for user_id in user_ids))
+
+        snapshot = snapshot or self.get_vote_snapshot(generation)
+        if proposals is None:
+            proposal_ids = None
+        else:
+            proposal_ids = get_ids_from_proposals(proposals)
+        engine = domination.DominationEngine(snapshot, proposal_ids)
+
+        if app.config['INCREMENTAL_DOMINATION_MAP']:
+            domination_map = self.update_domination_matrix(generation,
+                                                           algorithm=1,
+                                                           snapshot=snapshot)
+        else:
+            domination_map = None
+
+        # Never fork a pool from the process serving a request
+        if not has_request_context() and \
+                len(user_ids) >= app.config['LEAVE_ONE_OUT_POOL_MIN_VOTERS']:
+            processes = app.config['LEAVE_ONE_OUT_PROCESSES']
+        else:
+            processes = 1
+        app.logger.debug("calculate_leave_one_out_pareto_fronts: %s users, %s processes",
+                         len(user_ids), processes)
+
+        return (engine, engine.leave_one_out_pareto_fronts(user_ids,
+                                                           domination_map,
+                                                           processes))
+
     def calculate_endorser_effects(self, generation=None, algorithm=None):
         '''
         .. function:: calculate_endorser_effects([generation=None, algorithm=None])
@@ -5001,15 +5188,26 @@ class Question(db.Model):
         :rtype: dict
         '''
         generation = generation or self.generation
+        algorithm = algorithm or app.config['ALGORITHM_VERSION']
 
-        all_endorsers = self.get_endorsers(generation)
+        snapshot = self.get_vote_snapshot(generation)
+        all_endorsers = get_users_by_ids(snapshot.all_endorser_ids())
         app.logger.debug("All Endorsers: %s\n", all_endorsers)
-        pareto = self.calculate_pareto_front(generation=generation)
+        pareto = self.calculate_pareto_front(generation=generation,
+                                             algorithm=algorithm)
+        (engine, fronts) = self.calculate_leave_one_out_pareto_fronts(
+            [endorser.id for endorser in all_endorsers],
+            pareto,
+            generation=generation,
+            algorithm=algorithm,
+            snapshot=snapshot)
+
+        proposals = dict((proposal.id, proposal)
+                         for proposal in self.get_proposals(generation))
         endorser_effects = dict()
         for endorser in all_endorsers:
-            PF_excluding_endorser = self.calculate_pareto_front(
-                exclude_user=endorser,
-                generation=generation)
+            PF_excluding_endorser = set(proposals[pid]
+                                        for pid in fronts[endorser.id])
             PF_plus = PF_excluding_endorser - pareto
             PF_minus = pareto - PF_excluding_endorser
             if (len(PF_plus) or len(PF_minus)):
@@ -5034,45 +5232,46 @@ class Question(db.Model):
         :rtype: dict
         '''
         generation = generation or self.generation
+        algorithm = algorithm or app.config['ALGORITHM_VERSION']
 
         key_players = dict()
-        pareto = self.calculate_pareto_front(generation=generation)
+        pareto = self.calculate_pareto_front(generation=generation,
+                                             algorithm=algorithm)
         if (len(pareto) == 0):
             return dict()
 
         app.logger.debug("+++++++++++ CALCULATE  KEY  PLAYERS ++++++++++\n")
         app.logger.debug("@@@@@@@@@@ PARETO FRONT @@@@@@@@@@ %s\n", pareto)
-        current_endorsers = self.get_endorsers(generation)
+        snapshot = self.get_vote_snapshot(generation)
+        current_endorsers = get_users_by_ids(snapshot.all_endorser_ids())
         app.logger.debug("++++++++++ CURRENT ENDORSERS %s\n",
                          current_endorsers)
+        (engine, fronts) = self.calculate_leave_one_out_pareto_fronts(
+            [user.id for user in current_endorsers],
+            pareto,
+            proposals=pareto,
+            generation=generation,
+            algorithm=algorithm,
+            snapshot=snapshot)
+
+        pareto_proposals = dict((proposal.id, proposal) for proposal in pareto)
         for user in current_endorsers:
-            app.logger.debug("+++++++++++ Checking User +++++++++++ %s\n",
-                             user.id)
-            users_endorsed_proposal_ids =\
-                user.get_endorsed_proposal_ids(self, generation)
-            app.logger.debug(">>>>>>>>>> Users endorsed proposal IDs %s\n",
-                             users_endorsed_proposal_ids)
-            app.logger.debug("Calc PF excluding %s\n", user.id)
-            new_pareto = self.calculate_pareto_front(proposals=pareto,
-                                                     exclude_user=user,
-                                                     generation=generation)
+            new_pareto = fronts[user.id]
             app.logger.debug(">>>>>>> NEW PARETO = %s\n", new_pareto)
-            if (pareto != new_pareto):
+            if (set(pareto_proposals) != new_pareto):
                 app.logger.debug("%s is a key player\n", user.id)
-                users_pareto_proposals = pareto.difference(new_pareto)
+                users_pareto_proposals = set(pareto_proposals) - new_pareto
                 app.logger.debug(">>>>>>>>>users_pareto_proposals %s\n",
                                  users_pareto_proposals)
                 key_players[user] = set()
                 for users_proposal in users_pareto_proposals:
-                    key_players[user].update(
-                        Question.who_dominates_this_excluding(
-                            users_proposal,
-                            pareto,
-                            user,
-                            generation))
+                    could_dominate = engine.dominators_excluding(
+                        users_proposal, pareto_proposals, user.id)
+                    key_players[user].update(pareto_proposals[pid]
+                                             for pid in could_dominate)
                     app.logger.debug(
                         "Pareto Props that could dominate PID %s %s\n",
-                        users_proposal.id,
+                        users_proposal,
                         key_players[user])
             else:
                 app.logger.debug("%s is not a key player\n", user.id)
@@ -5245,15 +5444,18 @@ class Question(db.Model):
             keys.append(k)
         return inv
 
-    def get_complex_voting_graph(self, generation=None):
+    def get_complex_voting_graph(self, generation=None, background=False):
         '''
-        .. function:: get_complex_voting_graph(generation)
+        .. function:: get_complex_voting_graph(generation[, background=False])
 
         Generates the svg map file from the dot string and returns the map URL.
 
         :param generation: the question generation
         :type generation: Integer
-        :rtype: String or Boolean
+        :param background: queue the render on the render queue and return
+            None if the map does not exist yet
+        :type background: boolean
+        :rtype: String, Boolean or None
         '''
         # Generate filename
         '''
@@ -5289,40 +5491,18 @@ class Question(db.Model):
         # Create the SVG file if it doesn't exist
         if not os.path.isfile(filepath + '.svg'):
 
-            # Create DOT file if it doesn't exist
-            if not os.path.isfile(filepath + '.dot'):
-                # Create the dot specification of the map
-                app.logger.debug("dot file not found: create")
-                # sick
-                voting_graph = self.create_new_graph(
-                    generation=generation)
-
-                # Save the dot specification as a dot file
-                app.logger.debug("Writing dot file %s.dot", filepath)
-                dot_file = open(filepath+".dot", "w")
-                dot_file.write(voting_graph.encode('utf8'))
-                dot_file.close()
-
-                if not os.path.isfile(filepath + '.dot'):
-                    app.logger.debug('Failed to create dot file %s.dot',
-                                     filepath)
-                    return False
-
-            else:
-                app.logger.debug("%s.dot file found...", filepath)
-
-            # Generate svg file from the dot file using "dot"
-            import pydot
-            graph = pydot.graph_from_dot_file(filepath+'.dot')
+            if background:
+                return queue_voting_graph(filename,
+                                          self.id,
+                                          'get_complex_voting_graph',
+                                          generation=generation)
 
-            # It is required on some systems to set the path to the Graphviz
-            # dot file (Dreamhost, possibly because it uses Passenger)
-            if app.config['GRAPHVIZ_DOT_PATH'] is not None:
-                app.logger.debug('Setting Graphviz path to %s', app.config['GRAPHVIZ_DOT_PATH'])
-                path = {'dot': app.config['GRAPHVIZ_DOT_PATH']}
-                graph.set_graphviz_executables(path)
+            # Stream the dot specification of the map straight into dot
+            def write_graph(stream):
+                self.create_new_graph(generation=generation, stream=stream)
 
-            graph.write_svg(filepath+'.svg')
+            app.logger.debug("Rendering %s.svg", filepath)
+            render_map_svg(write_graph, filepath)
 
             if not os.path.isfile(filepath + '.svg'):
                 app.logger.debug('Failed to create svg file %s.svg',
@@ -5336,9 +5516,10 @@ class Question(db.Model):
                          generation=None,
                          map_type='all',
                          proposal_level_type=GraphLevelType.layers,
-                         user_level_type=GraphLevelType.layers): # oldgraph
+                         user_level_type=GraphLevelType.layers,
+                         background=False): # oldgraph
         '''
-        .. function:: get_voting_graph(generation, map_type)
+        .. function:: get_voting_graph(generation, map_type[, background=False])
 
         Generates the svg map file from the dot string and returns the map URL.
 
@@ -5346,7 +5527,10 @@ class Question(db.Model):
         :type generation: Integer
         :param map_type: map type
         :type map_type: string
-        :rtype: String or Boolean
+        :param background: queue the render on the render queue and return
+            None if the map does not exist yet
+        :type background: boolean
+        :rtype: String, Boolean or None
         '''
         # Generate filename
         '''
@@ -5389,56 +5573,35 @@ class Question(db.Model):
         # Create the SVG file if it doesn't exist
         if not os.path.isfile(filepath + '.svg'):
 
-            # Create DOT file if it doesn't exist
-            if not os.path.isfile(filepath + '.dot'):
-                # Create the dot specification of the map
-                app.logger.debug("dot file not found: create")
-                if map_type == 'pareto':
-                    app.logger.debug("Generating pareto graph...")
-                    #map_proposals = self.\
-                    #   get_pareto_front(generation=generation, calculate_if_missing=True)
-                    map_proposals = self.calculate_pareto_front(generation=generation,
-                                                                algorithm=algorithm)
-                else:
-                    map_proposals = self.\
-                        get_proposals(generation=generation)
-
-                app.logger.debug("Generating map with proposals...")
-                app.logger.debug("DEBUG_MAP Generating map with proposals %s...", map_proposals)
+            if background:
+                return queue_voting_graph(filename,
+                                          self.id,
+                                          'get_voting_graph',
+                                          generation=generation,
+                                          map_type=map_type,
+                                          proposal_level_type=proposal_level_type,
+                                          user_level_type=user_level_type)
+
+            if map_type == 'pareto':
+                app.logger.debug("Generating pareto graph...")
+                map_proposals = self.calculate_pareto_front(generation=generation,
+                                                            algorithm=algorithm)
+            else:
+                map_proposals = self.\
+                    get_proposals(generation=generation)
 
-                voting_graph = self.make_graphviz_map( # sick
+            # Stream the dot specification of the map straight into dot
+            def write_graph(stream):
+                self.make_graphviz_map( # sick
                     proposals=map_proposals,
                     generation=generation,
                     proposal_level_type=proposal_level_type,
                     user_level_type=user_level_type,
-                    algorithm=algorithm)
-
-                # Save the dot specification as a dot file
-                app.logger.debug("Writing dot file %s.dot", filepath)
-                dot_file = open(filepath+".dot", "w")
-                dot_file.write(voting_graph.encode('utf8'))
-                dot_file.close()
-
-                if not os.path.isfile(filepath + '.dot'):
-                    app.logger.debug('Failed to create dot file %s.dot',
-                                     filepath)
-                    return False
-
-            else:
-                app.logger.debug("%s.dot file found...", filepath)
-
-            # Generate svg file from the dot file using "dot"
-            import pydot
-            graph = pydot.graph_from_dot_file(filepath+'.dot')
-
-            # It is required on some systems to set the path to the Graphviz
-            # dot file (Dreamhost, possibly because it uses Passenger)
-            if app.config['GRAPHVIZ_DOT_PATH'] is not None:
-                app.logger.debug('Setting Graphviz path to %s', app.config['GRAPHVIZ_DOT_PATH'])
-                path = {'dot': app.config['GRAPHVIZ_DOT_PATH']}
-                graph.set_graphviz_executables(path)
+                    algorithm=algorithm,
+                    stream=stream)
 
-            graph.write_svg(filepath+'.svg')
+            app.logger.debug("Rendering %s.svg", filepath)
+            render_map_svg(write_graph, filepath)
 
             if not os.path.isfile(filepath + '.svg'):
                 app.logger.debug('Failed to create svg file %s.svg',
@@ -5561,32 +5724,47 @@ class Question(db.Model):
 
         :param generation: The question generation
         :type generation: integer
-        :rtype: dict
+        :rtype: set of proposal objects
+        '''
+        complex_pareto = self.calculate_complex_pareto(generation)
+        return get_proposals_by_ids([data['id'] for data in complex_pareto])
+
+    def calculate_complex_pareto(self, generation=None):
+        '''
+        .. function:: calculate_complex_pareto([generation])
+
+        Calculate complex pareto front, split between the proposals which
+        were understood by all voters and those which were not.
+        Closed generations are read from the pareto_front table.
+
+        :param generation: The question generation
+        :type generation: integer
+        :rtype: list of dicts {'id': proposal ID, 'understood': boolean}
         '''
         app.logger.debug("calculate_complex_pareto_front called..")
         generation = generation or self.generation
         algorithm = 2
 
+        saved = self.get_saved_pareto_front(generation=generation,
+                                            algorithm=algorithm)
+        if saved:
+            return [{'id': row.proposal_id, 'understood': row.understood}
+                    for row in saved]
+
         filenamehash = make_new_map_filename_hashed(self,
                                                     generation,
                                                     algorithm)
 
         app.logger.debug("calculate_complex_pareto_front: filenamehash = %s", filenamehash)
-        filepath = app.config['WORK_FILE_DIRECTORY'] + '/' + 'complex_pareto_' + filenamehash + '.pkl'
-        app.logger.debug("calculate_complex_pareto_front: check for cache file %s", filepath)
-
-        if app.config['CACHE_COMPLEX_DOM']:
-            if os.path.isfile(filepath):
-                app.logger.debug('calculate_complex_pareto_front: RETURNING CACHED DATA')
-                with open(filepath, 'rb') as input:
-                    #return pickle.load(input)
-                    complex_pareto = pickle.load(input)
-                    pareto_proposals = []
-                    for data in complex_pareto:
-                        pareto_proposals.append(Proposal.query.get(data['id']))
-                    return set(pareto_proposals)
-            else:
-                app.logger.debug("Cache file %s not found", filepath)
+        cache_key = 'complex_pareto_' + filenamehash
+        app.logger.debug("calculate_complex_pareto_front: check for cache entry %s", cache_key)
+
+        complex_pareto = get_cache().get(cache_key)
+        if complex_pareto is not None:
+            app.logger.debug('calculate_complex_pareto_front: RETURNING CACHED DATA')
+            return complex_pareto
+        else:
+            app.logger.debug("Cache entry %s not found", cache_key)
 
         proposals = self.get_proposals_list(generation)
         all_proposals = copy.copy(proposals)
@@ -5774,20 +5952,78 @@ class Question(db.Model):
         for pid in pareto_not_understood:
             complex_pareto.append({'id': pid, 'understood': False})
 
-        if app.config['CACHE_COMPLEX_DOM']:
-            app.logger.debug("calculate_complex_pareto_front: saving cache to file %s", filepath)
-            save_object(complex_pareto, r'' + filepath)
+        app.logger.debug("calculate_complex_pareto_front: saving cache entry %s", cache_key)
+        cache_result(cache_key, complex_pareto)
+
+        return complex_pareto
+
+    def save_pareto_front(self, generation=None, algorithm=None):
+        '''
+        .. function:: save_pareto_front([generation=None, algorithm=None])
+
+        Calculates the pareto front of a generation and saves it in the
+        pareto_front table, from where it is read once the generation is
+        closed. Called when the question is moved on.
+
+        :param generation: question generation.
+        :type generation: int
+        :param algorithm: algorithm version number
+        :type algorithm: int
+        :rtype: set of proposal objects
+        '''
+        algorithm = algorithm or app.config['ALGORITHM_VERSION']
+        generation = generation or self.generation
 
-        pareto_proposals = []
+        if algorithm == 2:
+            complex_pareto = self.calculate_complex_pareto(generation)
+        else:
+            pareto = self.calculate_pareto_front_original(generation=generation,
+                                                          save=True)
+            snapshot = self.get_vote_snapshot(generation)
+            complex_pareto = [{'id': proposal.id,
+                               'understood': snapshot.is_completely_understood(proposal.id)}
+                              for proposal in pareto]
+
+        ParetoFront.query\
+            .filter(ParetoFront.question_id == self.id)\
+            .filter(ParetoFront.generation == generation)\
+            .filter(ParetoFront.algorithm == algorithm)\
+            .delete()
         for data in complex_pareto:
-            pareto_proposals.append(Proposal.query.get(data['id']))
+            db_session.add(ParetoFront(self.id, generation, algorithm,
+                                       data['id'], data['understood']))
+
+        return get_proposals_by_ids([data['id'] for data in complex_pareto])
+
+    def get_saved_pareto_front(self, generation=None, algorithm=None):
+        '''
+        .. function:: get_saved_pareto_front([generation=None, algorithm=None])
+
+        Returns the saved pareto front of a closed generation. The pareto
+        front of the current generation is never read from the table as
+        it can still change.
 
-        return set(pareto_proposals)
+        :param generation: question generation.
+        :type generation: int
+        :param algorithm: algorithm version number
+        :type algorithm: int
+        :rtype: list of ParetoFront
+        '''
+        algorithm = algorithm or app.config['ALGORITHM_VERSION']
+        generation = generation or self.generation
+        if generation >= self.generation:
+            return list()
+        return ParetoFront.query\
+            .filter(ParetoFront.question_id == self.id)\
+            .filter(ParetoFront.generation == generation)\
+            .filter(ParetoFront.algorithm == algorithm)\
+            .order_by(ParetoFront.id)\
+            .all()
 
-    def create_new_graph(self, generation=None, algorithm=2): # ttt
+    def create_new_graph(self, generation=None, algorithm=2, stream=None): # ttt
         '''
         .. function:: create_new_graph(
-            dom_map)
+            [generation=None, algorithm=2, stream=None])
 
         Use the complex algorithm to creat the domination graph
 
@@ -5795,7 +6031,9 @@ class Question(db.Model):
         :type generation: int
         :param algorithm: the algorithm
         :type algorithm: int
-        :rtype: String
+        :param stream: stream to write the dot specification to
+        :type stream: file or None
+        :rtype: String, or None if written to the stream
         '''
         app.logger.debug("create_new_graph called: Algorithm = %s", algorithm)
         generation = generation or self.generation
@@ -5996,26 +6234,27 @@ class Question(db.Model):
         app.logger.debug("proposal_levels_keys ==> %s", proposal_levels_keys)
 
         # Begin creation of Graphviz string ttt
+        writer = dotgraph.DotWriter(stream)
         title = self.string_safe(self.title)
-        voting_graph = 'digraph "%s" {\n' % (title)
+        writer.write('digraph "', title, '" {\n')
 
         for l in proposal_levels_keys:
-            voting_graph += ' "pl' + str(l) +\
-                '" [shape=point fontcolor=white ' +\
-                'color=white fontsize=1]; \n'
+            writer.write(' "pl', str(l),
+                         '" [shape=point fontcolor=white ',
+                         'color=white fontsize=1]; \n')
 
         for l in proposal_levels_keys:
             if (l != proposal_levels_keys[0]):
-                voting_graph += ' -> '
-            voting_graph += '"pl' + str(l) + '" '
+                writer.write(' -> ')
+            writer.write('"pl', str(l), '" ')
 
-        voting_graph += " [color=white] \n "
+        writer.write(" [color=white] \n ")
 
         for l in proposal_levels_keys:
-            voting_graph += '{rank=same; "pl' + str(l) + '" '
+            writer.write('{rank=same; "pl', str(l), '" ')
             for p in proposal_levels[l]:
-                voting_graph += " " + str(proposals_by_id[p].id) + " "
-            voting_graph += "}\n"
+                writer.write(" ", str(proposals_by_id[p].id), " ")
+            writer.write("}\n")
 
         for p in all_proposals:
             color = "black"
@@ -6029,30 +6268,13 @@ class Question(db.Model):
                 fillcolor = '"white" '
 
             tooltip = self.create_proposal_tooltip(p)
-            app.logger.debug("tootltip = %s", tooltip)
-
-            voting_graph += str(p.id) +\
-                ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                ' shape=box fillcolor=' + fillcolor +\
-                ' style=filled color=' + color + ' peripheries=' +\
-                str(peripheries) + ' tooltip="' + tooltip +\
-                '"  fontsize=11]'
 
-            '''
-            if p.id in pareto_understood or p.id in pareto_not_understood or p.id in step6:
-                voting_graph += str(p.id) +\
-                    ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                    ' shape=box fillcolor=' + fillcolor +\
-                    ' style=filled color=' + color + ' peripheries=' +\
-                    str(peripheries) + ' tooltip="' + tooltip +\
-                    '"  fontsize=11]'
-            else:
-                voting_graph += str(p.id) +\
-                    ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                    ' shape=box fillcolor="white" style="filled" color=' + color + ' peripheries=' +\
-                    str(peripheries) + ' tooltip="' + tooltip +\
-                    '"  fontsize=11]'
-            '''
+            writer.write(str(p.id),
+                         ' [id=p', str(p.id), ' label=', str(p.id),
+                         ' shape=box fillcolor=', fillcolor,
+                         ' style=filled color=', color, ' peripheries=',
+                         str(peripheries), ' tooltip="', tooltip,
+                         '"  fontsize=11]')
 
         edge_type = {'full': 'normal', 'partial': 'onormal'}
 
@@ -6066,29 +6288,22 @@ class Question(db.Model):
                 left_prop_id = 'p' + str(proposals_by_id[pc].id)
                 right_prop_id = 'p' + str(proposal.id)
 
-                # app.logger.debug("Check dom type for drawing arrowhead for proposal %s ==> %s", proposal.id, dom_map[proposal.id][pc])
-
                 if dom_map[proposal.id][pc] in [3,4]:
                     dom_type = 'partial'
                 else:
                     dom_type = 'full'
 
-                edge_id = 'id="' + left_prop_id + '&#45;&#45;' +\
-                    right_prop_id + '"'
+                # Arrows point in the direction of the domination
+                writer.write(' ', str(proposal.id), ' -> ',
+                             str(proposals_by_id[pc].id),
+                             ' [id="', left_prop_id, '&#45;&#45;',
+                             right_prop_id, '" class="edge" color="', color,
+                             '" arrowhead="', edge_type[dom_type], '"]',
+                             " \n")
 
-                #voting_graph += ' ' + str(proposals_by_id[pc].id) + ' -> ' + str(proposal.id) +\
-                #    ' [' + edge_id + ' class="edge" color="' + color + '" arrowhead="' + edge_type[dom_type] + '"]'
+        writer.write("\n}")
 
-                # Change arrows to point in the direction of the domination
-                #
-                voting_graph += ' ' + str(proposal.id) + ' -> ' +  str(proposals_by_id[pc].id)  +\
-                    ' [' + edge_id + ' class="edge" color="' + color + '" arrowhead="' + edge_type[dom_type] + '"]'
-
-                voting_graph += " \n"
-
-        voting_graph += "\n}"
-
-        return voting_graph
+        return writer.close()
 
     # oldgraph
     def make_graphviz_map_plain(self,
@@ -6096,13 +6311,16 @@ class Question(db.Model):
                           generation=None,
                           proposal_level_type=GraphLevelType.layers,
                           user_level_type=GraphLevelType.layers,
-                          algorithm=None):
+                          algorithm=None,
+                          stream=None):
         '''
         .. function:: make_graphviz_map_plain(
             [proposals=None,
             generation=None,
             proposal_level_type=GraphLevelType.layers,
-            user_level_type=GraphLevelType.layerss])
+            user_level_type=GraphLevelType.layerss,
+            algorithm=None,
+            stream=None])
 
         Generates the string to create a voting graph from Graphviz.
         This version does not personalise the graph for each user -
@@ -6116,7 +6334,9 @@ class Question(db.Model):
         :type proposal_level_type: GraphLevelType
         :param user_level_type: required layout of user nodes
         :type user_level_type: GraphLevelType
-        :rtype: String
+        :param stream: stream to write the dot specification to
+        :type stream: file or None
+        :rtype: String, or None if written to the stream
         '''
         app.logger.debug("make_graphviz_map_plain called....")
 
@@ -6274,45 +6494,45 @@ class Question(db.Model):
         user_levels_keys = user_levels.keys()
 
         # Begin creation of Graphviz string
+        writer = dotgraph.DotWriter(stream)
         title = self.string_safe(self.title)
-        voting_graph = 'digraph "%s" {\n' % (title)
+        writer.write('digraph "', title, '" {\n')
 
         for l in proposal_levels_keys:
-            voting_graph += ' "pl' + str(l) +\
-                '" [shape=point fontcolor=white ' +\
-                'color=white fontsize=1]; \n'
+            writer.write(' "pl', str(l),
+                         '" [shape=point fontcolor=white ',
+                         'color=white fontsize=1]; \n')
 
         for l in user_levels_keys:
-            voting_graph += ' "ul' + str(l) + '" [shape=point ' +\
-                'fontcolor=white ' +\
-                'color=white fontsize=1]; \n'
+            writer.write(' "ul', str(l), '" [shape=point ',
+                         'fontcolor=white ',
+                         'color=white fontsize=1]; \n')
 
         for l in proposal_levels_keys:
             if (l != proposal_levels_keys[0]):
-                voting_graph += ' -> '
-            voting_graph += '"pl' + str(l) + '" '
+                writer.write(' -> ')
+            writer.write('"pl', str(l), '" ')
 
         for l in user_levels_keys:
-            voting_graph += ' -> '
-            voting_graph += '"ul' + str(l) + '" '
+            writer.write(' -> ', '"ul', str(l), '" ')
 
-        voting_graph += " [color=white] \n "
+        writer.write(" [color=white] \n ")
 
         for l in proposal_levels_keys:
-            voting_graph += '{rank=same; "pl' + str(l) + '" '
+            writer.write('{rank=same; "pl', str(l), '" ')
             for p in proposal_levels[l]:
                 if (p in bundled_proposals):
                     continue
-                voting_graph += " " + str(p.id) + " "
-            voting_graph += "}\n"
+                writer.write(" ", str(p.id), " ")
+            writer.write("}\n")
 
         for l in user_levels_keys:
-            voting_graph += '{rank=same; "ul' + str(l) + '" '
+            writer.write('{rank=same; "ul', str(l), '" ')
             for u in user_levels[l]:
                 if (u in bundled_users):
                     continue
-                voting_graph += '"' + u.username + '" '
-            voting_graph += "}\n"
+                writer.write('"', u.username, '" ')
+            writer.write("}\n")
 
         for kc2u in combined_users:
             details_table = '  '
@@ -6324,12 +6544,12 @@ class Question(db.Model):
             details = ' fillcolor=white style=filled color=' +\
                 color + ' peripheries=' + str(peripheries) + ' '
 
-            voting_graph += self.write_bundled_users(
+            writer.write(self.write_bundled_users(
                 kc2u.username,
                 combined_users[kc2u],
                 self.room,
                 details,
-                details_table)
+                details_table))
 
         for e in endorsers:
             if (e in bundled_users or e in combined_users):
@@ -6340,12 +6560,12 @@ class Question(db.Model):
             peripheries = 0
 
             # Add id to user node
-            voting_graph += '"' + e.username + '" [id=u' + str(e.id) +\
-                ' shape=egg fillcolor=' +\
-                fillcolor +\
-                ' style=filled color=' + color + ' peripheries=' +\
-                str(peripheries) + ' style=filled  fontsize=11]'
-            voting_graph += "\n"
+            writer.write('"', e.username, '" [id=u', str(e.id),
+                         ' shape=egg fillcolor=',
+                         fillcolor,
+                         ' style=filled color=', color, ' peripheries=',
+                         str(peripheries), ' style=filled  fontsize=11]',
+                         "\n")
 
         keys = combined_proposals.keys()
         for kc2p in keys:
@@ -6374,10 +6594,10 @@ class Question(db.Model):
                 details = ' fillcolor=white color=' + color +\
                     ' peripheries=' + str(peripheries) + ' '
 
-            voting_graph += self.write_bundled_proposals(
+            writer.write(self.write_bundled_proposals(
                 kc2p.id, combined_proposals[kc2p], self.room,
                 details,
-                details_table)
+                details_table))
 
         all_combined_proposals = set()
         for s in combined_proposals.values():
@@ -6385,13 +6605,6 @@ class Question(db.Model):
 
         for p in proposals:
 
-            app.logger.debug("Skip prop if in a bundle...")
-
-            app.logger.debug("continue if %s in %s or in %s\n",
-                             p,
-                             bundled_proposals,
-                             all_combined_proposals)
-
             if (p in bundled_proposals):
                 app.logger.debug(
                     "Prop %s is in bundled_proposals - skip...", p)
@@ -6406,36 +6619,29 @@ class Question(db.Model):
             peripheries = 1
 
             if (p in pareto):
-                app.logger.debug("DEBUG_MAP: p = %s", p)
-                endo = p.endorsers(generation)
-
-                app.logger.debug("DEBUG_MAP: endo = %s", endo)
-                app.logger.debug("DEBUG_MAP: endorsers = %s", endorsers)
+                endo = proposal_endorsers[p]
 
                 if (len(endo) == len(endorsers)):
                     fillcolor = '"gold"'
                 else:
                     fillcolor = '"lightblue" '
 
-                urlquery = self.create_proposal_url(p, self.room)
                 tooltip = self.create_proposal_tooltip(p)
-                voting_graph += str(p.id) +\
-                    ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                    ' shape=box fillcolor=' + fillcolor +\
-                    ' style=filled color=' + color + ' peripheries=' +\
-                    str(peripheries) + ' tooltip="' + tooltip +\
-                    '"  fontsize=11]'
-
+                writer.write(str(p.id),
+                             ' [id=p', str(p.id), ' label=', str(p.id),
+                             ' shape=box fillcolor=', fillcolor,
+                             ' style=filled color=', color, ' peripheries=',
+                             str(peripheries), ' tooltip="', tooltip,
+                             '"  fontsize=11]')
 
             else:
-                urlquery = self.create_proposal_url(p, self.room)
                 tooltip = self.create_proposal_tooltip(p)
-                voting_graph += str(p.id) +\
-                    ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                    ' shape=box fillcolor="white" style="filled" color=' + color + ' peripheries=' +\
-                    str(peripheries) + ' tooltip="' +\
-                    tooltip +\
-                    '"  fontsize=11]'
+                writer.write(str(p.id),
+                             ' [id=p', str(p.id), ' label=', str(p.id),
+                             ' shape=box fillcolor="white" style="filled" color=', color, ' peripheries=',
+                             str(peripheries), ' tooltip="',
+                             tooltip,
+                             '"  fontsize=11]')
 
         for p in proposals:
             pcolor = "black"
@@ -6463,12 +6669,10 @@ class Question(db.Model):
                     p,
                     combined_proposals)
 
-                edge_id = 'id="' + left_prop_id + '&#45;&#45;' +\
-                    right_prop_id + '"'
-
-                voting_graph += ' ' + str(pc.id) + ' -> ' + str(p.id) +\
-                    ' [' + edge_id + ' class="edge" color="' + color + '"]'
-                voting_graph += " \n"
+                writer.write(' ', str(pc.id), ' -> ', str(p.id),
+                             ' [id="', left_prop_id, '&#45;&#45;',
+                             right_prop_id, '" class="edge" color="', color,
+                             '"]', " \n")
 
         for e in endorsers:
             ecolor = "blue"
@@ -6493,17 +6697,10 @@ class Question(db.Model):
                     ec,
                     combined_users)
 
-                if e.id == 2:
-                    app.logger.debug("left_usernode_id ==> %s", left_usernode_id)
-                    app.logger.debug("right_usernode_id ==> %s", right_usernode_id)
-
-                edge_id = 'id="' + left_usernode_id + '&#45;&#45;' +\
-                    right_usernode_id + '"'
-
-                voting_graph += '"' + e.username + '" -> "' + ec.username +\
-                    '"' +\
-                    ' [' + edge_id + ' class="edge" color="' + color + '"]'
-                voting_graph += " \n"
+                writer.write('"', e.username, '" -> "', ec.username, '"',
+                             ' [id="', left_usernode_id, '&#45;&#45;',
+                             right_usernode_id, '" class="edge" color="',
+                             color, '"]', " \n")
 
         new_proposals = dict()
         for e in endorsers:
@@ -6522,23 +6719,12 @@ class Question(db.Model):
                 p,
                 proposals_covered)
 
-            app.logger.debug("Proposal p ==> %s\n", p)
-
-            app.logger.debug("endorsers_to_this ==> %s\n", endorsers_to_this)
-
-            app.logger.debug("new_proposals ==> %s\n", new_proposals)
-
             for e in endorsers_to_this:
 
-                app.logger.debug("Endorser e ==> %s\n", e)
-
                 if (e in bundled_users):
-                    app.logger.debug("e in bundled_users: continue...\n")
                     continue
 
                 if (p.id not in new_proposals[e]):
-                    app.logger.debug("%s not in %s: continue...\n",
-                                     p, new_proposals[e])
                     continue
 
                 color = "blue"
@@ -6551,16 +6737,14 @@ class Question(db.Model):
                     p,
                     combined_proposals)
 
-                edge_id = 'id="' + usernode_id + '&#45;&#45;' +\
-                    propnode_id + '"'
-
-                voting_graph += ' "' + e.username + '" -> ' + str(p.id) +\
-                    ' [' + edge_id + ' class="edge" color="' + color + '"]'
-                voting_graph += " \n"
+                writer.write(' "', e.username, '" -> ', str(p.id),
+                             ' [id="', usernode_id, '&#45;&#45;',
+                             propnode_id, '" class="edge" color="', color,
+                             '"]', " \n")
 
-        voting_graph += "\n}"
+        writer.write("\n}")
 
-        return voting_graph
+        return writer.close()
 
     # newgraph
     def make_graphviz_map(self,
@@ -6572,7 +6756,8 @@ class Question(db.Model):
                           address_image='',
                           highlight_user1=None,
                           highlight_proposal1=None,
-                          algorithm=None):
+                          algorithm=None,
+                          stream=None):
         '''
         .. function:: make_graphviz_map(
             [proposals=None,
@@ -6583,7 +6768,8 @@ class Question(db.Model):
             address_image='',
             highlight_user1=None,
             highlight_proposal1=None],
-            algorithm=None)
+            algorithm=None,
+            stream=None)
 
         Generates the string to create a voting graph from Graphviz.
 
@@ -6603,7 +6789,9 @@ class Question(db.Model):
         :type highlight_user1: string
         :param highlight_proposal1: User to highlight
         :type highlight_proposal1: string
-        :rtype: String
+        :param stream: stream to write the dot specification to
+        :type stream: file or None
+        :rtype: String, or None if written to the stream
         '''
         generation = generation or self.generation
         algorithm = algorithm or app.config['ALGORITHM_VERSION'] # sick
@@ -6624,11 +6812,17 @@ class Question(db.Model):
                                              algorithm=algorithm)
         # app.logger.debug("pareto %s\n", pareto)
 
+        # Load all votes of the generation at once
+        snapshot = self.get_vote_snapshot(generation)
+
         # get set of all endorsers
         # endorsers = self.get_endorsers(generation)
-        endorsers = set()
-        for proposal in proposals:
-            endorsers.update(proposal.endorsers(generation))
+        endorser_ids = snapshot.all_endorser_ids(proposal_ids)
+        users = dict()
+        if endorser_ids:
+            for user in User.query.filter(User.id.in_(endorser_ids)).all():
+                users[user.id] = user
+        endorsers = set(users.values())
         app.logger.debug("endorsers %s\n",
                          endorsers)
 
@@ -6636,7 +6830,7 @@ class Question(db.Model):
         proposal_endorsers = dict()
         for proposal in proposals:
             proposal_endorsers[proposal] =\
-                proposal.endorsers(generation)
+                set(users[uid] for uid in snapshot.endorser_ids(proposal.id))
         app.logger.debug("proposal_endorsers %s\n",
                          proposal_endorsers)
 
@@ -6644,14 +6838,15 @@ class Question(db.Model):
         endorser_proposals = dict()
         for endorser in endorsers:
             endorser_proposals[endorser] =\
-                endorser.get_endorsed_proposal_ids_new(self, generation, proposal_ids) # fix?
+                snapshot.endorsed_proposal_ids(endorser.id, proposal_ids)
         app.logger.debug("endorser_proposals %s\n",
                          endorser_proposals)
 
         # get dict of pareto proposals => endorsers
         pareto_endorsers = dict()
         for proposal in pareto:
-            pareto_endorsers[proposal.id] = proposal.endorsers(generation)
+            pareto_endorsers[proposal.id] =\
+                set(users[uid] for uid in snapshot.endorser_ids(proposal.id))
         app.logger.debug("pareto proposals => endorsers %s\n",
                          pareto_endorsers)
 
@@ -6766,45 +6961,45 @@ class Question(db.Model):
         user_levels_keys = user_levels.keys()
 
         # Begin creation of Graphviz string
+        writer = dotgraph.DotWriter(stream)
         title = self.string_safe(self.title)
-        voting_graph = 'digraph "%s" {\n' % (title)
+        writer.write('digraph "', title, '" {\n')
 
         for l in proposal_levels_keys:
-            voting_graph += ' "pl' + str(l) +\
-                '" [shape=point fontcolor=white ' +\
-                'color=white fontsize=1]; \n'
+            writer.write(' "pl', str(l),
+                         '" [shape=point fontcolor=white ',
+                         'color=white fontsize=1]; \n')
 
         for l in user_levels_keys:
-            voting_graph += ' "ul' + str(l) + '" [shape=point ' +\
-                'fontcolor=white ' +\
-                'color=white fontsize=1]; \n'
+            writer.write(' "ul', str(l), '" [shape=point ',
+                         'fontcolor=white ',
+                         'color=white fontsize=1]; \n')
 
         for l in proposal_levels_keys:
             if (l != proposal_levels_keys[0]):
-                voting_graph += ' -> '
-            voting_graph += '"pl' + str(l) + '" '
+                writer.write(' -> ')
+            writer.write('"pl', str(l), '" ')
 
         for l in user_levels_keys:
-            voting_graph += ' -> '
-            voting_graph += '"ul' + str(l) + '" '
+            writer.write(' -> ', '"ul', str(l), '" ')
 
-        voting_graph += " [color=white] \n "
+        writer.write(" [color=white] \n ")
 
         for l in proposal_levels_keys:
-            voting_graph += '{rank=same; "pl' + str(l) + '" '
+            writer.write('{rank=same; "pl', str(l), '" ')
             for p in proposal_levels[l]:
                 if (p in bundled_proposals):
                     continue
-                voting_graph += " " + str(p.id) + " "
-            voting_graph += "}\n"
+                writer.write(" ", str(p.id), " ")
+            writer.write("}\n")
 
         for l in user_levels_keys:
-            voting_graph += '{rank=same; "ul' + str(l) + '" '
+            writer.write('{rank=same; "ul', str(l), '" ')
             for u in user_levels[l]:
                 if (u in bundled_users):
                     continue
-                voting_graph += '"' + u.username + '" '
-            voting_graph += "}\n"
+                writer.write('"', u.username, '" ')
+            writer.write("}\n")
 
         for kc2u in combined_users:
             details_table = '  '
@@ -6827,12 +7022,12 @@ class Question(db.Model):
             details = ' fillcolor=white style=filled color=' +\
                 color + ' peripheries=' + str(peripheries) + ' '
 
-            voting_graph += self.write_bundled_users(
+            writer.write(self.write_bundled_users(
                 kc2u.username,
                 combined_users[kc2u],
                 self.room,
                 details,
-                details_table)
+                details_table))
 
         for e in endorsers:
             if (e in bundled_users or e in combined_users):
@@ -6852,12 +7047,12 @@ class Question(db.Model):
                 peripheries = 1
 
             # Add id to user node
-            voting_graph += '"' + e.username + '" [id=u' + str(e.id) +\
-                ' shape=egg fillcolor=' +\
-                fillcolor +\
-                ' style=filled color=' + color + ' peripheries=' +\
-                str(peripheries) + ' style=filled  fontsize=11]'
-            voting_graph += "\n"
+            writer.write('"', e.username, '" [id=u', str(e.id),
+                         ' shape=egg fillcolor=',
+                         fillcolor,
+                         ' style=filled color=', color, ' peripheries=',
+                         str(peripheries), ' style=filled  fontsize=11]',
+                         "\n")
 
         keys = combined_proposals.keys()
         for kc2p in keys:
@@ -6907,12 +7102,12 @@ class Question(db.Model):
                 details = ' fillcolor=white color=' + color +\
                     ' peripheries=' + str(peripheries) + ' '
 
-            voting_graph += self.write_bundled_proposals(
+            writer.write(self.write_bundled_proposals(
                 kc2p.id, combined_proposals[kc2p], self.room,
                 details,
                 details_table,
                 internal_links,
-                highlight_proposal1)
+                highlight_proposal1))
 
         all_combined_proposals = set()
         for s in combined_proposals.values():
@@ -6920,13 +7115,6 @@ class Question(db.Model):
 
         for p in proposals:
 
-            app.logger.debug("Skip prop if in a bundle...")
-
-            app.logger.debug("continue if %s in %s or in %s\n",
-                             p,
-                             bundled_proposals,
-                             all_combined_proposals)
-
             if (p in bundled_proposals):
                 app.logger.debug(
                     "Prop %s is in bundled_proposals - skip...", p)
@@ -6954,12 +7142,10 @@ class Question(db.Model):
                     color = "red"
                     peripheries = 2
 
-            if (p in pareto):
-                app.logger.debug("DEBUG_MAP: p = %s", p)
-                endo = p.endorsers(generation)
+            tooltip = self.create_proposal_tooltip(p)
 
-                app.logger.debug("DEBUG_MAP: endo = %s", endo)
-                app.logger.debug("DEBUG_MAP: endorsers = %s", endorsers)
+            if (p in pareto):
+                endo = proposal_endorsers[p]
 
                 if (len(endo) == len(endorsers)):
                     fillcolor = '"gold"'
@@ -6967,47 +7153,43 @@ class Question(db.Model):
                     fillcolor = '"lightblue" '
 
                 if (not internal_links):
-                    urlquery = self.create_proposal_url(p, self.room)
-                    tooltip = self.create_proposal_tooltip(p)
-                    voting_graph += str(p.id) +\
-                        ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                        ' shape=box fillcolor=' + fillcolor +\
-                        ' style=filled color=' + color + ' peripheries=' +\
-                        str(peripheries) + ' tooltip="' + tooltip +\
-                        '"  fontsize=11]'
+                    writer.write(str(p.id),
+                                 ' [id=p', str(p.id), ' label=', str(p.id),
+                                 ' shape=box fillcolor=', fillcolor,
+                                 ' style=filled color=', color, ' peripheries=',
+                                 str(peripheries), ' tooltip="', tooltip,
+                                 '"  fontsize=11]')
                 else:
                     urlquery = self.create_internal_proposal_url(p)
-                    voting_graph += str(p.id) +\
-                        ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                        ' shape=box fillcolor=' + fillcolor +\
-                        ' style=filled color=' + color + ' peripheries=' +\
-                        str(peripheries) + ' tooltip="' +\
-                        self.create_proposal_tooltip(p) +\
-                        '"  fontsize=11 URL="' +\
-                        internal_links + urlquery + '" target="_top"]'
-                voting_graph += "\n"
+                    writer.write(str(p.id),
+                                 ' [id=p', str(p.id), ' label=', str(p.id),
+                                 ' shape=box fillcolor=', fillcolor,
+                                 ' style=filled color=', color, ' peripheries=',
+                                 str(peripheries), ' tooltip="',
+                                 tooltip,
+                                 '"  fontsize=11 URL="',
+                                 internal_links, urlquery, '" target="_top"]')
+                writer.write("\n")
 
             else:
                 if (not internal_links):
-                    urlquery = self.create_proposal_url(p, self.room)
-                    tooltip = self.create_proposal_tooltip(p)
-                    voting_graph += str(p.id) +\
-                        ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                        ' shape=box fillcolor="white" style="filled" color=' + color + ' peripheries=' +\
-                        str(peripheries) + ' tooltip="' +\
-                        tooltip +\
-                        '"  fontsize=11]'
+                    writer.write(str(p.id),
+                                 ' [id=p', str(p.id), ' label=', str(p.id),
+                                 ' shape=box fillcolor="white" style="filled" color=', color, ' peripheries=',
+                                 str(peripheries), ' tooltip="',
+                                 tooltip,
+                                 '"  fontsize=11]')
                 else:
                     urlquery = self.create_internal_proposal_url(p)
-                    voting_graph += str(p.id) +\
-                        ' [id=p' + str(p.id) + ' label=' + str(p.id) +\
-                        ' shape=box color=' +\
-                        color + ' peripheries=' + str(peripheries) +\
-                        ' tooltip="' +\
-                        self.create_proposal_tooltip(p) +\
-                        '"  fontsize=11 URL="' +\
-                        internal_links + urlquery + '" target="_top"]'
-                voting_graph += "\n"
+                    writer.write(str(p.id),
+                                 ' [id=p', str(p.id), ' label=', str(p.id),
+                                 ' shape=box color=',
+                                 color, ' peripheries=', str(peripheries),
+                                 ' tooltip="',
+                                 tooltip,
+                                 '"  fontsize=11 URL="',
+                                 internal_links, urlquery, '" target="_top"]')
+                writer.write("\n")
 
         for p in proposals:
             pcolor = "black"
@@ -7040,26 +7222,6 @@ class Question(db.Model):
                          pc in proposals_above[highlight_proposal1])):
                     color = "red"
 
-                '''
-                left_prop_id = ''
-                if (pc in combined_proposals):
-                    for prop in combined_proposals[pc]:
-                        if (left_prop_id):
-                            left_prop_id += '_'
-                        left_prop_id += 'p' + str(prop.id)
-                else:
-                    left_prop_id += 'p' + str(pc.id)
-
-                right_prop_id = ''
-                if (p in combined_proposals):
-                    for prop in combined_proposals[p]:
-                        if (right_prop_id):
-                            right_prop_id += '_'
-                        right_prop_id += 'p' + str(prop.id)
-                else:
-                    right_prop_id += 'p' + str(p.id)
-                '''
-
                 left_prop_id = self.calculate_propsal_node_id(
                     pc,
                     combined_proposals)
@@ -7067,12 +7229,10 @@ class Question(db.Model):
                     p,
                     combined_proposals)
 
-                edge_id = 'id="' + left_prop_id + '&#45;&#45;' +\
-                    right_prop_id + '"'
-
-                voting_graph += ' ' + str(pc.id) + ' -> ' + str(p.id) +\
-                    ' [' + edge_id + ' class="edge" color="' + color + '"]'
-                voting_graph += " \n"
+                writer.write(' ', str(pc.id), ' -> ', str(p.id),
+                             ' [id="', left_prop_id, '&#45;&#45;',
+                             right_prop_id, '" class="edge" color="', color,
+                             '"]', " \n")
 
         for e in endorsers:
             ecolor = "blue"
@@ -7105,20 +7265,10 @@ class Question(db.Model):
                     ec,
                     combined_users)
 
-                if e.id == 2:
-                    app.logger.debug("left_usernode_id ==> %s", left_usernode_id)
-                    app.logger.debug("right_usernode_id ==> %s", right_usernode_id)
-
-                # edge_id = 'id="u' + str(e.id) + '&#45;&#45;' +\
-                #    'u' + str(ec.id) + '"'
-
-                edge_id = 'id="' + left_usernode_id + '&#45;&#45;' +\
-                    right_usernode_id + '"'
-
-                voting_graph += '"' + e.username + '" -> "' + ec.username +\
-                    '"' +\
-                    ' [' + edge_id + ' class="edge" color="' + color + '"]'
-                voting_graph += " \n"
+                writer.write('"', e.username, '" -> "', ec.username, '"',
+                             ' [id="', left_usernode_id, '&#45;&#45;',
+                             right_usernode_id, '" class="edge" color="',
+                             color, '"]', " \n")
 
         new_proposals = dict()
         for e in endorsers:
@@ -7137,23 +7287,12 @@ class Question(db.Model):
                 p,
                 proposals_covered)
 
-            app.logger.debug("Proposal p ==> %s\n", p)
-
-            app.logger.debug("endorsers_to_this ==> %s\n", endorsers_to_this)
-
-            app.logger.debug("new_proposals ==> %s\n", new_proposals)
-
             for e in endorsers_to_this:
 
-                app.logger.debug("Endorser e ==> %s\n", e)
-
                 if (e in bundled_users):
-                    app.logger.debug("e in bundled_users: continue...\n")
                     continue
 
                 if (p.id not in new_proposals[e]):
-                    app.logger.debug("%s not in %s: continue...\n",
-                                     p, new_proposals[e])
                     continue
 
                 color = "blue"
@@ -7181,23 +7320,14 @@ class Question(db.Model):
                     p,
                     combined_proposals)
 
-                # if p.id == 1:
-                #    app.logger.debug("propnode_id ==> %s", propnode_id)
-                #    app.logger.debug("usernode_id ==> %s", usernode_id)
-
-                # edge_id = 'id="u' + str(e.id) + '&#45;&#45;' +\
-                #    propnode_id + '"'
+                writer.write(' "', e.username, '" -> ', str(p.id),
+                             ' [id="', usernode_id, '&#45;&#45;',
+                             propnode_id, '" class="edge" color="', color,
+                             '"]', " \n")
 
-                edge_id = 'id="' + usernode_id + '&#45;&#45;' +\
-                    propnode_id + '"'
+        writer.write("\n}")
 
-                voting_graph += ' "' + e.username + '" -> ' + str(p.id) +\
-                    ' [' + edge_id + ' class="edge" color="' + color + '"]'
-                voting_graph += " \n"
-
-        voting_graph += "\n}"
-
-        return voting_graph
+        return writer.close()
 
     def calculate_propsal_node_id(self, proposal, combined_proposals):
         '''
@@ -7424,26 +7554,13 @@ class Question(db.Model):
         return bundle
 
     def strip_tags(self, html):
-        s = MLStripper()
-        s.feed(html)
-        return s.get_data()
+        return dotgraph.strip_tags(html)
 
     def string_safe(self, s):
-        import string
-        s = self.strip_tags(s)
-        s = string.replace(s, '"', "'")
-        s = string.replace(s, '\n', " ")
-        s = string.replace(s, '&nbsp;', " ")
-        s = string.replace(s, '\r', " ")
-        s = string.replace(s, '\r\n', " ")
-        return s
+        return dotgraph.string_safe(s)
 
     def create_proposal_tooltip(self, proposal):
-        if (proposal.abstract and len(proposal.abstract) > 0):
-            tooltip = self.string_safe(proposal.abstract)
-        else:
-            tooltip = self.string_safe(proposal.blurb)
-        return tooltip[:800]
+        return dotgraph.proposal_tooltip(proposal)
 
     def create_internal_proposal_url(self, proposal):
         return "#proposal" + str(proposal.id)
@@ -7464,23 +7581,7 @@ class Question(db.Model):
         :type elements: set
         :rtype: dict
         '''
-        covered = dict()
-        elements = elements_below.keys()
-        for element in elements:
-            covered_elements = set()
-            below = elements_below[element]
-            for element1 in below:
-                for element2 in below:
-                    next_element = False
-                    under_element2 = elements_below[element2]
-                    if (element1 in under_element2):
-                        next_element = True
-                        break
-                if (next_element):
-                    continue
-                covered_elements.add(element1)
-            covered[element] = covered_elements
-        return covered
+        return hasse.covered(elements_below)
 
     def get_covered(self, elements_below, elements): # jazz
         '''
@@ -7495,22 +7596,7 @@ class Question(db.Model):
         :type elements: set
         :rtype: dict
         '''
-        covered = dict()
-        for element in elements:
-            covered_elements = set()
-            below = elements_below[element]
-            for element1 in below:
-                for element2 in below:
-                    next_element = False
-                    under_element2 = elements_below[element2]
-                    if (element1 in under_element2):
-                        next_element = True
-                        break
-                if (next_element):
-                    continue
-                covered_elements.add(element1)
-            covered[element] = covered_elements
-        return covered
+        return hasse.covered(elements_below, elements)
 
     def get_covered_complex(self, elements_below):
         '''
@@ -7525,23 +7611,7 @@ class Question(db.Model):
         :type elements: set
         :rtype: dict
         '''
-        elements = set(elements_below.keys())
-        covered = dict()
-        for element in elements:
-            covered_elements = set()
-            below = elements_below[element]
-            for element1 in below:
-                for element2 in below:
-                    next_element = False
-                    under_element2 = elements_below[element2]
-                    if (element1 in under_element2):
-                        next_element = True
-                        break
-                if (next_element):
-                    continue
-                covered_elements.add(element1)
-            covered[element] = covered_elements
-        return covered
+        return hasse.covered(elements_below)
 
     def find_levels_complex(self, elements_covered): # hereiam
         '''
@@ -7556,35 +7626,7 @@ class Question(db.Model):
         :type elements: set
         :rtype: dict
         '''
-
-        elements = set(elements_covered.keys())
-        elements_to_test = copy.copy(elements)
-
-        app.logger.debug("find_levels called...\n")
-        app.logger.debug("elements_covered => %s", elements_covered)
-        app.logger.debug("elements => %s", elements)
-
-
-        # app.logger.debug("elements_to_test = %s\n", elements_to_test)
-        levels = dict()
-        level = 0
-        elements_added = set()
-        while (len(elements_added) < len(elements)):
-            levels[level] = set()
-            for element1 in elements_to_test:
-                next_element = False
-                for element2 in elements_to_test:
-                    if (element1 in elements_covered[element2]):
-                        next_element = True
-                        break
-                if (next_element):
-                    continue
-                levels[level].add(element1)
-                elements_added.add(element1)
-            elements_to_test = elements - elements_added
-            # app.logger.debug("elements_to_test = %s\n", elements_to_test)
-            level += 1
-        return levels
+        return hasse.find_levels(elements_covered)
 
     def find_levels(self, elements_covered, elements): # hereiam
         '''
@@ -7599,32 +7641,7 @@ class Question(db.Model):
         :type elements: set
         :rtype: dict
         '''
-        app.logger.debug("find_levels called...\n")
-        app.logger.debug("elements_covered => %s", elements_covered)
-        app.logger.debug("elements => %s", elements)
-
-        elements = set(elements)
-        elements_to_test = copy.copy(elements)
-        # app.logger.debug("elements_to_test = %s\n", elements_to_test)
-        levels = dict()
-        level = 0
-        elements_added = set()
-        while (len(elements_added) < len(elements)):
-            levels[level] = set()
-            for element1 in elements_to_test:
-                next_element = False
-                for element2 in elements_to_test:
-                    if (element1 in elements_covered[element2]):
-                        next_element = True
-                        break
-                if (next_element):
-                    continue
-                levels[level].add(element1)
-                elements_added.add(element1)
-            elements_to_test = elements - elements_added
-            # app.logger.debug("elements_to_test = %s\n", elements_to_test)
-            level += 1
-        return levels
+        return hasse.find_levels(elements_covered, elements)
 
     def find_levels_based_on_size(self, A_to_B):
         '''
@@ -8022,6 +8039,103 @@ class QuestionTypes(db.Model):
         self.name = name
 
 
+class VoteVersion(db.Model):
+    '''
+    Counts the changes to the votes and proposals of a question generation.
+
+    The row is created with the generation and its version is incremented by
+    the Endorsement and QuestionHistory listeners below. With the salt, which
+    is renewed on every change, it serves as the cache key of the results
+    calculated from the votes.
+    '''
+
+    __tablename__ = 'vote_version'
+    __table_args__ = (db.UniqueConstraint('question_id', 'generation',
+                                          name='uq_vote_version_1'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', name='fk_vote_version_question', ondelete='CASCADE'), nullable=False)
+    generation = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    salt = db.Column(db.String(32), nullable=False)
+
+
+class ParetoFront(db.Model):
+    '''
+    Stores the pareto front of a generation of a question, saved when the
+    generation is closed by moving the question on.
+    '''
+
+    __tablename__ = 'pareto_front'
+    __table_args__ = (db.UniqueConstraint('question_id', 'generation', 'algorithm', 'proposal_id',
+                                          name='uq_pareto_front_1'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', name='fk_pareto_front_question', ondelete='CASCADE'), nullable=False)
+    generation = db.Column(db.Integer, nullable=False)
+    algorithm = db.Column(db.Integer, nullable=False)
+    proposal_id = db.Column(db.Integer, db.ForeignKey('proposal.id', name='fk_pareto_front_proposal', ondelete='CASCADE'), nullable=False)
+    understood = db.Column(db.Boolean, nullable=False, default=True)
+
+    def __init__(self, question_id, generation, algorithm, proposal_id, understood=True):
+        self.question_id = question_id
+        self.generation = generation
+        self.algorithm = algorithm
+        self.proposal_id = proposal_id
+        self.understood = understood
+
+
+def increment_vote_version(connection, question_id, generation):
+    '''
+    .. function:: increment_vote_version(connection, question_id, generation)
+
+    Increments the vote version of a question generation, within the
+    transaction of the change.
+
+    :param connection: database connection
+    :param question_id: question ID
+    :type question_id: int
+    :param generation: question generation
+    :type generation: int
+    '''
+    table = VoteVersion.__table__
+    result = connection.execute(
+        table.update().
+        where(and_(table.c.question_id == question_id,
+                   table.c.generation == generation)).
+        values(version=table.c.version + 1, salt=uuid.uuid4().hex)
+    )
+    if result.rowcount == 0:
+        # The row is created with the generation by create_vote_version,
+        # this only happens for generations closed before the vote_version
+        # table was added
+        connection.execute(
+            table.insert().
+            values(question_id=question_id, generation=generation,
+                   version=1, salt=uuid.uuid4().hex)
+        )
+
+
+def create_vote_version(connection, question_id, generation):
+    '''
+    .. function:: create_vote_version(connection, question_id, generation)
+
+    Creates the vote version of a new question generation, so that the
+    first votes only have to update it.
+
+    :param connection: database connection
+    :param question_id: question ID
+    :type question_id: int
+    :param generation: question generation
+    :type generation: int
+    '''
+    connection.execute(
+        VoteVersion.__table__.insert().
+        values(question_id=question_id, generation=generation,
+               version=0, salt=uuid.uuid4().hex)
+    )
+
+
 class QuestionHistory(db.Model):
     '''
     Represents the QuestionHistory object which holds the historical
@@ -8032,6 +8146,8 @@ class QuestionHistory(db.Model):
     '''
 
     __tablename__ = 'question_history'
+    __table_args__ = (db.Index('ix_question_history_question_generation',
+                               'question_id', 'generation', 'proposal_id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     proposal_id = db.Column(db.Integer, db.ForeignKey('proposal.id'))
@@ -8069,17 +8185,23 @@ class Proposal(db.Model):
 
     
     # Get anonymized text
-    def get_anonymized(self, user=None):
+    def get_anonymized(self, user=None, fields=None):
         '''
-        .. function:: get_anonymized()
+        .. function:: get_anonymized([user=None, fields=None])
 
         Conceal system content for extrnal REST responses.
 
+        :param user: current user
+        :type user: User
+        :param fields: fields to return, all fields if None
+        :type fields: set or None
         :rtype: dict
         '''
-        num_votes = self.get_vote_count()
+        num_votes = None
+        if utils.wants_field(fields, 'vote_count'):
+            num_votes = self.get_vote_count()
         image_url = ''
-        if len(self.image):
+        if len(self.image) and utils.wants_field(fields, 'image_url'):
             image_url = app.config['PROTOCOL'] + os.path.join(
                 app.config['SITE_DOMAIN'],
                 self.get_image())
@@ -8097,8 +8219,8 @@ class Proposal(db.Model):
                 'created': str(self.created),
                 'author': app.config['ANONYMIZE_CONTENT'],
                 'image_url': image_url,
-                'question_count': self.get_question_count(),
-                'comment_count': self.get_comment_count(),
+                'question_count': self.get_question_count() if utils.wants_field(fields, 'question_count') else None,
+                'comment_count': self.get_comment_count() if utils.wants_field(fields, 'comment_count') else None,
                 'vote_count': num_votes,
                 'author_id': self.author.id,
                 'geomedy': self.geomedx,
@@ -8111,20 +8233,26 @@ class Proposal(db.Model):
         anonymized['mapx'] = None
         anonymized['mapy'] = None
 
-        return anonymized
+        return utils.select_fields(anonymized, fields)
     
     
-    def get_public(self, user=None):
+    def get_public(self, user=None, fields=None):
         '''
-        .. function:: get_public()
+        .. function:: get_public([user=None, fields=None])
 
         Return public propoerties as string values for REST responses.
 
+        :param user: current user
+        :type user: User
+        :param fields: fields to return, all fields if None
+        :type fields: set or None
         :rtype: dict
         '''
-        num_votes = self.get_vote_count()
+        num_votes = None
+        if utils.wants_field(fields, 'vote_count'):
+            num_votes = self.get_vote_count()
         image_url = ''
-        if len(self.image):
+        if len(self.image) and utils.wants_field(fields, 'image_url'):
             image_url = app.config['PROTOCOL'] + os.path.join(
                 app.config['SITE_DOMAIN'],
                 self.get_image())
@@ -8141,8 +8269,8 @@ class Proposal(db.Model):
                 'created': str(self.created),
                 'author': self.author.username,
                 'image_url': image_url,
-                'question_count': self.get_question_count(),
-                'comment_count': self.get_comment_count(),
+                'question_count': self.get_question_count() if utils.wants_field(fields, 'question_count') else None,
+                'comment_count': self.get_comment_count() if utils.wants_field(fields, 'comment_count') else None,
                 'vote_count': num_votes,
                 'author_id': self.author.id,
                 'geomedy': self.geomedx,
@@ -8150,7 +8278,7 @@ class Proposal(db.Model):
                 'author_url': url_for('api_get_users', user_id=self.user_id),
                 'question_url': url_for('api_get_questions',
                                         question_id=self.question_id)}
-        if user:
+        if user and utils.wants_field(fields, 'endorse_type', 'mapx', 'mapy'):
             endorsement_data = self.get_endorsement_data(user)
             public['endorse_type'] = endorsement_data['endorsement_type']
             public['mapx'] = endorsement_data['mapx']
@@ -8160,7 +8288,7 @@ class Proposal(db.Model):
             public['mapx'] = None
             public['mapy'] = None
 
-        return public
+        return utils.select_fields(public, fields)
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
@@ -8290,6 +8418,7 @@ class Proposal(db.Model):
             Endorsement.endorsement_type == 'endorse')
         ).count()
 
+    @memo.memoized
     def get_endorser_count(self, generation=None):
         '''
         .. function:: get_endorser_count([generation=None])
@@ -8453,8 +8582,37 @@ class Proposal(db.Model):
                                                  self,
                                                  endorsement_type,
                                                  coords))
+            self.votes_changed()
         return self
 
+    def update_domination_matrix(self):
+        '''
+        .. function:: update_domination_matrix()
+
+        Updates the cached domination matrix of the question after a
+        vote on this proposal when INCREMENTAL_DOMINATION_MAP is set.
+        '''
+        if app.config['INCREMENTAL_DOMINATION_MAP']:
+            self.question.update_domination_matrix()
+
+    def votes_changed(self):
+        '''
+        .. function:: votes_changed()
+
+        Updates the domination matrix and the endorsement results of the
+        question after a vote on this proposal. With RESULTS_IN_BACKGROUND
+        the endorsement results, which read every vote of the generation,
+        are updated by the render queue once the vote is committed.
+        '''
+        # The session does not autoflush, and both read the votes back
+        db_session.flush()
+        self.update_domination_matrix()
+        if app.config['RESULTS_IN_BACKGROUND']:
+            call_after_commit(queue_endorsement_results,
+                              self.question_id, self.question.generation)
+        else:
+            self.question.update_endorsement_results()
+
     def calculate_geometric_median(self, generation=None):
         generation = generation or self.question.generation
         endorsements = self.endorsements.filter(
@@ -8463,7 +8621,9 @@ class Proposal(db.Model):
         for endorsement in endorsements:
             coords = [endorsement.mapx, endorsement.mapy]
             data_points.append(coords)
-        geometric_median = findGeometricMedian(data_points)
+        geometric_median = medians.geometric_median(data_points)
+        if geometric_median is None:
+            return
         self.geomedx = geometric_median[0]
         self.geomedy = geometric_median[1]
         db_session.commit()
@@ -8490,6 +8650,7 @@ class Proposal(db.Model):
             endorsement.mapx =  coords['mapx']
             endorsement.mapy = coords['mapy']
             db_session.commit()
+            self.votes_changed()
             return True
         else:
             return False
@@ -8510,6 +8671,7 @@ class Proposal(db.Model):
         ).first()
         if (endorsement is not None):
             self.endorsements.remove(endorsement)
+            self.votes_changed()
         return self
 
     def is_supported_by___(self, user, generation=None):
@@ -8823,23 +8985,30 @@ class Proposal(db.Model):
         generation = generation or self.question.generation
         return_sets = return_sets or False
 
-        current_endorsements = list()
-        current_endorsements = self.endorsements.filter(and_(
-            Endorsement.proposal_id == self.id,
-            Endorsement.generation == generation)
-        ).all()
+        question_thresholds = self.question.get_thresholds(generation)
+        rows = db_session.query(Endorsement.user_id,
+                                Endorsement.mapx,
+                                Endorsement.mapy)\
+            .filter(Endorsement.proposal_id == self.id)\
+            .filter(Endorsement.generation == generation)\
+            .all()
+
+        # Classify all votes against the thresholds at once
+        endorsement_types = votes.classify_votes([row.mapx for row in rows],
+                                                 [row.mapy for row in rows],
+                                                 question_thresholds.mapx,
+                                                 question_thresholds.mapy)
 
         endorse = []
         oppose = []
         confused = []
-        for e in current_endorsements:
-            endorsement_type = e.get_endorsement_type(generation=generation)
+        for (row, endorsement_type) in zip(rows, endorsement_types):
             if endorsement_type == 'endorse':
-                endorse.append(e.endorser.id)
+                endorse.append(row.user_id)
             elif endorsement_type == 'oppose':
-                oppose.append(e.endorser.id)
+                oppose.append(row.user_id)
             elif endorsement_type == 'confused':
-                confused.append(e.endorser.id)
+                confused.append(row.user_id)
 
         endorsment_types = dict()
 
@@ -9104,6 +9273,7 @@ class Threshold(db.Model):
     '''
 
     __tablename__ = 'threshold'
+    __table_args__ = (db.Index('ix_threshold_question_generation', 'question_id', 'generation'),)
 
     def get_public(self):
         '''
@@ -9146,6 +9316,12 @@ class Endorsement(db.Model):
     '''
 
     __tablename__ = 'endorsement'
+    __table_args__ = (db.Index('ix_endorsement_question_generation',
+                               'question_id', 'generation'),
+                      db.Index('ix_endorsement_proposal_generation',
+                               'proposal_id', 'generation'),
+                      db.Index('ix_endorsement_user_question_generation',
+                               'user_id', 'question_id', 'generation'))
 
     def get_public(self):
         '''
@@ -9188,16 +9364,43 @@ class Endorsement(db.Model):
         self.mapx = coords['mapx']
         self.mapy = coords['mapy']
 
-    def get_endorsement_type(self, generation=None):
+    def get_endorsement_type(self, generation=None, thresholds=None):
         question = self.proposal.question
         generation = generation or question.generation
-        question_thresholds = question.get_thresholds(generation)
-        if self.mapy > question_thresholds.mapy:
-            return 'confused'
-        elif self.mapx < question_thresholds.mapx:
-            return 'oppose'
-        else:
-            return 'endorse'
+        question_thresholds = thresholds or question.get_thresholds(generation)
+        return votes.classify_vote(self.mapx, self.mapy,
+                                   question_thresholds.mapx,
+                                   question_thresholds.mapy)
+
+
+@event.listens_for(Session, "after_flush")
+def changes_flushed(session, flush_context):
+    _after_commit_calls.setdefault(session, list())
+
+
+@event.listens_for(Session, "after_commit")
+def changes_committed(session):
+    for (function, args, kwargs) in _after_commit_calls.pop(session, ()):
+        try:
+            function(*args, **kwargs)
+        except Exception:
+            app.logger.exception('Call after commit to %s failed', function)
+
+
+@event.listens_for(Session, "after_rollback")
+def changes_rolled_back(session):
+    _after_commit_calls.pop(session, None)
+
+
+@event.listens_for(Question, "after_insert")
+def question_inserted(mapper, connection, target):
+    create_vote_version(connection, target.id, target.generation)
+
+
+@event.listens_for(Question, "after_update")
+def question_updated(mapper, connection, target):
+    if attributes.get_history(target, 'generation').added:
+        create_vote_version(connection, target.id, target.generation)
 
 
 @event.listens_for(Proposal, "after_insert")
@@ -9207,15 +9410,37 @@ def after_insert(mapper, connection, target):
         values(proposal_id=target.id, question_id=target.question.id,
                generation=target.question.generation)
     )
+    increment_vote_version(connection, target.question.id,
+                           target.question.generation)
+
+
+@event.listens_for(Endorsement, "after_insert")
+@event.listens_for(Endorsement, "after_update")
+@event.listens_for(Endorsement, "after_delete")
+def endorsement_changed(mapper, connection, target):
+    increment_vote_version(connection, target.question_id, target.generation)
+
+
+@event.listens_for(QuestionHistory, "after_insert")
+@event.listens_for(QuestionHistory, "after_delete")
+def question_history_changed(mapper, connection, target):
+    increment_vote_version(connection, target.question_id, target.generation)
+
+
+@event.listens_for(Threshold, "after_update")
+def threshold_changed(mapper, connection, target):
+    # Moving the thresholds reclassifies the votes
+    increment_vote_version(connection, target.question_id, target.generation)
 
 
-class MLStripper(HTMLParser):
-    def __init__(self):
-        self.reset()
-        self.fed = []
+@event.listens_for(Invite, "after_insert")
+def invite_inserted(mapper, connection, target):
+    if target.receiver_id is not None:
+        link_co_participants(connection, target.question_id,
+                             target.receiver_id)
 
-    def handle_data(self, d):
-        self.fed.append(d)
 
-    def get_data(self):
-        return ''.join(self.fed)
+@event.listens_for(Invite, "after_delete")
+def invite_deleted(mapper, connection, target):
+    if target.receiver_id is not None:
+        unlink_co_participants(connection, target.receiver_id)
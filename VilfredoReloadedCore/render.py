@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Render queue
+
+Runs graph renders on a small pool of worker threads so that requests never
+wait for Graphviz. Renders are identified by the hashed map filename: a
+render requested while the same one is queued or running is not queued
+again, so a burst of requests for a new map starts a single dot process.
+
+The workers also update the endorsement results after votes. Those jobs are
+queued with resubmit(), which runs a job again when it is requested while
+running, since it may have read the votes before the latest change.
+
+The size of the pool is set by RENDER_WORKERS.
+'''
+
+import Queue
+import threading
+
+from . import app
+from .database import db_session
+
+PENDING = 'pending'
+FAILED = 'failed'
+
+
+class RenderQueue(object):
+    '''
+    Queue of renders shared by the requests of a process.
+    '''
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._queue = Queue.Queue()
+        self._jobs = dict()
+        self._running = set()
+        self._rerun = dict()
+        self._lock = threading.Lock()
+        self._threads = list()
+
+    def submit(self, key, function, *args, **kwargs):
+        '''
+        .. function:: submit(key, function, *args, **kwargs)
+
+        Queues a render unless one with the same key is already queued or
+        running. The function is called in an application context on a
+        worker thread, and the render fails if it raises an exception or
+        returns a false value.
+
+        :param key: render key, the hashed map filename
+        :type key: String
+        :param function: the render
+        :type function: callable
+        :rtype: boolean, True if the render was queued
+        '''
+        with self._lock:
+            if self._jobs.get(key) == PENDING:
+                return False
+            self._jobs[key] = PENDING
+            self._start_workers()
+        self._queue.put((key, function, args, kwargs))
+        return True
+
+    def resubmit(self, key, function, *args, **kwargs):
+        '''
+        .. function:: resubmit(key, function, *args, **kwargs)
+
+        Queues a job like submit(), except that a job with the same key
+        which is already running is queued again once it has finished.
+
+        :param key: job key
+        :type key: String
+        :param function: the job
+        :type function: callable
+        :rtype: boolean, True if the job was queued
+        '''
+        with self._lock:
+            if key in self._running:
+                self._rerun[key] = (function, args, kwargs)
+                return False
+        return self.submit(key, function, *args, **kwargs)
+
+    def status(self, key):
+        '''
+        .. function:: status(key)
+
+        Returns PENDING while a render is queued or running, FAILED if the
+        last render with this key failed, or None.
+
+        :param key: render key
+        :type key: String
+        :rtype: String or None
+        '''
+        with self._lock:
+            return self._jobs.get(key)
+
+    def clear(self, key):
+        '''
+        .. function:: clear(key)
+
+        Forgets a failed render so that it can be requested again.
+
+        :param key: render key
+        :type key: String
+        '''
+        with self._lock:
+            if self._jobs.get(key) == FAILED:
+                del self._jobs[key]
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work,
+                                      name='render-%s' % len(self._threads))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            (key, function, args, kwargs) = self._queue.get()
+            with self._lock:
+                self._running.add(key)
+            try:
+                with app.app_context():
+                    result = function(*args, **kwargs)
+            except Exception:
+                app.logger.exception('Render %s failed', key)
+                result = None
+            finally:
+                db_session.remove()
+
+            with self._lock:
+                self._running.discard(key)
+                rerun = self._rerun.pop(key, None)
+                if rerun is not None:
+                    self._queue.put((key,) + rerun)
+                elif result:
+                    self._jobs.pop(key, None)
+                else:
+                    self._jobs[key] = FAILED
+            self._queue.task_done()
+
+
+_render_queue = None
+_render_queue_lock = threading.Lock()
+
+
+def get_render_queue():
+    '''
+    .. function:: get_render_queue()
+
+    Returns the render queue of the process, creating it on first use.
+
+    :rtype: RenderQueue
+    '''
+    global _render_queue
+    with _render_queue_lock:
+        if _render_queue is None:
+            _render_queue = RenderQueue(app.config['RENDER_WORKERS'])
+    return _render_queue
@@ -90,9 +90,12 @@ class RESTAPITestCase(unittest.TestCase):
         os.system('python VilfredoReloadedCore/manage.py db stamp head')
 
         app.config['TESTING'] = True
+        app.config['RENDER_IN_BACKGROUND'] = False
+        app.config['RESULTS_IN_BACKGROUND'] = False
         self.app = app.test_client()
 
     def tearDown(self):
+        db_session.remove()
         if DELETE_DB_ON_EXIT:
             app.logger.debug("Dropping DB\n")
             if 'sqlite' in app.config['SQLALCHEMY_DATABASE_URI']:
@@ -1483,6 +1486,469 @@ Sometimes it is possible to impose intrinsic limits, like the one said above. Fo
         app.logger.debug("Data retrieved from Delete Question = %s\n",
                          rv.data)
 
+    def test_incremental_domination_matrix(self):
+        users = [models.User('user%s' % number, 'user%s@example.com' % number,
+                             'test123')
+                 for number in range(4)]
+        db_session.add_all(users)
+        db_session.commit()
+        question = models.Question(users[0], 'Question', 'Blurb')
+        db_session.add(question)
+        db_session.commit()
+        question.thresholds.append(models.Threshold(question))
+        proposals = [models.Proposal(users[number], question,
+                                     'Proposal %s' % number, 'Blurb')
+                     for number in range(3)]
+        db_session.add_all(proposals)
+        question.phase = 'voting'
+        db_session.commit()
+
+        coords = [{'mapx': 0.9, 'mapy': 0.1}, {'mapx': 0.1, 'mapy': 0.1},
+                  {'mapx': 0.5, 'mapy': 0.9}]
+        votes = [(proposal, user, coords[(proposal.id + user.id) % 3])
+                 for proposal in proposals for user in users]
+        for (proposal, user, vote) in votes:
+            proposal.endorse(user, 'endorse', vote)
+            db_session.commit()
+            self.assert_domination_matrix(question)
+        for (proposal, user, vote) in votes[::2]:
+            proposal.remove_endorsement(user)
+            db_session.commit()
+            self.assert_domination_matrix(question)
+
+    def test_vote_version(self):
+        john = models.User('john', 'john@example.com', 'john123')
+        db_session.add(john)
+        db_session.commit()
+        question = models.Question(john, 'Question', 'Blurb')
+        db_session.add(question)
+        db_session.commit()
+        question.thresholds.append(models.Threshold(question))
+        db_session.commit()
+        # Created with the question
+        self.assertEqual(db_session.query(models.VoteVersion)
+                         .filter_by(question_id=question.id).count(), 1)
+        first = question.get_vote_version()
+        self.assertTrue(first.startswith('0.'))
+
+        proposal = models.Proposal(john, question, 'Proposal', 'Blurb')
+        db_session.add(proposal)
+        question.phase = 'voting'
+        db_session.commit()
+        proposal.endorse(john, 'endorse', {'mapx': 0.9, 'mapy': 0.1})
+        db_session.commit()
+        second = question.get_vote_version()
+        self.assertNotEqual(first, second)
+        self.assertNotEqual(first.split('.')[1], second.split('.')[1])
+
+        question.generation = 2
+        db_session.commit()
+        # Created with the generation
+        self.assertTrue(question.get_vote_version(2).startswith('0.'))
+        self.assertEqual(question.get_vote_version(1), second)
+
+    def test_cache_result_after_commit(self):
+        from ..cache import get_cache
+        john = models.User('john', 'john@example.com', 'john123')
+        db_session.add(john)
+        db_session.commit()
+        # The result cache outlives the test database
+        for number in range(1, 4):
+            get_cache().delete('after_commit_test_%s' % number)
+
+        # Nothing flushed, cached straight away
+        models.cache_result('after_commit_test_1', 1)
+        self.assertEqual(get_cache().get('after_commit_test_1'), 1)
+
+        john.email = 'john@example.org'
+        db_session.flush()
+        models.cache_result('after_commit_test_2', 2)
+        self.assertEqual(get_cache().get('after_commit_test_2'), None)
+        db_session.rollback()
+        self.assertEqual(get_cache().get('after_commit_test_2'), None)
+
+        john.email = 'john@example.org'
+        db_session.flush()
+        models.cache_result('after_commit_test_3', 3)
+        self.assertEqual(get_cache().get('after_commit_test_3'), None)
+        db_session.commit()
+        self.assertEqual(get_cache().get('after_commit_test_3'), 3)
+
+    def test_results_in_background(self):
+        from .. import render
+        john = models.User('john', 'john@example.com', 'john123')
+        db_session.add(john)
+        db_session.commit()
+        question = models.Question(john, 'Question', 'Blurb')
+        db_session.add(question)
+        db_session.commit()
+        question.thresholds.append(models.Threshold(question))
+        proposal = models.Proposal(john, question, 'Proposal', 'Blurb')
+        db_session.add(proposal)
+        question.phase = 'voting'
+        db_session.commit()
+        proposal_id = proposal.id
+
+        app.config['RESULTS_IN_BACKGROUND'] = True
+        try:
+            proposal.endorse(john, 'endorse', {'mapx': 0.9, 'mapy': 0.1})
+            db_session.commit()
+            render.get_render_queue()._queue.join()
+        finally:
+            app.config['RESULTS_IN_BACKGROUND'] = False
+        db_session.remove()
+
+        proposal = models.Proposal.query.get(proposal_id)
+        self.assertEqual((proposal.geomedx, proposal.geomedy), (0.9, 0.1))
+
+    def assert_domination_matrix(self, question):
+        from ..cache import get_cache
+        # The matrix cached by the vote, against one calculated from scratch
+        matrix = get_cache().get(question.get_domination_matrix_key())
+        app.config['INCREMENTAL_DOMINATION_MAP'] = False
+        try:
+            self.assertEqual(matrix['map'], question.calculate_domination_map())
+        finally:
+            app.config['INCREMENTAL_DOMINATION_MAP'] = True
+
+    def test_conditional_get(self):
+        john = models.User('john', 'john@example.com', 'john123')
+        susan = models.User('susan', 'susan@example.com', 'susan123')
+        db_session.add_all([john, susan])
+        db_session.commit()
+        question = models.Question(john, 'Question', 'Blurb')
+        db_session.add(question)
+        db_session.commit()
+        question.thresholds.append(models.Threshold(question))
+        db_session.add(models.Invite(john, john, 63, question.id))
+        proposal = models.Proposal(susan, question, 'Proposal', 'Blurb')
+        db_session.add(proposal)
+        question.phase = 'voting'
+        db_session.commit()
+        proposal.endorse(susan, 'endorse', {'mapx': 0.9, 'mapy': 0.1})
+        db_session.commit()
+        (john_id, proposal_id) = (john.id, proposal.id)
+
+        pareto_url = api.REST_URL_PREFIX + '/questions/%s/pareto' % question.id
+        rv = self.open_with_auth(pareto_url, 'GET', None, 'john', 'john123')
+        self.assertEqual(rv.status_code, 200, rv.data)
+        etag = rv.headers['ETag']
+
+        headers = {'Authorization': 'Basic ' +
+                   base64.b64encode('john:john123'),
+                   'If-None-Match': etag}
+        rv = self.app.get(pareto_url, headers=headers)
+        self.assertEqual(rv.status_code, 304)
+
+        # A new vote changes the ETag
+        proposal = models.Proposal.query.get(proposal_id)
+        proposal.endorse(models.User.query.get(john_id), 'endorse',
+                         {'mapx': 0.9, 'mapy': 0.1})
+        db_session.commit()
+        rv = self.app.get(pareto_url, headers=headers)
+        self.assertEqual(rv.status_code, 200, rv.data)
+        self.assertNotEqual(rv.headers['ETag'], etag)
+
+    def test_dashboard_counts(self):
+        from .. import dashboard
+        users = [models.User(name, name + '@example.com', name + '123')
+                 for name in ('john', 'susan', 'bill')]
+        db_session.add_all(users)
+        db_session.commit()
+        (john, susan, bill) = users
+
+        questions = list()
+        for title in ('Voting', 'Writing'):
+            question = models.Question(john, title, 'Blurb')
+            db_session.add(question)
+            db_session.commit()
+            question.thresholds.append(models.Threshold(question))
+            db_session.add_all([models.Invite(john, john, 63, question.id),
+                                models.Invite(john, susan, 7, question.id)])
+            proposals = [models.Proposal(susan, question, 'Susan', 'Blurb'),
+                         models.Proposal(bill, question, 'Bill', 'Blurb')]
+            db_session.add_all(proposals)
+            question.phase = 'voting'
+            db_session.commit()
+            proposals[0].endorse(susan, 'endorse', {'mapx': 0.9, 'mapy': 0.1})
+            proposals[1].endorse(john, 'endorse', {'mapx': 0.1, 'mapy': 0.1})
+            # Susan has voted on every proposal
+            proposals[1].endorse(susan, 'endorse', {'mapx': 0.1, 'mapy': 0.9})
+            db_session.commit()
+            questions.append(question)
+
+        # The second question moves on to writing in generation 2, with a
+        # new proposal next to the inherited ones
+        writing = questions[1]
+        self.assertEqual(writing.move_on(john), 'writing')
+        db_session.add(models.Proposal(bill, writing, 'New', 'Blurb'))
+        db_session.add(models.FinishedWriting(susan, writing))
+        db_session.commit()
+
+        for user in [None] + users:
+            counts = dashboard.get_question_counts(questions, user)
+            for question in questions:
+                self.assertEqual(counts[question.id],
+                                 question.get_dashboard_counts(user),
+                                 (question.title, user))
+
+    def test_keyset_pagination(self):
+        john = models.User('john', 'john@example.com', 'john123')
+        db_session.add(john)
+        db_session.commit()
+        question_ids = list()
+        for number in range(5):
+            question = models.Question(john, 'Question %s' % number, 'Blurb')
+            db_session.add(question)
+            db_session.commit()
+            db_session.add(models.Invite(john, john, 63, question.id))
+            question_ids.append(question.id)
+        question = models.Question.query.get(question_ids[0])
+        proposals = [models.Proposal(john, question, 'Proposal %s' % number,
+                                     'Blurb')
+                     for number in range(5)]
+        db_session.add_all(proposals)
+        db_session.commit()
+        proposal_ids = [proposal.id for proposal in proposals]
+
+        listings = [(api.REST_URL_PREFIX + '/questions', 'questions',
+                     question_ids),
+                    (api.REST_URL_PREFIX + '/questions/%s/proposals'
+                     % question_ids[0], 'proposals', proposal_ids)]
+        for (url, name, ids) in listings:
+            # Pages of 2 following next until it is null
+            listed = list()
+            after = 0
+            while after is not None:
+                rv = self.open_with_auth(url + '?after=%s&limit=2' % after,
+                                         'GET', None, 'john', 'john123')
+                self.assertEqual(rv.status_code, 200, rv.data)
+                data = json.loads(rv.data)
+                page = [int(item['id']) for item in data[name]]
+                self.assertTrue(len(page) <= 2)
+                listed.extend(page)
+                after = data['next']
+                if after is not None:
+                    self.assertEqual(after, page[-1])
+            self.assertEqual(listed, ids)
+
+            rv = self.open_with_auth(url + '?after=%s&limit=10' % ids[1],
+                                     'GET', None, 'john', 'john123')
+            data = json.loads(rv.data)
+            self.assertEqual([int(item['id']) for item in data[name]], ids[2:])
+            self.assertEqual(data['next'], None)
+
+            for query in ('?after=x', '?limit=2.5', '?after=1&limit='):
+                rv = self.open_with_auth(url + query,
+                                         'GET', None, 'john', 'john123')
+                self.assertEqual(rv.status_code, 400, query)
+
+            # Only the requested fields, and the id
+            rv = self.open_with_auth(url + '?fields=title',
+                                     'GET', None, 'john', 'john123')
+            self.assertEqual(rv.status_code, 200, rv.data)
+            data = json.loads(rv.data)
+            self.assertEqual(len(data[name]), 5)
+            for item in data[name]:
+                self.assertEqual(sorted(item), ['id', 'title'])
+            self.assertNotIn('next', data)
+
+    def test_avatar(self):
+        import shutil
+        import tempfile
+        from io import BytesIO
+        from PIL import Image
+        from werkzeug.datastructures import FileStorage
+        john = models.User('john', 'john@example.com', 'john123')
+        db_session.add(john)
+        db_session.commit()
+        john_id = john.id
+
+        avatar_dest = app.config['UPLOADED_AVATAR_DEST']
+        # An absolute path replaces the directory of the package
+        app.config['UPLOADED_AVATAR_DEST'] = tempfile.mkdtemp()
+        try:
+            self.assertEqual(john.get_avatar(), models.User.get_default_avatar())
+
+            image = BytesIO()
+            Image.new('RGB', (300, 200)).save(image, 'PNG')
+            image.seek(0)
+            avatar = john.set_avatar(FileStorage(stream=image,
+                                                 filename='john.png'))
+            db_session.commit()
+            self.assertTrue(avatar)
+            self.assertTrue(avatar.startswith(
+                os.path.join(app.config['PROFILE_PICS'], str(john_id), '')))
+            self.assertTrue(avatar.endswith('-thumb.png'))
+            john = models.User.query.get(john_id)
+            self.assertEqual(john.avatar, avatar)
+            self.assertEqual(john.get_avatar(), avatar)
+
+            # Avatars saved before the path was stored
+            john.avatar = None
+            db_session.commit()
+            os.mkdir(os.path.join(app.config['UPLOADED_AVATAR_DEST'], 'default'))
+            os.mkdir(os.path.join(app.config['UPLOADED_AVATAR_DEST'], '99'))
+            self.assertEqual(models.User.backfill_avatars(), 1)
+            db_session.commit()
+            self.assertEqual(models.User.query.get(john_id).get_avatar(),
+                             avatar)
+
+            # Resizing the avatars stores their paths too
+            models.User.query.get(john_id).avatar = None
+            db_session.commit()
+            models.User.resize_avatars()
+            self.assertEqual(models.User.query.get(john_id).avatar, avatar)
+        finally:
+            shutil.rmtree(app.config['UPLOADED_AVATAR_DEST'])
+            app.config['UPLOADED_AVATAR_DEST'] = avatar_dest
+
+    def test_graph_in_background(self):
+        from .. import render
+        john = models.User('john', 'john@example.com', 'john123')
+        db_session.add(john)
+        db_session.commit()
+        question = models.Question(john, 'Question', 'Blurb')
+        db_session.add(question)
+        db_session.commit()
+        question.thresholds.append(models.Threshold(question))
+        db_session.add(models.Invite(john, john, 63, question.id))
+        proposal = models.Proposal(john, question, 'Proposal', 'Blurb')
+        db_session.add(proposal)
+        question.phase = 'voting'
+        db_session.commit()
+        proposal.endorse(john, 'endorse', {'mapx': 0.9, 'mapy': 0.1})
+        db_session.commit()
+
+        graph_url = api.REST_URL_PREFIX + '/questions/%s/graph' % question.id
+        dot_path = app.config['GRAPHVIZ_DOT_PATH']
+        app.config['RENDER_IN_BACKGROUND'] = True
+        # The render fails, whether Graphviz is installed or not
+        app.config['GRAPHVIZ_DOT_PATH'] = '/nonexistent/dot'
+        try:
+            rv = self.open_with_auth(graph_url, 'GET', None, 'john', 'john123')
+            self.assertEqual(rv.status_code, 202, rv.data)
+            self.assertEqual(rv.headers['Location'],
+                             'http://localhost' + graph_url)
+            self.assertEqual(json.loads(rv.data)['poll_url'],
+                             'http://localhost' + graph_url)
+            render.get_render_queue()._queue.join()
+
+            # The failure is reported once, then the map is rendered again
+            rv = self.open_with_auth(graph_url, 'GET', None, 'john', 'john123')
+            self.assertEqual(rv.status_code, 500, rv.data)
+            rv = self.open_with_auth(graph_url, 'GET', None, 'john', 'john123')
+            self.assertEqual(rv.status_code, 202, rv.data)
+            render.get_render_queue()._queue.join()
+        finally:
+            app.config['RENDER_IN_BACKGROUND'] = False
+            app.config['GRAPHVIZ_DOT_PATH'] = dot_path
+
+    def test_credential_cache(self):
+        from .. import auth
+        auth.credential_cache.clear()
+        john = models.User('john', 'john@example.com', 'john123')
+        db_session.add(john)
+        db_session.commit()
+        john_id = john.id
+
+        (hits, misses) = (auth.credential_cache.hits,
+                          auth.credential_cache.misses)
+        current_user_url = api.REST_URL_PREFIX + '/currentuser'
+        rv = self.open_with_auth(current_user_url, 'GET', None,
+                                 'john', 'john123')
+        self.assertEqual(rv.status_code, 200, rv.data)
+        self.assertEqual(auth.credential_cache.misses, misses + 1)
+        rv = self.open_with_auth(current_user_url, 'GET', None,
+                                 'john', 'john123')
+        self.assertEqual(rv.status_code, 200, rv.data)
+        self.assertEqual(auth.credential_cache.hits, hits + 1)
+
+        # Changing the password drops the verified credentials
+        john = models.User.query.get(john_id)
+        john.set_password('john456')
+        db_session.commit()
+        rv = self.open_with_auth(current_user_url, 'GET', None,
+                                 'john', 'john123')
+        self.assertEqual(rv.status_code, 403)
+        rv = self.open_with_auth(current_user_url, 'GET', None,
+                                 'john', 'john456')
+        self.assertEqual(rv.status_code, 200, rv.data)
+
+    def test_bulk_invitations(self):
+        users = [models.User('user%s' % number, 'user%s@example.com' % number,
+                             'test123')
+                 for number in range(4)]
+        db_session.add_all(users)
+        db_session.commit()
+        (john, susan, bob, alice) = users
+        question = models.Question(john, 'Question', 'Blurb')
+        db_session.add(question)
+        db_session.commit()
+        db_session.add(models.Invite(john, john, 63, question.id))
+        db_session.add(models.Invite(john, susan, 7, question.id))
+        db_session.commit()
+        (question_id, susan_id, bob_id, alice_id) = \
+            (question.id, susan.id, bob.id, alice.id)
+
+        invitations_url = \
+            api.REST_URL_PREFIX + '/questions/%s/invitations' % question_id
+        rv = self.open_with_json_auth(
+            invitations_url, 'POST',
+            {'invite_user_ids': [susan_id, bob_id, alice_id, 999],
+             'permissions': 7},
+            'user0', 'test123')
+        self.assertEqual(rv.status_code, 201, rv.data)
+        self.assertEqual(json.loads(rv.data)['invites'],
+                         {str(susan_id): 'participant',
+                          str(bob_id): 'invited',
+                          str(alice_id): 'invited',
+                          '999': 'not_found'})
+        self.assertEqual(models.UserInvite.query.filter_by(
+            question_id=question_id).count(), 2)
+
+        rv = self.open_with_json_auth(
+            invitations_url, 'POST',
+            {'invite_user_ids': [bob_id], 'permissions': 7},
+            'user0', 'test123')
+        self.assertEqual(json.loads(rv.data)['invites'],
+                         {str(bob_id): 'already_invited'})
+
+    def test_not_invited(self):
+        users = [models.User('user%s' % number, 'user%s@example.com' % number,
+                             'test123')
+                 for number in range(5)]
+        db_session.add_all(users)
+        db_session.commit()
+        author = users[0]
+        (old_question, question) = (models.Question(author, 'Old', 'Blurb'),
+                                    models.Question(author, 'New', 'Blurb'))
+        db_session.add_all([old_question, question])
+        db_session.commit()
+        for user in users:
+            db_session.add(models.Invite(author, user, 7, old_question.id))
+        db_session.add(models.Invite(author, author, 63, question.id))
+        db_session.add(models.Invite(author, users[1], 7, question.id))
+        db_session.commit()
+        self.assertEqual(models.CoParticipant.query.filter_by(
+            user_id=author.id).count(), 4)
+        uninvited_ids = [user.id for user in users[2:]]
+
+        not_invited_url = \
+            api.REST_URL_PREFIX + '/questions/%s/not_invited' % question.id
+        rv = self.open_with_auth(not_invited_url + '?limit=2', 'GET', None,
+                                 'user0', 'test123')
+        self.assertEqual(rv.status_code, 200, rv.data)
+        data = json.loads(rv.data)
+        self.assertEqual([user['user_id'] for user in data['not_invited']],
+                         uninvited_ids[:2])
+        rv = self.open_with_auth(not_invited_url + '?after=%s' % data['next'],
+                                 'GET', None, 'user0', 'test123')
+        data = json.loads(rv.data)
+        self.assertEqual([user['user_id'] for user in data['not_invited']],
+                         uninvited_ids[2:])
+        self.assertIsNone(data['next'])
+
     def get_questions(self):
         rv = self.app.get(api.REST_URL_PREFIX + '/users')
         #  rv = self.open_with_auth(
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Result cache backends test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+import cPickle as pickle
+import fnmatch
+import os
+import shutil
+import SocketServer
+import tempfile
+import threading
+import time
+
+from .. import cache
+
+
+class RedisStandIn(SocketServer.ThreadingTCPServer):
+    '''
+    Local server answering the subset of the Redis protocol used by
+    RedisCache.
+    '''
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0),
+                                                 RedisStandInHandler)
+        self.data = dict()
+        self.expires = dict()
+
+
+class RedisStandInHandler(SocketServer.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = list()
+        for i in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def write_bulk(self, value):
+        if value is None:
+            self.wfile.write('$-1\r\n')
+        else:
+            self.wfile.write('$%d\r\n%s\r\n' % (len(value), value))
+
+    def handle(self):
+        data = self.server.data
+        expires = self.server.expires
+        while True:
+            args = self.read_command()
+            if args is None:
+                break
+            command = args[0].upper()
+            key = args[1] if len(args) > 1 else None
+            if key in expires and expires[key] < time.time():
+                data.pop(key, None)
+            if command == 'GET':
+                self.write_bulk(data.get(key))
+            elif command == 'SET':
+                data[key] = args[2]
+                if len(args) > 4:
+                    expires[key] = time.time() + int(args[4])
+                self.wfile.write('+OK\r\n')
+            elif command == 'DEL':
+                count = len([k for k in args[1:] if data.pop(k, None)])
+                self.wfile.write(':%d\r\n' % count)
+            elif command == 'SCAN':
+                keys = fnmatch.filter(data.keys(), args[3])
+                self.wfile.write('*2\r\n')
+                self.write_bulk('0')
+                self.wfile.write('*%d\r\n' % len(keys))
+                for k in keys:
+                    self.write_bulk(k)
+            else:
+                self.wfile.write('-ERR unknown command\r\n')
+
+
+class CacheTest(unittest.TestCase):
+    def check_backend(self, backend):
+        self.assertEqual(backend.get('a'), None)
+        backend.set('a', {1: {2: -1}})
+        self.assertEqual(backend.get('a'), {1: {2: -1}})
+        backend.delete('a')
+        self.assertEqual(backend.get('a'), None)
+        backend.set('b', [1, 2])
+        backend.clear()
+        self.assertEqual(backend.get('b'), None)
+        stats = backend.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+    def test_lru(self):
+        backend = cache.LRUCache(max_entries=2)
+        self.check_backend(backend)
+
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        # b was the least recently used entry
+        self.assertEqual(backend.get('b'), None)
+        self.assertEqual(backend.get('a'), 1)
+
+        backend.set('d', 4, timeout=-1)
+        self.assertEqual(backend.get('d'), None)
+
+    def test_filesystem(self):
+        directory = tempfile.mkdtemp()
+        try:
+            backend = cache.FileSystemCache(directory, max_entries=2)
+            self.check_backend(backend)
+
+            backend.set('a', 1)
+            backend.set('b', 2)
+            os.utime(os.path.join(directory, 'a.cache'), (1, 1))
+            backend.set('c', 3)
+            # a has the oldest file
+            self.assertEqual(backend.get('a'), None)
+            self.assertEqual(backend.get('c'), 3)
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['b.cache', 'c.cache'])
+
+            backend.set('d', 4, timeout=-1)
+            self.assertEqual(backend.get('d'), None)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_filesystem_prune_interval(self):
+        directory = tempfile.mkdtemp()
+        try:
+            backend = cache.FileSystemCache(directory, max_entries=2,
+                                            prune_interval=3)
+            for (age, key) in enumerate(['a', 'b', 'c', 'd', 'e']):
+                backend.set(key, age)
+                os.utime(os.path.join(directory, key + '.cache'),
+                         (age + 1, age + 1))
+            # Pruned on the third write only
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['b.cache', 'c.cache', 'd.cache', 'e.cache'])
+            backend.set('f', 5)
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['e.cache', 'f.cache'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_redis(self):
+        server = RedisStandIn()
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            backend = cache.RedisCache(port=server.server_address[1])
+            self.check_backend(backend)
+
+            backend.set('a', 1, timeout=-1)
+            self.assertEqual(backend.get('a'), None)
+            backend.set('b', 2)
+            self.assertEqual(server.data.keys(), ['vr:b'])
+
+            # A value which is not a pickle is a miss and is removed
+            for data in ('garbage', pickle.dumps(3)[:-2]):
+                server.data['vr:c'] = data
+                misses = backend.stats()['misses']
+                self.assertEqual(backend.get('c'), None)
+                self.assertEqual(backend.stats()['misses'], misses + 1)
+                self.assertNotIn('vr:c', server.data)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_unreachable_redis_is_a_miss(self):
+        backend = cache.RedisCache(port=1, socket_timeout=1)
+        self.assertFalse(backend.set('a', 1))
+        self.assertEqual(backend.get('a'), None)
+        self.assertEqual(backend.stats()['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Domination engine test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+import random
+
+from .. import domination, votes
+
+# Voting map coordinates (mapx, mapy) for a threshold of 0.5, 0.5
+ENDORSE = (0.9, 0.1)
+OPPOSE = (0.1, 0.1)
+CONFUSED = (0.5, 0.9)
+
+
+def vote(proposal_id, user_id, coords):
+    # Endorsement row (proposal_id, user_id, mapx, mapy)
+    return (proposal_id, user_id, coords[0], coords[1])
+
+
+def make_engine(proposal_ids, cast):
+    snapshot = votes.VoteSnapshot(1, proposal_ids, cast, 0.5, 0.5)
+    return domination.DominationEngine(snapshot)
+
+
+class DominationEngineTest(unittest.TestCase):
+    def test_full_domination(self):
+        cast = [vote(1, 1, ENDORSE), vote(1, 2, ENDORSE),
+                 vote(2, 1, ENDORSE), vote(2, 2, OPPOSE),
+                 vote(3, 1, OPPOSE), vote(3, 2, ENDORSE)]
+        engine = make_engine([1, 2, 3], cast)
+        dom_map = engine.domination_map(algorithm=2)
+
+        self.assertEqual(dom_map[1], {1: -1, 2: 1, 3: 1})
+        self.assertEqual(dom_map[2], {1: 2, 2: -1, 3: 0})
+        self.assertEqual(dom_map[3], {1: 2, 2: 0, 3: -1})
+
+    def test_identical_votes(self):
+        cast = [vote(1, 1, ENDORSE), vote(1, 2, OPPOSE),
+                 vote(2, 1, ENDORSE), vote(2, 2, OPPOSE)]
+        engine = make_engine([1, 2], cast)
+        dom_map = engine.domination_map(algorithm=2)
+
+        self.assertEqual(dom_map[1][2], -1)
+        self.assertEqual(dom_map[2][1], -1)
+
+    def test_partial_domination(self):
+        # User 3 did not understand proposal 2, so only users 1 and 2
+        # are qualified to compare the two proposals
+        cast = [vote(1, 1, ENDORSE), vote(1, 2, ENDORSE),
+                 vote(1, 3, OPPOSE),
+                 vote(2, 1, ENDORSE), vote(2, 2, OPPOSE),
+                 vote(2, 3, CONFUSED)]
+        engine = make_engine([1, 2], cast)
+        dom_map = engine.domination_map(algorithm=2)
+
+        self.assertEqual(dom_map[1][2], 3)
+        self.assertEqual(dom_map[2][1], 4)
+
+    def test_partial_converts_to_full_domination(self):
+        # User 3 endorses proposal 1, so not understanding proposal 2
+        # cannot change the outcome
+        cast = [vote(1, 1, ENDORSE), vote(1, 2, ENDORSE),
+                 vote(1, 3, ENDORSE),
+                 vote(2, 1, ENDORSE), vote(2, 2, OPPOSE),
+                 vote(2, 3, CONFUSED)]
+        engine = make_engine([1, 2], cast)
+        dom_map = engine.domination_map(algorithm=2)
+
+        self.assertEqual(dom_map[1][2], 5)
+        self.assertEqual(dom_map[2][1], 6)
+
+    def test_same_qualified_endorsers(self):
+        cast = [vote(1, 1, ENDORSE), vote(1, 2, CONFUSED),
+                 vote(2, 1, ENDORSE), vote(2, 2, ENDORSE)]
+        engine = make_engine([1, 2], cast)
+
+        self.assertEqual(engine.domination_map(algorithm=2)[1][2], -2)
+        self.assertEqual(engine.domination_map(algorithm=1)[1][2], 2)
+
+    def test_update_domination_map(self):
+        cast = [vote(1, 1, ENDORSE), vote(1, 2, ENDORSE),
+                vote(2, 1, ENDORSE), vote(2, 2, OPPOSE),
+                vote(3, 1, OPPOSE), vote(3, 2, ENDORSE)]
+        dom_map = make_engine([1, 2, 3], cast).domination_map()
+
+        # User 2 changes their vote on proposal 2 to endorse
+        cast[3] = vote(2, 2, ENDORSE)
+        engine = make_engine([1, 2, 3], cast)
+        engine.update_domination_map(dom_map, [2])
+
+        self.assertEqual(dom_map, engine.domination_map())
+        self.assertEqual(dom_map[1][2], -1)
+
+    def test_pareto_front(self):
+        # Proposal 3 is dominated by proposal 1 unless user 2 is excluded
+        cast = [vote(1, 1, ENDORSE), vote(1, 2, ENDORSE),
+                vote(2, 3, ENDORSE),
+                vote(3, 1, ENDORSE), vote(3, 2, OPPOSE),
+                vote(4, 1, OPPOSE)]
+        engine = make_engine([1, 2, 3, 4], cast)
+
+        (pareto, dominated_by) = engine.pareto_front()
+        self.assertEqual(sorted(pareto), [1, 2])
+        self.assertEqual(dominated_by, {3: 1, 4: 1})
+
+        (pareto, dominated_by) = engine.pareto_front(exclude_user_id=2)
+        self.assertEqual(sorted(pareto), [1, 2, 3])
+        self.assertEqual(dominated_by, {4: 1})
+
+    def test_skyline(self):
+        rnd = random.Random(1)
+        masks = dict((pid, rnd.getrandbits(6)) for pid in range(60))
+        (pareto, dominated_by) = domination.skyline(masks)
+
+        expected = [pid for pid in masks
+                    if not any(domination.is_proper_subset(masks[pid], mask)
+                               for mask in masks.values())]
+        self.assertEqual(sorted(pareto), expected)
+        for (pid, dominating_pid) in dominated_by.items():
+            self.assertTrue(domination.is_proper_subset(
+                masks[pid], masks[dominating_pid]))
+
+    def test_leave_one_out_pareto_fronts(self):
+        rnd = random.Random(2)
+        cast = [vote(pid, uid, rnd.choice([ENDORSE, OPPOSE, CONFUSED]))
+                for pid in range(1, 13) for uid in range(1, 9)
+                if rnd.random() < 0.6]
+        engine = make_engine(range(1, 13), cast)
+        expected = dict((uid, set(engine.pareto_front(uid)[0]))
+                        for uid in range(1, 9))
+
+        self.assertEqual(engine.leave_one_out_pareto_fronts(range(1, 9)),
+                         expected)
+        self.assertEqual(engine.leave_one_out_pareto_fronts(
+            range(1, 9), domination_map=engine.domination_map(algorithm=1)),
+            expected)
+        self.assertEqual(engine.leave_one_out_pareto_fronts(range(1, 9),
+                                                            processes=2),
+                         expected)
+
+    def test_relations(self):
+        cast = [vote(1, 1, ENDORSE), vote(1, 2, ENDORSE),
+                vote(1, 3, OPPOSE),
+                vote(2, 1, ENDORSE), vote(2, 2, OPPOSE),
+                vote(2, 3, CONFUSED),
+                vote(3, 1, OPPOSE), vote(3, 2, OPPOSE),
+                vote(3, 3, OPPOSE)]
+        engine = make_engine([1, 2, 3], cast)
+        (dominating, dominated) = domination.relations(
+            engine.domination_map(algorithm=2))
+
+        self.assertEqual(dominating, {1: set([2, 3]), 2: set([3]), 3: set()})
+        self.assertEqual(dominated, {1: set(), 2: set([1]), 3: set([1, 2])})
+
+
+if __name__ == '__main__':
+    unittest.main()
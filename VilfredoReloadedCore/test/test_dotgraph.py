@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Dot graph output test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+
+from StringIO import StringIO
+
+from .. import dotgraph
+
+
+class FakeProposal(object):
+    def __init__(self, id, blurb, abstract=None):
+        self.id = id
+        self.blurb = blurb
+        self.abstract = abstract
+
+
+class DotGraphTest(unittest.TestCase):
+    def test_writer_flushes_to_stream(self):
+        stream = StringIO()
+        writer = dotgraph.DotWriter(stream, buffer_size=3)
+        writer.write('digraph "', u'caf\xe9', '" {\n')
+        self.assertEqual(stream.getvalue(), 'digraph "caf\xc3\xa9" {\n')
+
+        writer.write(' 1 -> 2', " \n")
+        writer.write("\n}")
+        self.assertEqual(writer.close(), None)
+        self.assertEqual(stream.getvalue(),
+                         'digraph "caf\xc3\xa9" {\n 1 -> 2 \n\n}')
+
+    def test_writer_without_stream(self):
+        writer = dotgraph.DotWriter(buffer_size=2)
+        for part in ['a', 'b', 'c', 'd', 'e']:
+            writer.write(part)
+        self.assertEqual(writer.close(), u'abcde')
+
+    def test_proposal_tooltip(self):
+        proposal = FakeProposal(
+            -1, '<p>Say "yes"</p>\n<p>or no</p>')
+        self.assertEqual(dotgraph.proposal_tooltip(proposal),
+                         "Say 'yes' or no")
+
+        proposal.abstract = '<b>Short</b>'
+        self.assertEqual(dotgraph.proposal_tooltip(proposal), 'Short')
+
+        proposal.abstract = 'x' * 1000
+        self.assertEqual(len(dotgraph.proposal_tooltip(proposal)),
+                         dotgraph.TOOLTIP_LENGTH)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Hasse diagram test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+
+import random
+
+from .. import hasse
+
+
+def subset_relation(rnd, size):
+    # Proposals below each proposal, as strict subsets of random endorsers
+    endorsers = dict((pid, frozenset(rnd.sample(range(6), rnd.randint(0, 6))))
+                     for pid in range(size))
+    return dict((p1, set(p2 for p2 in endorsers
+                         if endorsers[p2] < endorsers[p1]))
+                for p1 in endorsers)
+
+
+def nested_loop_covered(elements_below):
+    covered = dict()
+    for (element, below) in elements_below.iteritems():
+        covered[element] = set(
+            element1 for element1 in below
+            if not any(element1 in elements_below[element2]
+                       for element2 in below))
+    return covered
+
+
+def peeled_levels(elements_covered):
+    remaining = set(elements_covered)
+    levels = dict()
+    level = 0
+    while remaining:
+        levels[level] = set(
+            element1 for element1 in remaining
+            if not any(element1 in elements_covered[element2]
+                       for element2 in remaining))
+        remaining -= levels[level]
+        level += 1
+    return levels
+
+
+class HasseTest(unittest.TestCase):
+    def test_covered(self):
+        rnd = random.Random(1)
+        for trial in range(50):
+            elements_below = subset_relation(rnd, rnd.randint(0, 30))
+            self.assertEqual(hasse.covered(elements_below),
+                             nested_loop_covered(elements_below))
+
+    def test_find_levels(self):
+        rnd = random.Random(2)
+        for trial in range(50):
+            covered = hasse.covered(subset_relation(rnd, rnd.randint(0, 30)))
+            self.assertEqual(hasse.find_levels(covered),
+                             peeled_levels(covered))
+
+    def test_levels(self):
+        elements_below = {1: set([2, 3]), 2: set([3]), 3: set(), 4: set([3])}
+        self.assertEqual(hasse.levels(elements_below),
+                         {1: 0, 2: 1, 3: 2, 4: 0})
+        self.assertEqual(hasse.levels(elements_below, top=set([1, 2, 4])),
+                         {1: 0, 2: 0, 3: 1, 4: 0})
+        self.assertEqual(hasse.levels(elements_below, elements=[2, 3]),
+                         {2: 0, 3: 1})
+
+        # Elements on a cycle are given no level
+        elements_below = {1: set([2]), 2: set([3]), 3: set([2])}
+        self.assertEqual(hasse.levels(elements_below), {1: 0})
+        self.assertEqual(hasse.find_levels(elements_below),
+                         {0: set([1]), 1: set([2, 3])})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Mail queue test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+
+import os
+import shutil
+import socket
+import tempfile
+
+from .. import app, mailqueue
+
+
+class RecordingMailQueue(mailqueue.MailQueue):
+    '''
+    Records the emails instead of passing them to sendmail or to a mail
+    server.
+    '''
+    returncode = 0
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingMailQueue, self).__init__(*args, **kwargs)
+        self.sent = list()
+        self.connections = 0
+
+    def connect(self):
+        self.connections += 1
+        return RecordingConnection(self.sent)
+
+    def sendmail(self, message):
+        if not self.returncode:
+            self.sent.append(message['recipient'])
+        return self.returncode
+
+
+class RecordingConnection(object):
+    def __init__(self, sent):
+        self.sent = sent
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        pass
+
+    def send(self, message):
+        self.sent.append(message.recipients[0])
+
+
+class UnreachableMailQueue(mailqueue.MailQueue):
+    def connect(self):
+        raise socket.error('Connection refused')
+
+
+class MailQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.suppress = app.extensions['mail'].suppress
+        app.extensions['mail'].suppress = False
+
+    def tearDown(self):
+        app.extensions['mail'].suppress = self.suppress
+        shutil.rmtree(self.directory)
+
+    def queue_emails(self, queue, count):
+        for number in range(count):
+            queue._write(dict(subject='Subject %s' % number,
+                              sender='admin@localhost',
+                              recipient='user%s@localhost' % number,
+                              body='Body',
+                              attempts=0), 0)
+
+    def test_send_in_batches(self):
+        queue = RecordingMailQueue(self.directory, batch_size=2,
+                                   transport='smtp')
+        self.queue_emails(queue, 5)
+        self.assertEqual(queue.pending(), 5)
+        with app.app_context():
+            self.assertEqual(queue.send_queued(), 3)
+        self.assertEqual(queue.pending(), 0)
+        self.assertEqual(queue.connections, 3)
+        self.assertEqual(sorted(queue.sent),
+                         ['user%s@localhost' % number for number in range(5)])
+
+    def test_sendmail(self):
+        queue = RecordingMailQueue(self.directory, batch_size=2)
+        self.queue_emails(queue, 3)
+        with app.app_context():
+            self.assertEqual(queue.send_queued(), 2)
+        self.assertEqual(queue.pending(), 0)
+        self.assertEqual(queue.connections, 0)
+        self.assertEqual(sorted(queue.sent),
+                         ['user%s@localhost' % number for number in range(3)])
+
+    def test_sendmail_failure(self):
+        queue = RecordingMailQueue(self.directory, max_attempts=2,
+                                   retry_delay=0)
+        queue.returncode = 1
+        self.queue_emails(queue, 1)
+        with app.app_context():
+            queue.send_queued()
+        self.assertEqual(queue.pending(), 0)
+        self.assertEqual(len(os.listdir(queue.failed_directory)), 1)
+
+    def test_suppressed(self):
+        app.extensions['mail'].suppress = True
+        for transport in ('sendmail', 'smtp'):
+            queue = RecordingMailQueue(self.directory, transport=transport)
+            self.queue_emails(queue, 3)
+            with app.app_context():
+                self.assertEqual(queue.send_queued(), 0)
+            # Kept in the spool for when sending is turned on
+            self.assertEqual(queue.sent, [])
+            self.assertEqual(queue.pending(), 3)
+            app.extensions['mail'].suppress = False
+            with app.app_context():
+                queue.send_queued()
+            self.assertEqual(len(queue.sent), 3)
+            self.assertEqual(queue.pending(), 0)
+            app.extensions['mail'].suppress = True
+
+    def test_retry(self):
+        queue = UnreachableMailQueue(self.directory, max_attempts=2,
+                                     retry_delay=0, transport='smtp')
+        queue._write(dict(subject='Subject', sender='admin@localhost',
+                          recipient='user@localhost', body='Body',
+                          attempts=0), 0)
+        with app.app_context():
+            queue.send_queued()
+        self.assertEqual(queue.pending(), 0)
+        self.assertEqual(len(os.listdir(queue.failed_directory)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
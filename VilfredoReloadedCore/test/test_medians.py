@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Median calculation test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+
+import math
+import random
+
+from .. import medians
+
+
+def sorted_median(values):
+    # Median by sorting the whole list
+    values = sorted(values)
+    length = len(values)
+    if not length % 2:
+        return (values[length / 2] + values[length / 2 - 1]) / 2.0
+    return values[length / 2]
+
+
+class MediansTest(unittest.TestCase):
+    def test_padded_median(self):
+        rnd = random.Random(1)
+        for length in range(1, 12):
+            values = [rnd.choice([0.0, 0.25, 0.5, 1.0, rnd.random()])
+                      for i in range(length)]
+            sorted_values = medians.sort_values(values)
+            self.assertEqual(medians.median(values), sorted_median(values))
+            for value in (0, 0.5, 1):
+                for count in range(4):
+                    self.assertEqual(
+                        medians.padded_median(sorted_values, value, count),
+                        sorted_median(values + [value] * count))
+
+    def test_endorsement_medians(self):
+        results = medians.endorsement_medians(
+            {1: ([0.2, 0.8], [0.4, 0.6]), 2: ([0.3], [0.9])}, 2)
+
+        self.assertEqual(results[1], {'median': {'medx': 0.5, 'medy': 0.5}})
+        self.assertEqual(results[2]['median'], {'medx': 0.3, 'medy': 0.9})
+        self.assertEqual(results[2]['o_error'], {'mapx': 0.15, 'mapy': 0.45})
+        self.assertEqual(results[2]['e_error'], {'mapx': 0.65, 'mapy': 0.45})
+        self.assertEqual(results[2]['c_error'], {'mapx': 0.4, 'mapy': 0.95})
+
+    def test_geometric_median(self):
+        square = [[0, 0], [0, 1], [1, 0], [1, 1], [0.5, 0.5]]
+        self.assertEqual(medians.geometric_median(square), [0.5, 0.5])
+        self.assertEqual(medians.geometric_median([[0.2, 0.3]]), [0.2, 0.3])
+        self.assertEqual(medians.geometric_median([]), None)
+
+        # The median of three points of a triangle with no angle over 120
+        # degrees has equal angles to them
+        triangle = [[0, 0], [1, 0], [0.5, 0.8]]
+        (x, y) = medians.geometric_median(triangle, tolerance=1e-9,
+                                          max_iterations=1000)
+        angles = [math.atan2(py - y, px - x) for (px, py) in triangle]
+        for (a, b) in zip(angles, angles[1:] + angles[:1]):
+            self.assertAlmostEqual(abs(math.cos(a - b)), 0.5, places=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Request memo test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+
+from .. import app, memo
+
+
+class FakeModel(object):
+    __tablename__ = 'fake'
+
+    def __init__(self, id):
+        self.id = id
+        self.calls = 0
+
+    @memo.memoized
+    def count(self, generation=None):
+        self.calls += 1
+        return self.calls
+
+
+class MemoTest(unittest.TestCase):
+    def test_memoized_in_request(self):
+        first = FakeModel(1)
+        other = FakeModel(2)
+        with app.test_request_context():
+            self.assertEqual(first.count(), 1)
+            self.assertEqual(first.count(), 1)
+            self.assertEqual(first.count(generation=2), 2)
+            self.assertEqual(first.count(generation=other), 3)
+            self.assertEqual(first.count(generation=other), 3)
+            self.assertEqual(other.count(), 1)
+            self.assertEqual(memo.stats()[0], 2)
+
+            memo.invalidate()
+            self.assertEqual(first.count(), 4)
+            self.assertEqual(memo.stats()[0], 2)
+
+        # A new request starts with an empty memo
+        with app.test_request_context():
+            self.assertEqual(first.count(), 5)
+            self.assertEqual(memo.stats(), (0, 0))
+
+    def test_not_memoized(self):
+        unsaved = FakeModel(None)
+        with app.test_request_context():
+            self.assertEqual(unsaved.count(), 1)
+            self.assertEqual(unsaved.count(), 2)
+            self.assertEqual(unsaved.count([1]), 3)
+
+        saved = FakeModel(1)
+        self.assertEqual(saved.count(), 1)
+        self.assertEqual(saved.count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
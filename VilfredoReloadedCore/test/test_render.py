@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Render queue test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+import threading
+
+from .. import render
+
+
+class RenderQueueTestCase(unittest.TestCase):
+    def test_submit(self):
+        queue = render.RenderQueue(workers=1)
+        release = threading.Event()
+        calls = list()
+
+        def job(number):
+            calls.append(number)
+            release.wait(5)
+            return True
+
+        self.assertEqual(queue.status('key'), None)
+        self.assertTrue(queue.submit('key', job, 1))
+        # Queued or running, not queued again
+        self.assertFalse(queue.submit('key', job, 2))
+        self.assertEqual(queue.status('key'), render.PENDING)
+        release.set()
+        queue._queue.join()
+        self.assertEqual(calls, [1])
+        self.assertEqual(queue.status('key'), None)
+
+        # Done, so queued again
+        self.assertTrue(queue.submit('key', job, 3))
+        queue._queue.join()
+        self.assertEqual(calls, [1, 3])
+
+    def test_failed(self):
+        queue = render.RenderQueue(workers=1)
+
+        def fail():
+            return False
+
+        def error():
+            raise IOError('dot failed')
+
+        for job in (fail, error):
+            self.assertTrue(queue.submit('key', job))
+            queue._queue.join()
+            self.assertEqual(queue.status('key'), render.FAILED)
+            # Kept until cleared
+            self.assertTrue(queue.submit('key', job))
+            queue._queue.join()
+            self.assertEqual(queue.status('key'), render.FAILED)
+            queue.clear('key')
+            self.assertEqual(queue.status('key'), None)
+
+    def test_clear_pending(self):
+        queue = render.RenderQueue(workers=1)
+        release = threading.Event()
+        queue.submit('key', release.wait, 5)
+        # Only failed renders are forgotten
+        queue.clear('key')
+        self.assertEqual(queue.status('key'), render.PENDING)
+        release.set()
+        queue._queue.join()
+
+    def test_resubmit_while_running(self):
+        queue = render.RenderQueue(workers=1)
+        started = threading.Event()
+        release = threading.Event()
+        calls = list()
+
+        def job(number):
+            calls.append(number)
+            started.set()
+            release.wait(5)
+            return True
+
+        self.assertTrue(queue.resubmit('key', job, 1))
+        started.wait(5)
+        # Running: queued again when it finishes, with the latest arguments
+        self.assertFalse(queue.resubmit('key', job, 2))
+        self.assertFalse(queue.resubmit('key', job, 3))
+        self.assertEqual(queue.status('key'), render.PENDING)
+        release.set()
+        queue._queue.join()
+        self.assertEqual(calls, [1, 3])
+        self.assertEqual(queue.status('key'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
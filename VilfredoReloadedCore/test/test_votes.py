@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Vote classification test for VilfredoReloadedCore
+'''
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    # NOQA
+    import unittest
+
+from .. import votes
+
+# Votes on, either side of and missing from a 0.5, 0.5 threshold
+MAPX = [0.9, 0.1, 0.5, 0.5, None, 0.9, 0.9, None]
+MAPY = [0.1, 0.1, 0.9, 0.5, 0.1, None, 0.5, None]
+
+
+class ClassifyVotesTest(unittest.TestCase):
+    def test_classify_votes(self):
+        expected = [votes.classify_vote(x, y, 0.5, 0.5)
+                    for (x, y) in zip(MAPX, MAPY)]
+        self.assertEqual(votes.classify_votes(MAPX, MAPY, 0.5, 0.5), expected)
+        self.assertEqual(expected, ['endorse', 'oppose', 'confused', 'endorse',
+                                    'oppose', 'endorse', 'endorse', 'oppose'])
+
+    def test_endorsing_votes(self):
+        self.assertEqual(votes.endorsing_votes(MAPX, MAPY, 0.5, 0.5),
+                         [True, False, False, False,
+                          False, False, False, False])
+
+    def test_empty_columns(self):
+        self.assertEqual(votes.classify_votes([], [], 0.5, 0.5), [])
+        self.assertEqual(votes.endorsing_votes([], [], 0.5, 0.5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
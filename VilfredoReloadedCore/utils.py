@@ -74,3 +74,37 @@ def alter_question_permissions(question_ids, old_permission, new_permission):
     except SQLAlchemyError:
         app.logger.debug("alter_question_permissions(): Database error")
         return False
+
+
+def wants_field(fields, *names):
+    '''
+    .. function:: wants_field(fields, *names)
+
+    Returns True if any of the named fields was requested.
+
+    :param fields: requested fields, None for all fields
+    :type fields: set or None
+    :param names: field names
+    :type names: String
+    :rtype: Boolean
+    '''
+    return fields is None or any(name in fields for name in names)
+
+
+def select_fields(data, fields):
+    '''
+    .. function:: select_fields(data, fields)
+
+    Returns the requested fields of a REST response object, always with its
+    id.
+
+    :param data: REST response object
+    :type data: dict
+    :param fields: requested fields, None for all fields
+    :type fields: set or None
+    :rtype: dict
+    '''
+    if fields is None:
+        return data
+    return dict((name, value) for (name, value) in data.iteritems()
+                if name == 'id' or name in fields)
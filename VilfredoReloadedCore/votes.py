@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+'''
+Vote snapshots
+
+A VoteSnapshot holds every vote cast in one generation of a question,
+classified once against the generation thresholds. It is loaded with a
+single query by Question.get_vote_snapshot() and can be passed to the
+Question methods which would otherwise query the votes proposal by proposal.
+'''
+
+from collections import namedtuple
+
+# NumPy is optional, votes are classified in pure Python without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ENDORSEMENT_TYPES = ('endorse', 'oppose', 'confused')
+
+Vote = namedtuple('Vote', ['proposal_id', 'user_id', 'mapx', 'mapy',
+                           'endorsement_type', 'qualified', 'endorsing'])
+
+
+def classify_vote(mapx, mapy, threshold_x, threshold_y):
+    '''
+    .. function:: classify_vote(mapx, mapy, threshold_x, threshold_y)
+
+    Classify a vote on the voting map as in
+    Endorsement.get_endorsement_type().
+
+    :param mapx: vote x coordinate
+    :type mapx: float or None
+    :param mapy: vote y coordinate
+    :type mapy: float or None
+    :param threshold_x: threshold x coordinate
+    :type threshold_x: float
+    :param threshold_y: threshold y coordinate
+    :type threshold_y: float
+    :rtype: String
+    '''
+    if mapy is not None and mapy > threshold_y:
+        return 'confused'
+    elif mapx is None or mapx < threshold_x:
+        return 'oppose'
+    else:
+        return 'endorse'
+
+
+def is_qualified_vote(mapx, mapy, threshold_x, threshold_y):
+    '''
+    .. function:: is_qualified_vote(mapx, mapy, threshold_x, threshold_y)
+
+    True if the vote is counted by Proposal.qualified_endorsers(), ie the
+    voter understood the proposal.
+
+    :rtype: boolean
+    '''
+    return mapy is not None and mapy < threshold_y
+
+
+def is_endorsing_vote(mapx, mapy, threshold_x, threshold_y):
+    '''
+    .. function:: is_endorsing_vote(mapx, mapy, threshold_x, threshold_y)
+
+    True if the vote is counted by Proposal.endorsers().
+
+    :rtype: boolean
+    '''
+    return mapx is not None and mapy is not None\
+        and mapy < threshold_y and mapx >= threshold_x
+
+
+def classify_votes(mapx, mapy, threshold_x, threshold_y):
+    '''
+    .. function:: classify_votes(mapx, mapy, threshold_x, threshold_y)
+
+    Classify a column of votes at once with the same rules as
+    classify_vote(). Uses NumPy when it is installed.
+
+    :param mapx: vote x coordinates
+    :type mapx: list of float or None
+    :param mapy: vote y coordinates
+    :type mapy: list of float or None
+    :param threshold_x: threshold x coordinate
+    :type threshold_x: float
+    :param threshold_y: threshold y coordinate
+    :type threshold_y: float
+    :rtype: list of String
+    '''
+    if numpy is None or not len(mapx):
+        return [classify_vote(x, y, threshold_x, threshold_y)
+                for (x, y) in zip(mapx, mapy)]
+
+    # Missing coordinates become NaN, which compares False to anything
+    x = numpy.array(mapx, dtype=float)
+    y = numpy.array(mapy, dtype=float)
+    with numpy.errstate(invalid='ignore'):
+        confused = y > threshold_y
+        oppose = numpy.isnan(x) | (x < threshold_x)
+    return numpy.where(confused, 'confused',
+                       numpy.where(oppose, 'oppose', 'endorse')).tolist()
+
+
+def endorsing_votes(mapx, mapy, threshold_x, threshold_y):
+    '''
+    .. function:: endorsing_votes(mapx, mapy, threshold_x, threshold_y)
+
+    Apply is_endorsing_vote() to a column of votes at once. Uses NumPy when
+    it is installed.
+
+    :param mapx: vote x coordinates
+    :type mapx: list of float or None
+    :param mapy: vote y coordinates
+    :type mapy: list of float or None
+    :rtype: list of boolean
+    '''
+    if numpy is None or not len(mapx):
+        return [is_endorsing_vote(x, y, threshold_x, threshold_y)
+                for (x, y) in zip(mapx, mapy)]
+
+    x = numpy.array(mapx, dtype=float)
+    y = numpy.array(mapy, dtype=float)
+    with numpy.errstate(invalid='ignore'):
+        return ((y < threshold_y) & (x >= threshold_x)).tolist()
+
+
+class VoteSnapshot(object):
+    '''
+    The votes of one generation of a question.
+    '''
+
+    def __init__(self, generation, proposal_ids, votes,
+                 threshold_x, threshold_y):
+        '''
+        .. function:: __init__(generation, proposal_ids, votes,
+                               threshold_x, threshold_y)
+
+        :param generation: question generation
+        :type generation: int
+        :param proposal_ids: IDs of the proposals of the generation
+        :type proposal_ids: iterable of int
+        :param votes: (proposal_id, user_id, mapx, mapy) rows
+        :type votes: iterable
+        :param threshold_x: threshold x coordinate
+        :type threshold_x: float
+        :param threshold_y: threshold y coordinate
+        :type threshold_y: float
+        '''
+        self.generation = generation
+        self.proposal_ids = sorted(set(proposal_ids))
+        self.threshold_x = threshold_x
+        self.threshold_y = threshold_y
+        self.votes = list()
+        self.by_proposal = dict((pid, list()) for pid in self.proposal_ids)
+        self.by_user = dict()
+
+        rows = list()
+        for (proposal_id, user_id, mapx, mapy) in votes:
+            if proposal_id not in self.by_proposal:
+                continue
+            user_votes = self.by_user.setdefault(user_id, dict())
+            if proposal_id in user_votes:
+                continue
+            user_votes[proposal_id] = None
+            rows.append((proposal_id, user_id, mapx, mapy))
+
+        mapx = [row[2] for row in rows]
+        mapy = [row[3] for row in rows]
+        types = classify_votes(mapx, mapy, threshold_x, threshold_y)
+        endorsing = endorsing_votes(mapx, mapy, threshold_x, threshold_y)
+
+        for (index, (proposal_id, user_id, x, y)) in enumerate(rows):
+            vote = Vote(proposal_id, user_id, x, y, types[index],
+                        is_qualified_vote(x, y, threshold_x, threshold_y),
+                        endorsing[index])
+            self.votes.append(vote)
+            self.by_proposal[proposal_id].append(vote)
+            self.by_user[user_id][proposal_id] = vote
+
+    def voter_ids(self):
+        '''
+        .. function:: voter_ids()
+
+        Returns the IDs of everyone who voted in the generation.
+
+        :rtype: set of int
+        '''
+        return set(self.by_user.keys())
+
+    def voter_count(self):
+        '''
+        .. function:: voter_count()
+
+        Same as Question.get_voter_count().
+
+        :rtype: int
+        '''
+        return len(self.by_user)
+
+    def voters_by_type(self, proposal_id, return_sets=False):
+        '''
+        .. function:: voters_by_type(proposal_id[, return_sets=False])
+
+        Same as Proposal.voters_by_type().
+
+        :param proposal_id: proposal ID
+        :type proposal_id: int
+        :param return_sets: return sets rather than lists
+        :type return_sets: boolean
+        :rtype: dict
+        '''
+        voters = dict((t, list()) for t in ENDORSEMENT_TYPES)
+        for vote in self.by_proposal.get(proposal_id, []):
+            voters[vote.endorsement_type].append(vote.user_id)
+        if return_sets:
+            for endorsement_type in ENDORSEMENT_TYPES:
+                voters[endorsement_type] = set(voters[endorsement_type])
+        return voters
+
+    def endorser_ids(self, proposal_id):
+        '''
+        .. function:: endorser_ids(proposal_id)
+
+        Same as Proposal.set_of_endorser_ids().
+
+        :rtype: set of int
+        '''
+        return set(vote.user_id
+                   for vote in self.by_proposal.get(proposal_id, [])
+                   if vote.endorsing)
+
+    def qualified_endorser_ids(self, proposal_id):
+        '''
+        .. function:: qualified_endorser_ids(proposal_id)
+
+        Same as Proposal.set_of_qualfied_endorser_ids().
+
+        :rtype: set of int
+        '''
+        return set(vote.user_id
+                   for vote in self.by_proposal.get(proposal_id, [])
+                   if vote.qualified)
+
+    def all_endorser_ids(self, proposal_ids=None):
+        '''
+        .. function:: all_endorser_ids([proposal_ids=None])
+
+        Returns the IDs of everyone who endorsed at least one of the
+        proposals.
+
+        :param proposal_ids: proposals to consider, defaults to all
+        :type proposal_ids: iterable of int
+        :rtype: set of int
+        '''
+        if proposal_ids is None:
+            proposal_ids = self.proposal_ids
+        endorsers = set()
+        for proposal_id in proposal_ids:
+            endorsers.update(self.endorser_ids(proposal_id))
+        return endorsers
+
+    def is_completely_understood(self, proposal_id):
+        '''
+        .. function:: is_completely_understood(proposal_id)
+
+        Same as Proposal.is_completely_understood().
+
+        :rtype: boolean
+        '''
+        for vote in self.by_proposal.get(proposal_id, []):
+            if vote.endorsement_type == 'confused':
+                return False
+        return True
+
+    def vote_signature(self, proposal_id):
+        '''
+        .. function:: vote_signature(proposal_id)
+
+        Returns a value which changes whenever a vote on the proposal changes
+        in a way that can affect its domination relations.
+
+        :rtype: tuple
+        '''
+        return tuple(sorted((vote.user_id, vote.endorsement_type,
+                             vote.qualified, vote.endorsing)
+                            for vote in self.by_proposal.get(proposal_id, [])))
+
+    def coordinates(self, proposal_id):
+        '''
+        .. function:: coordinates(proposal_id)
+
+        Returns the voting map coordinates of each vote on the proposal.
+
+        :rtype: dict of user ID => (mapx, mapy)
+        '''
+        return dict((vote.user_id, (vote.mapx, vote.mapy))
+                    for vote in self.by_proposal.get(proposal_id, []))
+
+    def user_votes(self, user_id):
+        '''
+        .. function:: user_votes(user_id)
+
+        Returns the type of each vote cast by the user.
+
+        :rtype: dict of proposal ID => endorsement type
+        '''
+        return dict((proposal_id, vote.endorsement_type)
+                    for (proposal_id, vote)
+                    in self.by_user.get(user_id, {}).items())
+
+    def endorsed_proposal_ids(self, user_id, proposal_ids=None):
+        '''
+        .. function:: endorsed_proposal_ids(user_id[, proposal_ids=None])
+
+        Same as User.get_endorsed_proposal_ids_new().
+
+        :param user_id: user ID
+        :type user_id: int
+        :param proposal_ids: restrict the result to these proposals
+        :type proposal_ids: set of int
+        :rtype: set of int
+        '''
+        endorsed = set(proposal_id
+                       for (proposal_id, vote)
+                       in self.by_user.get(user_id, {}).items()
+                       if vote.endorsing)
+        if proposal_ids:
+            endorsed = endorsed & set(proposal_ids)
+        return endorsed
+
+    def current_voting_map(self):
+        '''
+        .. function:: current_voting_map()
+
+        Same as Question.current_voting_map().
+
+        :rtype: dict
+        '''
+        votes = dict()
+        confused_count = 0
+        oppose_count = 0
+        for proposal_id in self.proposal_ids:
+            voters_by_type = self.voters_by_type(proposal_id)
+            votes[proposal_id] = {'proposal': proposal_id,
+                                  'votes': voters_by_type}
+            confused_count = confused_count + len(voters_by_type['confused'])
+            oppose_count = oppose_count + len(voters_by_type['oppose'])
+        return {'generation': self.generation,
+                'proposals': votes,
+                'confused_count': confused_count,
+                'oppose_count': oppose_count}
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Pareto front benchmark
+
+Times the skyline pareto front of DominationEngine against the pairwise
+loop it replaced in Question.calculate_pareto_front_original, on random
+generations of up to 2000 proposals.
+
+    python benchmarks/bench_pareto_front.py [--voters 20] [--baseline-max 500]
+
+The pairwise loop is cubic in the number of proposals, so it is only run
+up to --baseline-max proposals.
+'''
+
+import argparse
+import random
+import time
+
+from VilfredoReloadedCore import domination, votes
+from VilfredoReloadedCore.models import Proposal
+
+SIZES = [125, 250, 500, 1000, 2000]
+COORDINATES = [(0.9, 0.1), (0.1, 0.1), (0.5, 0.9)]
+
+
+def make_snapshot(num_proposals, num_voters, rnd):
+    '''
+    Random votes on a generation, each voter voting on about half the
+    proposals.
+    '''
+    cast = list()
+    for pid in range(1, num_proposals + 1):
+        for uid in range(1, num_voters + 1):
+            if rnd.random() < 0.5:
+                (mapx, mapy) = rnd.choice(COORDINATES)
+                cast.append((pid, uid, mapx, mapy))
+    return votes.VoteSnapshot(1, range(1, num_proposals + 1), cast, 0.5, 0.5)
+
+
+def pairwise_pareto_front(snapshot):
+    '''
+    The loop previously used by calculate_pareto_front_original.
+    '''
+    proposals = list(snapshot.proposal_ids)
+    props = dict((pid, snapshot.endorser_ids(pid)) for pid in proposals)
+    dominated = set()
+    done = list()
+    for proposal1 in proposals:
+        done.append(proposal1)
+        for proposal2 in proposals:
+            if (proposal2 in done):
+                continue
+            who_dominates = Proposal.who_dominates_who(props[proposal1],
+                                                       props[proposal2])
+            if (who_dominates == props[proposal1]):
+                dominated.add(proposal2)
+            elif (who_dominates == props[proposal2]):
+                dominated.add(proposal1)
+                break
+    return set(proposals).difference(dominated)
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return (result, time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pareto front benchmark')
+    parser.add_argument('--voters', type=int, default=20)
+    parser.add_argument('--baseline-max', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args()
+
+    rnd = random.Random(options.seed)
+    print '%10s %8s %12s %12s' % ('proposals', 'pareto', 'skyline (s)',
+                                  'pairwise (s)')
+    for size in SIZES:
+        snapshot = make_snapshot(size, options.voters, rnd)
+        engine = domination.DominationEngine(snapshot)
+        ((pareto, dominated_by), skyline_time) = timed(engine.pareto_front)
+        if size <= options.baseline_max:
+            (expected, pairwise_time) = timed(pairwise_pareto_front, snapshot)
+            assert set(pareto) == expected
+            pairwise = '%12.3f' % pairwise_time
+        else:
+            pairwise = '%12s' % '-'
+        print '%10d %8d %12.3f %s' % (size, len(pareto), skyline_time,
+                                      pairwise)
+
+
+if __name__ == '__main__':
+    main()
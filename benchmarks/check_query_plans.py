@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of VilfredoReloadedCore.
+#
+# Copyright © 2009-2013 Pietro Speroni di Fenizio / Derek Paterson.
+#
+# VilfredoReloadedCore is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation version 3 of the License.
+#
+# VilfredoReloadedCore is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License
+# for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VilfredoReloadedCore.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+'''
+Query plan check
+
+Creates the schema of the models in an in-memory SQLite database and checks
+with EXPLAIN QUERY PLAN that each hot query is answered from its index
+rather than by scanning the table.
+
+    python benchmarks/check_query_plans.py
+
+Exits with status 1 if any query does not use its index.
+'''
+
+import sys
+
+from sqlalchemy import create_engine
+
+from VilfredoReloadedCore import models
+
+# Question.get_vote_snapshot
+SNAPSHOT_QUERY = ('SELECT question_history.proposal_id, endorsement.user_id, '
+                  'endorsement.mapx, endorsement.mapy FROM question_history '
+                  'LEFT OUTER JOIN endorsement '
+                  'ON endorsement.proposal_id = question_history.proposal_id '
+                  'AND endorsement.generation = question_history.generation '
+                  'WHERE question_history.question_id = 1 '
+                  'AND question_history.generation = 1')
+
+# (index expected in the plan, query)
+HOT_QUERIES = [
+    ('ix_endorsement_question_generation',
+     'SELECT count(DISTINCT user_id) FROM endorsement '
+     'WHERE question_id = 1 AND generation = 1'),
+    ('ix_endorsement_proposal_generation',
+     'SELECT user_id, mapx, mapy FROM endorsement '
+     'WHERE proposal_id = 1 AND generation = 1'),
+    ('ix_endorsement_user_question_generation',
+     'SELECT proposal_id, mapx, mapy FROM endorsement '
+     'WHERE user_id = 1 AND question_id = 1 AND generation = 1'),
+    ('ix_question_history_question_generation',
+     'SELECT proposal_id FROM question_history '
+     'WHERE question_id = 1 AND generation = 1'),
+    ('ix_question_history_question_generation', SNAPSHOT_QUERY),
+    ('ix_endorsement_proposal_generation', SNAPSHOT_QUERY),
+    # utils.get_user_permissions
+    ('ix_invite_question_receiver',
+     'SELECT permissions FROM invite '
+     'WHERE invite.question_id = 1 AND invite.receiver_id = 1'),
+    ('ix_invite_question_receiver',
+     'SELECT receiver_id FROM invite WHERE question_id = 1'),
+    ('ix_invite_receiver',
+     'SELECT question_id FROM invite WHERE receiver_id = 1'),
+    ('ix_threshold_question_generation',
+     'SELECT mapx, mapy FROM threshold '
+     'WHERE question_id = 1 AND generation = 1'),
+]
+
+
+def query_plan(connection, query):
+    return [tuple(row)[-1]
+            for row in connection.execute('EXPLAIN QUERY PLAN ' + query)]
+
+
+def main():
+    engine = create_engine('sqlite://')
+    models.db.metadata.create_all(engine)
+    connection = engine.connect()
+
+    failed = 0
+    for (index, query) in HOT_QUERIES:
+        plan = query_plan(connection, query)
+        uses_index = any(index in detail.split() for detail in plan)
+        print '%s %s' % ('ok  ' if uses_index else 'FAIL', query)
+        for detail in plan:
+            print '     ' + detail
+        if not uses_index:
+            failed += 1
+
+    if failed:
+        print '%d queries do not use their index' % failed
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()